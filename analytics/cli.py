@@ -0,0 +1,188 @@
+"""Columnar analytics over the fog node and manager task logs.
+
+``ingest`` streams log files into a columnar store (see ``analytics/store.py``)
+a chunk at a time, so logs of any size are read without loading them whole.
+Run it again on the same files, after they grew or rotated, and only new lines
+are added. ``report`` computes aggregates over the store, grouped by time
+window and by node, task type, cache tier or manager status: throughput, delay
+percentiles, cache hit ratio, energy and the deadline miss rate. Only the columns a report needs are
+read, a chunk at a time, and delay percentiles come from HDR-style histograms.
+
+    python -m analytics.cli ingest fog_node_*_log.csv* manager_log.json* --store task_store
+    python -m analytics.cli report --store task_store --window 5m --by node task_type --last 1h
+    python -m analytics.cli report --store task_store --table manager --by status --format csv
+"""
+import argparse
+import csv
+import datetime
+import json
+import math
+import sys
+
+import numpy as np
+
+from analytics.store import ColumnStore
+from common.hdr_histogram import LatencyHistogram
+
+GROUP_COLUMNS = ('node', 'task_type', 'cache_hit', 'status')
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(text):
+    """Seconds in a duration such as ``90``, ``90s``, ``15m``, ``1h`` or ``2d``."""
+    if text[-1] in DURATION_UNITS:
+        return float(text[:-1]) * DURATION_UNITS[text[-1]]
+    return float(text)
+
+
+class GroupAggregate:
+    """Running aggregates of one group of rows, updated a chunk at a time."""
+
+    def __init__(self):
+        self.tasks = 0
+        self.delay = LatencyHistogram()
+        self.with_cache_info = 0
+        self.cache_hits = 0
+        self.energy = 0.0
+        self.with_deadline_info = 0
+        self.deadline_misses = 0
+        self.first = math.inf
+        self.last = -math.inf
+
+    def add(self, timestamps, delays, cache_hit_codes, energy, deadline_met, miss_code, unknown_code):
+        self.tasks += len(timestamps)
+        self.delay.record_many(delays[~np.isnan(delays)])
+        known = cache_hit_codes != unknown_code
+        self.with_cache_info += int(known.sum())
+        self.cache_hits += int((known & (cache_hit_codes != miss_code)).sum())
+        self.energy += float(np.nansum(energy))
+        known = ~np.isnan(deadline_met)
+        self.with_deadline_info += int(known.sum())
+        self.deadline_misses += int((deadline_met[known] == 0).sum())
+        if not np.isnan(timestamps).all():
+            self.first = min(self.first, float(np.nanmin(timestamps)))
+            self.last = max(self.last, float(np.nanmax(timestamps)))
+
+    def row(self, seconds):
+        """The group's metrics; throughput is over ``seconds``, or the span of its timestamps when None."""
+        if seconds is None:
+            seconds = self.last - self.first if self.last > self.first else None
+        delay = {f"delay_{name}": self.delay.percentile(p) for name, p in (('p50', 50), ('p90', 90), ('p99', 99))}
+        return {
+            'tasks': self.tasks,
+            'throughput': self.tasks / seconds if seconds else None,
+            **delay,
+            'delay_mean': self.delay.mean(),
+            'cache_hit_ratio': self.cache_hits / self.with_cache_info if self.with_cache_info else None,
+            'energy': self.energy,
+            'energy_per_task': self.energy / self.tasks,
+            'deadline_miss_rate': self.deadline_misses / self.with_deadline_info if self.with_deadline_info else None
+        }
+
+
+def aggregate(store, table, window=None, by=(), start=None, end=None):
+    """Aggregate a table by ``window`` seconds and the ``by`` columns.
+
+    Returns ``{(window index, *codes of the by columns): GroupAggregate}``.
+    """
+    miss_code, unknown_code = (store.code('cache_hit', value) for value in ('miss', ''))
+    miss_code = -1 if miss_code is None else miss_code
+    unknown_code = -1 if unknown_code is None else unknown_code
+    groups = {}
+    columns = ['timestamp', 'delay', 'cache_hit', 'energy', 'deadline_met', *by]
+    for chunk in store.scan(table, set(columns), start, end):
+        timestamps = chunk['timestamp']
+        keep = np.ones(len(timestamps), dtype=bool)
+        if start is not None:
+            keep &= timestamps >= start
+        if end is not None:
+            keep &= timestamps <= end
+        if window:
+            keep &= ~np.isnan(timestamps)
+        if not keep.all():
+            chunk = {name: values[keep] for name, values in chunk.items()}
+            timestamps = chunk['timestamp']
+        if not len(timestamps):
+            continue
+
+        windows = np.floor(timestamps / window).astype(np.int64) if window else np.zeros(len(timestamps), np.int64)
+        # One integer key per row, so grouping is a 1-D sort
+        first_window = int(windows.min())
+        key_columns = [windows - first_window] + [chunk[name].astype(np.int64) for name in by]
+        dimensions = [int(values.max()) + 1 for values in key_columns]
+        distinct, inverse = np.unique(np.ravel_multi_index(key_columns, dimensions), return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(1, len(distinct)))
+        keys = np.column_stack(np.unravel_index(distinct, dimensions))
+        keys[:, 0] += first_window
+        for key, rows in zip(map(tuple, keys.tolist()), np.split(order, bounds)):
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = GroupAggregate()
+            group.add(timestamps[rows], chunk['delay'][rows], chunk['cache_hit'][rows], chunk['energy'][rows],
+                      chunk['deadline_met'][rows], miss_code, unknown_code)
+    return groups
+
+
+def report_rows(store, groups, window, by):
+    rows = []
+    for key in sorted(groups):
+        row = {}
+        if window:
+            started = datetime.datetime.utcfromtimestamp(key[0] * window)
+            row['window_start'] = started.strftime('%Y-%m-%d %H:%M:%S')
+        row.update({name: store.decode(name, code) for name, code in zip(by, key[1:])})
+        row.update(groups[key].row(window))
+        rows.append(row)
+    return rows
+
+
+def print_table(rows):
+    if not rows:
+        print("No rows")
+        return
+    cells = [[f"{value:.4g}" if isinstance(value, float) else ('-' if value is None else str(value))
+              for value in row.values()] for row in rows]
+    widths = [max(len(name), *(len(line[i]) for line in cells)) for i, name in enumerate(rows[0])]
+    print('  '.join(name.rjust(width) for name, width in zip(rows[0], widths)))
+    for line in cells:
+        print('  '.join(cell.rjust(width) for cell, width in zip(line, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="Add new lines of fog node CSV and manager JSON logs to the store")
+    ingest.add_argument('logs', nargs='+')
+    ingest.add_argument('--store', default='task_store')
+    report = commands.add_parser('report', help="Aggregate the store by time window and columns")
+    report.add_argument('--store', default='task_store')
+    report.add_argument('--table', choices=['fog', 'manager'], default='fog')
+    report.add_argument('--window', type=parse_duration, help="Time window, e.g. 60, 5m or 1h; one window if unset")
+    report.add_argument('--by', nargs='*', choices=GROUP_COLUMNS, default=['node'])
+    report.add_argument('--last', type=parse_duration, help="Only the last duration before the newest record")
+    report.add_argument('--format', choices=['table', 'csv', 'json'], default='table')
+    args = parser.parse_args()
+
+    store = ColumnStore(args.store)
+    if args.command == 'ingest':
+        for path in args.logs:
+            print(f"{path}: {store.ingest(path)} new rows")
+        return
+
+    latest = store.latest(args.table)
+    start = latest - args.last if args.last and latest is not None else None
+    rows = report_rows(store, aggregate(store, args.table, args.window, args.by, start), args.window, args.by)
+    if args.format == 'json':
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    elif args.format == 'csv' and rows:
+        writer = csv.DictWriter(sys.stdout, list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import csv
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+# Rows parsed before a chunk is written, which bounds ingest memory whatever the size of the logs
+CHUNK_ROWS = 262144
+
+# Both tables share one schema. String columns are dictionary-encoded: the store keeps every distinct
+# value once and chunks hold indexes into that list.
+COLUMNS = {
+    'timestamp': np.float64,  # Unix time the task was logged, NaN for logs written before timestamps
+    'node': np.uint16,
+    'task_type': np.uint16,
+    'status': np.uint16,  # Manager outcome ('offloaded', 'cloud', 'saturated', ...); 'answered' for fog rows
+    'cache_hit': np.uint16,  # 'L1', 'L2', 'coalesced' or 'miss'; '' when the manager logged no response
+    'delay': np.float64,  # NaN when no delay was reported
+    'energy': np.float64,
+    'deadline_met': np.float64  # 1 or 0, 0 for tasks dropped for their deadline; NaN when not reported
+}
+ENCODED_COLUMNS = ('node', 'task_type', 'status', 'cache_hit')
+
+
+def file_fingerprint(path):
+    """Identify a log by its first two lines, so a rotated file is recognized under its new name."""
+    with open(path, 'rb') as f:
+        head = f.readline() + f.readline()
+    return hashlib.sha1(head).hexdigest()[:16] if head.endswith(b'\n') else None
+
+
+def parse_fog_rows(header, rows):
+    """Columns of fog node CSV rows (``fog_node_<n>_log.csv``) with the given header."""
+    position = {name: i for i, name in enumerate(header)}
+    timestamp = position.get('timestamp')
+    deadline_met = position.get('deadline_met')
+    columns = {name: [] for name in COLUMNS}
+    for row in rows:
+        cache_hit = row[position['cache_hit']]
+        columns['timestamp'].append(float(row[timestamp]) if timestamp is not None else math.nan)
+        columns['node'].append(row[position['fog_node_number']])
+        columns['task_type'].append(row[position['task_id']].rsplit('_', 1)[0])  # Task ids are <type>_<size>
+        columns['status'].append('answered')
+        columns['cache_hit'].append('miss' if cache_hit in ('False', '') else cache_hit)
+        columns['delay'].append(float(row[position['delay']]))
+        columns['energy'].append(float(row[position['energy_consumption']]))
+        met = row[deadline_met] if deadline_met is not None else ''
+        columns['deadline_met'].append(float(met == 'True') if met else math.nan)
+    return columns
+
+
+def parse_manager_rows(lines):
+    """Columns of ``manager_log.json`` lines."""
+    columns = {name: [] for name in COLUMNS}
+    for line in lines:
+        action = json.loads(line)
+        response = action.get('response') or {}
+        cache_hit = response.get('cache_hit')
+        columns['timestamp'].append(action.get('timestamp', math.nan))
+        columns['node'].append(str(action.get('node_id', '')))
+        columns['task_type'].append(action.get('task_type', ''))
+        columns['status'].append(action['status'])
+        columns['cache_hit'].append(cache_hit or ('miss' if 'delay' in response else ''))
+        columns['delay'].append(response.get('delay', math.nan))
+        columns['energy'].append(response.get('energy_consumption', math.nan))
+        if action['status'] == 'expired':
+            columns['deadline_met'].append(0.0)
+        else:
+            columns['deadline_met'].append(float(response['deadline_met']) if 'deadline_met' in response else math.nan)
+    return columns
+
+
+class ColumnStore:
+    """Task logs ingested into chunked columnar arrays, one directory per table.
+
+    Every chunk is an ``.npz`` file of up to ``CHUNK_ROWS`` rows with one array
+    per column, and its time range is kept in ``manifest.json`` so queries skip
+    chunks outside their window without reading them. The manifest also keeps
+    how far each log file has been read, so ingesting the same, grown or rotated
+    logs again only adds the new lines.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        else:
+            manifest = {'files': {}, 'chunks': {'fog': [], 'manager': []},
+                        'dictionaries': {name: [] for name in ENCODED_COLUMNS}}
+        self.files = manifest['files']  # fingerprint -> {'table', 'path', 'offset'}
+        self.chunks = manifest['chunks']  # table -> [{'file', 'rows', 'start', 'end'}]
+        self.dictionaries = manifest['dictionaries']
+        self._codes = {name: {value: code for code, value in enumerate(values)}
+                       for name, values in self.dictionaries.items()}
+
+    def save(self):
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump({'files': self.files, 'chunks': self.chunks, 'dictionaries': self.dictionaries}, f)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    def encode(self, name, values):
+        distinct, inverse = np.unique(np.array(values, dtype=str), return_inverse=True)
+        codes = self._codes[name]
+        for value in distinct.tolist():
+            if value not in codes:
+                codes[value] = len(self.dictionaries[name])
+                self.dictionaries[name].append(value)
+        return np.array([codes[value] for value in distinct.tolist()], dtype=COLUMNS[name])[inverse]
+
+    def code(self, name, value):
+        """The code of a value of an encoded column, or None if it never occurred."""
+        return self._codes[name].get(value)
+
+    def decode(self, name, code):
+        return self.dictionaries[name][code]
+
+    def ingest(self, path):
+        """Append the lines of a log file not ingested yet; returns the number of rows added."""
+        fingerprint = file_fingerprint(path)
+        if fingerprint is None:
+            return 0  # Fewer than two complete lines so far
+        with open(path, 'rb') as f:
+            first_line = f.readline()
+            table = 'manager' if first_line.startswith(b'{') else 'fog'
+            entry = self.files.setdefault(fingerprint, {'table': table, 'offset': 0})
+            entry['path'] = path
+            header = None
+            if table == 'fog':
+                header = next(csv.reader([first_line.decode()]))
+                entry['offset'] = max(entry['offset'], len(first_line))
+            f.seek(entry['offset'])
+
+            added = 0
+            lines = []
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # Still being written; picked up by the next ingest
+                lines.append(line)
+                if len(lines) == CHUNK_ROWS:
+                    added += self._write_chunk(table, fingerprint, entry, header, lines)
+                    lines = []
+            if lines:
+                added += self._write_chunk(table, fingerprint, entry, header, lines)
+        self.save()
+        return added
+
+    def _write_chunk(self, table, fingerprint, entry, header, lines):
+        text = [line.decode() for line in lines]
+        columns = parse_fog_rows(header, csv.reader(text)) if table == 'fog' else parse_manager_rows(text)
+        arrays = {name: self.encode(name, values) if name in ENCODED_COLUMNS else np.array(values, COLUMNS[name])
+                  for name, values in columns.items()}
+        # Named by source file and offset, so a chunk written again after a crash replaces itself
+        file_name = f"{fingerprint}-{entry['offset']:012d}.npz"
+        os.makedirs(os.path.join(self.path, table), exist_ok=True)
+        np.savez(os.path.join(self.path, table, file_name), **arrays)
+
+        timestamps = arrays['timestamp'][~np.isnan(arrays['timestamp'])]
+        self.chunks[table] = [chunk for chunk in self.chunks[table] if chunk['file'] != file_name]
+        self.chunks[table].append({
+            'file': file_name,
+            'rows': len(lines),
+            'start': float(timestamps.min()) if timestamps.size else None,
+            'end': float(timestamps.max()) if timestamps.size else None
+        })
+        entry['offset'] += sum(map(len, lines))
+        self.save()
+        return len(lines)
+
+    def latest(self, table):
+        ends = [chunk['end'] for chunk in self.chunks[table] if chunk['end'] is not None]
+        return max(ends) if ends else None
+
+    def scan(self, table, columns, start=None, end=None):
+        """Yield a dict of column arrays per chunk, skipping chunks entirely outside ``[start, end]``.
+
+        Columns added to the schema after a chunk was written read as NaN in it.
+        """
+        for chunk in self.chunks[table]:
+            if start is not None and (chunk['end'] is None or chunk['end'] < start):
+                continue
+            if end is not None and (chunk['start'] is None or chunk['start'] > end):
+                continue
+            with np.load(os.path.join(self.path, table, chunk['file'])) as arrays:
+                yield {name: arrays[name] if name in arrays.files else np.full(chunk['rows'], np.nan, COLUMNS[name])
+                       for name in columns}
@@ -0,0 +1,64 @@
+"""Benchmark: manager throughput when devices send tasks in batches of 1, 10 and 100.
+
+Batch size 1 uses ``/offload_task``; larger sizes use ``/offload_batch``, which
+partitions the batch across the stub fog nodes and forwards one chunk per node.
+
+    python -m benchmarks.bench_batch --tasks 2000 --batch-sizes 1 10 100
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import import_service, register_stub_nodes, start_flask_manager
+from benchmarks.stub_fog_node import start_stub_fog_node
+from common.http_client import create_session
+
+TASK_TYPES = ["image_processing", "data_analysis", "video_streaming"]
+
+
+def drive(manager_url, tasks, batch_size, clients):
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+    session = create_session(pool_maxsize=clients)
+
+    def send(batch):
+        if batch_size == 1:
+            return int(session.post(manager_url + '/offload_task', json=batch[0]).status_code == 200)
+        response = session.post(manager_url + '/offload_batch', json={'tasks': batch})
+        return sum('fog_node_number' in result for result in response.json()['results'])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        completed = sum(pool.map(send, batches))
+    return completed / (time.perf_counter() - start), completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--nodes', type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    tasks = [{'task_type': random.choice(TASK_TYPES), 'task_size': random.randint(10, 100),
+              'deadline': random.randint(5, 30)} for _ in range(args.tasks)]
+
+    manager = import_service('manager', 'manager')
+    urls = [start_stub_fog_node(n + 1)[1] for n in range(args.nodes)]
+    stop, manager_url = start_flask_manager(manager)
+
+    print(f"{'batch size':>10}{'tasks/sec':>12}{'completed':>11}")
+    for batch_size in args.batch_sizes:
+        register_stub_nodes(manager, urls)
+        with contextlib.redirect_stdout(io.StringIO()):
+            throughput, completed = drive(manager_url, tasks, batch_size, args.clients)
+        print(f"{batch_size:>10}{throughput:>12.1f}{completed:>11}")
+    stop()
+
+
+if __name__ == '__main__':
+    main()
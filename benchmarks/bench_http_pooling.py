@@ -0,0 +1,59 @@
+"""Compare manager -> fog forwarding with and without pooled keep-alive sessions.
+
+Runs against local stub fog nodes, so the numbers isolate connection handling
+from task processing.
+
+    python -m benchmarks.bench_http_pooling --tasks 2000 --threads 8 --nodes 3
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from benchmarks.stub_fog_node import start_stub_fog_node
+from common.http_client import create_session
+
+
+def run(post, urls, tasks, threads):
+    task = {'task_type': 'image_processing', 'task_size': 50, 'deadline': 10}
+
+    def forward(i):
+        start = time.perf_counter()
+        response = post(urls[i % len(urls)] + '/offload_task', json=task)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = np.fromiter(pool.map(forward, range(tasks)), dtype=float, count=tasks)
+    elapsed = time.perf_counter() - start
+    return tasks / elapsed, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--nodes', type=int, default=3)
+    args = parser.parse_args()
+
+    servers = [start_stub_fog_node(n + 1) for n in range(args.nodes)]
+    urls = [url for _, url in servers]
+
+    session = create_session(pool_maxsize=args.threads)
+    modes = [('unpooled', requests.post), ('pooled', session.post)]
+
+    print(f"{'mode':<10}{'tasks/sec':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, post in modes:
+        run(post, urls, min(100, args.tasks), args.threads)  # Warm up
+        throughput, p50, p99 = run(post, urls, args.tasks, args.threads)
+        print(f"{name:<10}{throughput:>12.1f}{p50:>10.2f}{p99:>10.2f}")
+
+    for server, _ in servers:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
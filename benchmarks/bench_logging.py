@@ -0,0 +1,88 @@
+"""Benchmark: request latency added by logging on the manager's /offload_task path.
+
+Compares the previous synchronous logging (open/append/close of the JSON-lines
+file, DEBUG file and console handlers, per-request prints) with the buffered
+pipeline at DEBUG with console output, and at WARNING with VERBOSE off. A run
+with all logging disabled gives the baseline. Console output goes to a temp
+file, as it would to ``docker logs``.
+
+    python -m benchmarks.bench_logging --requests 2000
+"""
+import argparse
+import contextlib
+import json
+import logging
+import tempfile
+import time
+
+import numpy as np
+
+import common.logs
+from benchmarks.harness import import_service, register_stub_nodes
+from benchmarks.stub_fog_node import start_stub_fog_node
+
+
+def run(manager, requests):
+    client = manager.app.test_client()
+    task = {'task_type': 'data_analysis', 'task_size': 40, 'deadline': 20}
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.post('/offload_task', json=task)
+        latencies.append(time.perf_counter() - start)
+    return np.percentile(latencies, 50) * 1e6, np.percentile(latencies, 99) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    manager = import_service('manager', 'manager')
+    register_stub_nodes(manager, [start_stub_fog_node(1)[1]])
+    buffered_log_actions = manager.log_manager_actions
+    sink = tempfile.TemporaryFile('w')
+    root = logging.getLogger()
+    queue_handlers = list(root.handlers)
+    for handler in manager.log_listener.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setStream(sink)
+
+    def synchronous_log_actions(action_data):
+        with open(manager.manager_log_file, 'a') as f:
+            f.write(json.dumps(action_data) + "\n")
+
+    def configure(mode):
+        logging.disable(logging.NOTSET)
+        root.handlers[:] = queue_handlers
+        manager.log_manager_actions = buffered_log_actions
+        common.logs.VERBOSE = True
+        root.setLevel(logging.DEBUG)
+        if mode == 'synchronous':
+            root.handlers[:] = [logging.FileHandler("manager_debug_sync.log"), logging.StreamHandler(sink)]
+            manager.log_manager_actions = synchronous_log_actions
+        elif mode == 'buffered quiet':
+            common.logs.VERBOSE = False
+            root.setLevel(logging.WARNING)
+        elif mode == 'disabled':
+            common.logs.VERBOSE = False
+            logging.disable(logging.CRITICAL)
+            manager.log_manager_actions = lambda action_data: None
+
+    results = {}
+    print(f"{'logging':<18}{'p50 us':>10}{'p99 us':>10}")
+    for mode in ('disabled', 'synchronous', 'buffered verbose', 'buffered quiet'):
+        configure(mode)
+        with contextlib.redirect_stdout(sink):
+            run(manager, min(200, args.requests))  # Warm up
+            results[mode] = run(manager, args.requests)
+        print(f"{mode:<18}{results[mode][0]:>10.0f}{results[mode][1]:>10.0f}")
+
+    baseline = results['disabled']
+    print("\nLatency added by logging (p50 / p99):")
+    for mode in ('synchronous', 'buffered verbose', 'buffered quiet'):
+        print(f"  {mode:<18}{results[mode][0] - baseline[0]:>8.0f} us / {results[mode][1] - baseline[1]:.0f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Benchmark: task throughput of 1, 2 and 4 manager replicas sharing their node state.
+
+Every replica is a Flask manager in its own process, with the state store
+chosen by ``--store``. With 'redis' (the default; needs a running Redis, e.g.
+the compose ``redis`` service published on localhost:6379), the stub fog nodes
+register and report their status to the first replica only, and the others
+pick them up from the store. With 'memory', every replica is told about every
+node and counts only its own in-flight tasks. Closed-loop clients in
+``--driver-processes`` processes spread their tasks over the replicas with the
+same client-side ``ReplicaList`` IoT devices use. ``--fail-after`` stops the
+first replica that many seconds into each run with several replicas, to count
+the tasks lost when a replica fails. Throughput only scales with replicas up to
+the number of cores.
+
+    python -m benchmarks.bench_manager_replicas --replicas 1 2 4 --clients 32 --redis-host localhost
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.harness import import_service, start_flask_manager
+from benchmarks.stub_fog_node import start_stub_fog_node
+from common.http_client import ReplicaList, create_session
+
+TASK = {'task_type': 'data_analysis', 'task_size': 40, 'deadline': 20}
+
+
+def serve_replica(store, redis_host, redis_port, urls):
+    """Run one manager replica until terminated; puts its URL on ``urls``."""
+    os.environ.update(MANAGER_STATE_STORE=store, REDIS_HOST=redis_host, REDIS_PORT=str(redis_port), CLOUD_URL='')
+    sys.stdout = open(os.devnull, 'w')  # The manager prints every task
+    manager = import_service('manager', 'manager')
+    manager.start_state_sync_thread()
+    urls.put(start_flask_manager(manager)[1])
+    threading.Event().wait()  # Not a shared event: a replica stopped while waiting on one would deadlock it
+
+
+def serve_stub_fog_node(fog_node_number, processing_time, urls):
+    urls.put(start_stub_fog_node(fog_node_number, processing_time)[1])
+    threading.Event().wait()
+
+
+def drive(manager_urls, clients, tasks_per_client, first_client):
+    """Run closed-loop clients; returns the latency of every answered task and the number of errors."""
+
+    def client(i):
+        # Each client starts its turn at a different replica
+        start = (first_client + i) % len(manager_urls)
+        managers = ReplicaList(manager_urls[start:] + manager_urls[:start], create_session(pool_maxsize=1))
+        latencies, errors = [], 0
+        for _ in range(tasks_per_client):
+            started_at = time.perf_counter()
+            try:
+                response = managers.post('/offload_task', json=TASK)
+            except Exception:
+                errors += 1
+                continue
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started_at)
+            else:
+                errors += 1
+        return latencies, errors
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(client, range(clients)))
+    return [latency for latencies, _ in results for latency in latencies], sum(errors for _, errors in results)
+
+
+def register_nodes(session, manager_urls, fog_node_urls):
+    """Register the stub fog nodes with each replica and give each node a fresh, idle status."""
+    for manager_url in manager_urls:
+        for i, url in enumerate(fog_node_urls):
+            node_id = str(i + 1)
+            session.post(manager_url + '/register', json={'node_id': node_id, 'url': url})
+            session.post(manager_url + '/status_update', json={
+                'node_id': node_id,
+                'fog_node_number': node_id,
+                'cpu_usage': 10.0,
+                'memory_available': 512,
+                'total_memory': 1024,
+                'task_queue_length': 0
+            })
+
+
+def run(context, args, replicas, fog_node_urls):
+    """Start ``replicas`` managers, load them, and return ``(tasks/s, p99 ms, errors)``."""
+    urls = context.Queue()
+    processes = [context.Process(target=serve_replica, args=(args.store, args.redis_host, args.redis_port, urls),
+                                 daemon=True) for _ in range(replicas)]
+    for process in processes:
+        process.start()
+    manager_urls = [urls.get(timeout=60) for _ in processes]
+
+    shared = args.store == 'redis'
+    register_nodes(create_session(), manager_urls[:1] if shared else manager_urls, fog_node_urls)
+    if shared:
+        time.sleep(1.0)  # Two state syncs, for every replica to know the nodes
+
+    failure = None
+    if args.fail_after and replicas > 1:
+        failure = threading.Timer(args.fail_after, processes[0].terminate)
+        failure.start()
+
+    clients_per_driver = max(1, args.clients // args.driver_processes)
+    started_at = time.perf_counter()
+    with context.Pool(args.driver_processes) as pool:
+        results = pool.starmap(drive, [(manager_urls, clients_per_driver, args.tasks_per_client, d * clients_per_driver)
+                                       for d in range(args.driver_processes)])
+    elapsed = time.perf_counter() - started_at
+
+    if failure:
+        failure.cancel()
+    for process in processes:
+        process.terminate()
+        process.join()
+    latencies = np.asarray([latency for latencies, _ in results for latency in latencies], dtype=float)
+    errors = sum(errors for _, errors in results)
+    p99 = np.percentile(latencies, 99) * 1000 if len(latencies) else float('nan')
+    return len(latencies) / elapsed, p99, errors
+
+
+def clear_shared_state(args):
+    """Drop the node state earlier runs left in Redis, so replicas only see this run's stub nodes."""
+    import redis
+    state_store = import_service('manager', 'state_store')
+    client = redis.Redis(host=args.redis_host, port=args.redis_port)
+    client.delete(*state_store.RedisStateStore(client).keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replicas', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--store', choices=['memory', 'redis'], default='redis')
+    parser.add_argument('--redis-host', default='localhost')
+    parser.add_argument('--redis-port', type=int, default=6379)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--tasks-per-client', type=int, default=50)
+    parser.add_argument('--driver-processes', type=int, default=4)
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--processing-time', type=float, default=0.0)
+    parser.add_argument('--fail-after', type=float, default=None,
+                        help="Seconds into each run with several replicas to stop the first one")
+    args = parser.parse_args()
+
+    # Replicas, stub nodes and clients each get their own process, so none of them share a GIL
+    context = multiprocessing.get_context('spawn')
+    urls = context.Queue()
+    stubs = [context.Process(target=serve_stub_fog_node, args=(n + 1, args.processing_time, urls), daemon=True)
+             for n in range(args.nodes)]
+    for stub in stubs:
+        stub.start()
+    fog_node_urls = [urls.get(timeout=60) for _ in stubs]
+
+    print(f"{'store':<8}{'replicas':>9}{'tasks/sec':>12}{'p99 ms':>10}{'errors':>8}")
+    for replicas in args.replicas:
+        if args.store == 'redis':
+            clear_shared_state(args)
+        throughput, p99, errors = run(context, args, replicas, fog_node_urls)
+        print(f"{args.store:<8}{replicas:>9}{throughput:>12.1f}{p99:>10.1f}{errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark: every routing policy on the same task trace.
+
+Simulates heterogeneous fog nodes on a virtual clock and routes one seeded
+trace through the manager's real policies and registry, with its in-flight
+accounting. Node ``n`` processes at ``1 + (n - 1) * --speed-step`` times the
+base speed, and nodes report their status every ``--status-interval`` seconds.
+Tasks get the IoT device's sizes (10-100) and deadlines (5-30 s). Nodes serve
+their queue first come first served, so this understates the fog nodes' EDF
+ordering for every policy alike.
+
+    python -m benchmarks.bench_policies --tasks 5000 --rate 1.2
+"""
+import argparse
+import heapq
+import random
+
+import numpy as np
+
+from benchmarks.bench_routing import TASK_TYPES, SimulatedFogNode
+from benchmarks.harness import import_service
+
+
+class HeterogeneousFogNode(SimulatedFogNode):
+    def __init__(self, node_id, workers, speed):
+        super().__init__(node_id, workers)
+        self.speed = speed
+        self.avg_service_time = 0.0
+
+    def status(self, now):
+        return {
+            **super().status(now),
+            'workers': len(self.free_at),
+            'avg_service_time': self.avg_service_time,
+            'avg_service_rate': 10 * self.speed
+        }
+
+    def compute(self, now, task):
+        worker = min(range(len(self.free_at)), key=self.free_at.__getitem__)
+        start = max(now, self.free_at[worker])
+        processing_time = task['task_size'] / (10 * self.speed)
+        self.free_at[worker] = start + processing_time
+        heapq.heappush(self.finish_times, start + processing_time)
+        self.avg_service_time += 0.2 * (processing_time - self.avg_service_time)
+        return start + processing_time, task['task_size'] / 10 + 0.1 + processing_time + (start - now)
+
+
+def make_trace(args):
+    rng = random.Random(args.seed)
+    now, trace = 0.0, []
+    for _ in range(args.tasks):
+        now += rng.expovariate(args.rate)
+        trace.append((now, {'task_type': rng.choice(TASK_TYPES), 'task_size': rng.randint(10, 100),
+                            'deadline': rng.randint(5, 30)}))
+    return trace
+
+
+def simulate(manager, policy, trace, args):
+    manager.fog_node_registry.reset()
+    manager.fog_node_statuses.clear()
+    manager.routing_policy = manager.create_routing_policy(policy)
+    if hasattr(manager.routing_policy, 'rng'):
+        manager.routing_policy.rng = random.Random(args.seed)
+    nodes = {str(n): HeterogeneousFogNode(str(n), args.workers, 1 + (n - 1) * args.speed_step)
+             for n in range(1, args.nodes + 1)}
+    for node_id in nodes:
+        manager.register_fog_node({'node_id': node_id, 'url': f"http://fog_node{node_id}:5000",
+                                   'capacity': args.workers})
+
+    responses = []  # Heap of (response time, node_id, token)
+    next_status = 0.0
+    delays, met, rejected = [], 0, 0
+    for now, task in trace:
+        while responses and responses[0][0] <= now:
+            _, node_id, token = heapq.heappop(responses)
+            manager.fog_node_registry.complete(node_id, token)
+        while next_status <= now:
+            for node in nodes.values():
+                manager.record_fog_node_status(node.status(next_status))
+            next_status += args.status_interval
+
+        try:
+            node_id = manager.select_best_fog_node(task)['node_id']
+        except manager.InfeasibleTaskError:
+            rejected += 1
+            continue
+        finished_at, delay = nodes[node_id].compute(now, task)
+        heapq.heappush(responses, (finished_at, node_id, manager.fog_node_registry.dispatch(node_id)))
+        delays.append(delay)
+        met += delay <= task['deadline']
+
+    return {
+        'mean_delay': np.mean(delays),
+        'p95_delay': np.percentile(delays, 95),
+        'met': met / len(trace),
+        'missed': 1 - met / len(delays),
+        'rejected': rejected / len(trace)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=1.2, help="Task arrivals per virtual second")
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--speed-step', type=float, default=0.5, help="Extra speed of each node over the previous")
+    parser.add_argument('--status-interval', type=float, default=2.0)
+    parser.add_argument('--policies', nargs='+', default=['weighted', 'affinity', 'power_of_two', 'least_ect',
+                                                          'deadline'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    manager = import_service('manager', 'manager')
+    trace = make_trace(args)
+    print(f"{'policy':<14}{'mean delay':>11}{'p95 delay':>11}{'met':>8}{'missed':>8}{'rejected':>10}")
+    for policy in args.policies:
+        result = simulate(manager, policy, trace, args)
+        print(f"{policy:<14}{result['mean_delay']:>11.1f}{result['p95_delay']:>11.1f}{result['met']:>8.1%}"
+              f"{result['missed']:>8.1%}{result['rejected']:>10.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark: Redis round trips and latency of per-call vs batched cache access.
+
+Per-call access is one GET per task plus one SET per miss. Batched access is one
+MGET per batch plus one pipelined SET with EX for all misses. Needs a running
+Redis, e.g. the compose ``redis`` service published on localhost:6379.
+
+    python -m benchmarks.bench_redis_cache --batches 200 --batch-size 20 --redis-host localhost
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.harness import REPO_ROOT
+
+sys.path.insert(0, f"{REPO_ROOT}/fog_nodes")
+from result_cache import ResultCache  # noqa: E402
+
+TASK_TYPES = ["image_processing", "data_analysis", "video_streaming"]
+
+
+def per_call(cache, task_ids):
+    for task_id in task_ids:
+        if cache.get(task_id)[0] is None:
+            cache.set(task_id, f"Processed {task_id}")
+
+
+def batched(cache, task_ids):
+    cached_results = cache.get_many(task_ids)
+    cache.set_many({task_id: f"Processed {task_id}"
+                    for task_id, (cached_result, _) in zip(task_ids, cached_results) if cached_result is None})
+
+
+def run(cache, access, batches):
+    cache.client.flushdb()
+    cache.round_trips = 0
+    latencies = []
+    for task_ids in batches:
+        start = time.perf_counter()
+        access(cache, task_ids)
+        latencies.append(time.perf_counter() - start)
+    tasks = sum(len(task_ids) for task_ids in batches)
+    return cache.round_trips / tasks, np.percentile(latencies, 99) * 1000, sum(latencies) / tasks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--redis-host', default='localhost')
+    parser.add_argument('--redis-port', type=int, default=6379)
+    args = parser.parse_args()
+
+    cache = ResultCache(args.redis_host, args.redis_port, l1_max_entries=0)  # Measure Redis access only
+    if not cache.ping():
+        sys.exit(f"Redis is not reachable at {args.redis_host}:{args.redis_port}")
+
+    random.seed(0)
+    batches = [[f"{random.choice(TASK_TYPES)}_{random.randint(10, 100)}" for _ in range(args.batch_size)]
+               for _ in range(args.batches)]
+
+    print(f"{'access':<10}{'round trips/task':>18}{'p99 ms/batch':>14}{'us/task':>10}")
+    for name, access in [('per-call', per_call), ('batched', batched)]:
+        round_trips, p99, per_task = run(cache, access, batches)
+        print(f"{name:<10}{round_trips:>18.2f}{p99:>14.2f}{per_task:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
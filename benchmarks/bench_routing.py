@@ -0,0 +1,124 @@
+"""Benchmark: cache hit rate and mean delay of weighted vs cache-affinity routing.
+
+Simulates fog nodes on a virtual clock and routes every task through the
+manager's real ``select_best_fog_node``. Each node has an L1 cache and all share
+Redis (L2), with the fog nodes' TTLs, single-flight coalescing and delay formula.
+Nodes report their load every ``--status-interval`` virtual seconds.
+
+    python -m benchmarks.bench_routing --tasks 5000 --rate 1.0 --nodes 3
+"""
+import argparse
+import contextlib
+import heapq
+import io
+import random
+
+import numpy as np
+
+from benchmarks.harness import import_service
+
+TASK_TYPES = ["image_processing", "data_analysis", "video_streaming"]
+L1_TTL, L2_TTL = 60, 600  # Fog node cache TTLs in seconds
+L2_ROUND_TRIP = 0.002  # Seconds for a Redis lookup from a fog node
+
+
+class SimulatedFogNode:
+    def __init__(self, node_id, workers):
+        self.node_id = node_id
+        self.free_at = [0.0] * workers  # Time each worker becomes free
+        self.finish_times = []  # Heap of finish times of accepted computations
+        self.l1 = {}  # task_id -> expiry
+
+    def status(self, now):
+        while self.finish_times and self.finish_times[0] <= now:
+            heapq.heappop(self.finish_times)
+        busy = sum(free_at > now for free_at in self.free_at)
+        return {
+            'node_id': self.node_id,
+            'fog_node_number': self.node_id,
+            'cpu_usage': 100.0 * busy / len(self.free_at),
+            'memory_available': 512,
+            'total_memory': 1024,
+            'task_queue_length': len(self.finish_times)
+        }
+
+    def compute(self, now, task):
+        worker = min(range(len(self.free_at)), key=self.free_at.__getitem__)
+        start = max(now, self.free_at[worker])
+        processing_time = task['task_size'] / 10
+        self.free_at[worker] = start + processing_time
+        heapq.heappush(self.finish_times, start + processing_time)
+        # Same delay formula as the fog node: transmission + propagation + processing + queue wait
+        return start + processing_time, task['task_size'] / 10 + 0.1 + processing_time + (start - now)
+
+
+def simulate(manager, mode, args):
+    rng = random.Random(args.seed)
+    manager.fog_node_registry.reset()
+    manager.routing_policy = manager.create_routing_policy(mode)
+    nodes = {str(n): SimulatedFogNode(str(n), args.workers) for n in range(1, args.nodes + 1)}
+    for node_id in nodes:
+        manager.register_fog_node({'node_id': node_id, 'url': f"http://fog_node{node_id}:5000"})
+
+    l2 = {}  # task_id -> time the shared cache holds a result until
+    in_flight = {}  # task_id -> (node_id, finish time)
+    now, next_status = 0.0, 0.0
+    delays, served_by = [], {'L1': 0, 'L2': 0, 'coalesced': 0, 'computed': 0}
+
+    for _ in range(args.tasks):
+        now += rng.expovariate(args.rate)
+        while next_status <= now:
+            for node in nodes.values():
+                manager.record_fog_node_status(node.status(next_status))
+            next_status += args.status_interval
+
+        task = {'task_type': rng.choice(TASK_TYPES), 'task_size': rng.randint(10, 100), 'deadline': 30}
+        task_id = f"{task['task_type']}_{task['task_size']}"  # The key fog nodes cache results under
+        node = nodes[manager.select_best_fog_node(task)['node_id']]
+
+        flight = in_flight.get(task_id)
+        if node.l1.get(task_id, -1) > now and (flight is None or flight[1] <= now):
+            served_by['L1'] += 1
+            delays.append(0.0)
+        elif flight and flight[1] > now:
+            # Another request is computing it: wait locally, or on the Redis lease from another node
+            served_by['coalesced'] += 1
+            delays.append(flight[1] - now + (L2_ROUND_TRIP if flight[0] != node.node_id else 0))
+            node.l1[task_id] = flight[1] + L1_TTL
+        elif l2.get(task_id, -1) > now:
+            served_by['L2'] += 1
+            delays.append(L2_ROUND_TRIP)
+            node.l1[task_id] = now + L1_TTL
+        else:
+            served_by['computed'] += 1
+            finish, delay = node.compute(now, task)
+            delays.append(delay + L2_ROUND_TRIP)
+            in_flight[task_id] = (node.node_id, finish)
+            l2[task_id] = finish + L2_TTL
+            node.l1[task_id] = finish + L1_TTL
+
+    return served_by, float(np.mean(delays))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=1.0, help='Task arrivals per virtual second')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--status-interval', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    manager = import_service('manager', 'manager')
+    print(f"{'routing':<10}{'hit rate':>10}{'L1 hits':>9}{'L2 hits':>9}{'coalesced':>11}{'mean delay s':>14}")
+    for mode in ('weighted', 'affinity'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            served_by, mean_delay = simulate(manager, mode, args)
+        hits = args.tasks - served_by['computed']
+        print(f"{mode:<10}{hits / args.tasks:>10.3f}{served_by['L1'] / args.tasks:>9.3f}"
+              f"{served_by['L2'] / args.tasks:>9.3f}{served_by['coalesced'] / args.tasks:>11.3f}{mean_delay:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Microbenchmark: fog-node selection cost against node count.
+
+Compares the previous full rescan (re-parse every timestamp, recompute every
+weight) with the incremental weight index, interleaving one status update per
+selection as a busy manager would see.
+
+    python -m benchmarks.bench_selection --nodes 10 100 1000
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+
+from benchmarks.harness import import_service
+
+
+def random_status(number):
+    return {
+        'node_id': str(number),
+        'fog_node_number': str(number),
+        'cpu_usage': random.uniform(0, 100),
+        'memory_available': random.randint(0, 1024),
+        'total_memory': 1024,
+        'task_queue_length': random.randint(0, 32)
+    }
+
+
+def rescan_select(manager):
+    """The selection loop the manager used before the index, without its prints."""
+    best_fog_node, best_weight = None, float('inf')
+    current_time = datetime.now()
+    for fog_node in manager.fog_node_registry.nodes():
+        status = manager.fog_node_statuses.get(fog_node['node_id'])
+        if status:
+            status_timestamp = datetime.strptime(status['timestamp'], '%Y-%m-%d %H:%M:%S')
+            if (current_time - status_timestamp).total_seconds() <= manager.STATUS_TIMEOUT_SECONDS:
+                weight = manager.calculate_weight(status)
+                if weight < best_weight:
+                    best_fog_node, best_weight = fog_node, weight
+    return best_fog_node
+
+
+def measure(manager, select, node_count, selections):
+    start = time.perf_counter()
+    for i in range(selections):
+        manager.record_fog_node_status(random_status(i % node_count + 1))
+        select()
+    return (time.perf_counter() - start) / selections * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--selections', type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    manager = import_service('manager', 'manager')
+
+    print(f"{'nodes':>6}{'rescan us/op':>15}{'index us/op':>14}")
+    for node_count in args.nodes:
+        manager.fog_node_registry.reset()
+        manager.fog_node_statuses.clear()
+        for n in range(1, node_count + 1):
+            manager.register_fog_node({'node_id': str(n), 'url': f"http://fog_node{n}:5000"})
+            manager.record_fog_node_status(random_status(n))
+
+        rescan = measure(manager, lambda: rescan_select(manager), node_count, args.selections)
+        task = {'task_type': 'data_analysis', 'task_size': 40, 'deadline': 20}
+        index = measure(manager, lambda: manager.select_best_fog_node(task), node_count, args.selections)
+        print(f"{node_count:>6}{rescan:>15.1f}{index:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
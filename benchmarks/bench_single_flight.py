@@ -0,0 +1,51 @@
+"""Fire N concurrent identical tasks at one fog node and count the computations.
+
+With single-flight coalescing exactly one request computes the task; the others
+wait on it and are reported as ``coalesced``. Exits non-zero if more than one
+computation happened. Without a reachable Redis the node still coalesces
+in-process; with one, the cross-node lease is exercised as well.
+
+    python -m benchmarks.bench_single_flight --requests 20 --redis-host localhost
+"""
+import argparse
+import collections
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import import_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--task-size', type=int, default=10)
+    parser.add_argument('--redis-host', default='localhost')
+    parser.add_argument('--redis-port', type=int, default=6379)
+    args = parser.parse_args()
+
+    os.environ.update({'REDIS_HOST': args.redis_host, 'REDIS_PORT': str(args.redis_port),
+                       'FOG_MAX_QUEUE_LENGTH': str(args.requests)})
+    with contextlib.redirect_stdout(io.StringIO()):
+        fog_node = import_service('fog_nodes', 'fog_node')
+    # A unique task id so earlier runs' cached results do not interfere
+    task = {'task_type': f"single_flight_{time.time_ns()}", 'task_size': args.task_size, 'deadline': 30}
+
+    client = fog_node.app.test_client()
+    before = fog_node.executor.completed_tasks
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.requests) as pool, contextlib.redirect_stdout(io.StringIO()):
+        responses = list(pool.map(lambda _: client.post('/offload_task', json=task), range(args.requests)))
+    elapsed = time.perf_counter() - start
+    computations = fog_node.executor.completed_tasks - before
+
+    served_by = collections.Counter(str(response.json.get('cache_hit')) for response in responses)
+    print(f"requests: {args.requests}  computations: {computations}  elapsed: {elapsed:.2f}s  served by: {dict(served_by)}")
+    sys.exit(0 if computations == 1 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark: routing freshness and status message volume, polled vs pushed status.
+
+Simulates fog nodes on a virtual clock and routes every task through the
+manager's real ``select_best_fog_node``. In 'poll' mode nodes post a full
+status every ``--poll-interval`` seconds, as before. In 'stream' mode they post
+snapshots and push deltas through the real ``StatusPublisher``, delivered
+straight to the manager's ``apply_status_delta`` instead of through Redis, on
+a budget of the bytes polling every ``--poll-interval`` seconds sends. Reports
+the status messages and bytes sent, the queue length error the manager routes
+on, and task delays. Fails if streaming sends more bytes than polling, or is
+not fresher.
+
+    python -m benchmarks.bench_status_stream --tasks 3000 --rate 0.8
+"""
+import argparse
+import json
+import random
+
+import numpy as np
+
+from benchmarks.bench_routing import TASK_TYPES, SimulatedFogNode
+from benchmarks.harness import import_service
+from common.status_stream import StatusPublisher
+
+
+class DirectDelivery:
+    """Stands in for the Redis client: hands published deltas straight to the manager."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.bytes_sent = 0
+
+    def publish(self, channel, message):
+        self.bytes_sent += len(message)
+        self.manager.apply_status_delta(json.loads(message))
+
+
+def simulate(manager, mode, args):
+    rng = random.Random(args.seed)
+    manager.fog_node_registry.reset()
+    manager.fog_node_statuses.clear()
+    nodes = {str(n): SimulatedFogNode(str(n), args.workers) for n in range(1, args.nodes + 1)}
+    delivery = DirectDelivery(manager)
+    publishers, last_published = {}, {}
+    now = 0.0
+    for node_id, node in nodes.items():
+        manager.register_fog_node({'node_id': node_id, 'url': f"http://fog_node{node_id}:5000"})
+        publishers[node_id] = StatusPublisher(delivery, node_id, lambda node=node: node.status(now),
+                                              {'task_queue_length': args.queue_threshold,
+                                               'cpu_usage': args.cpu_threshold},
+                                              budget_interval=args.poll_interval,
+                                              snapshot_interval=args.snapshot_interval, clock=lambda: now)
+        last_published[node_id] = -1.0
+
+    next_status, snapshots, snapshot_bytes = 0.0, 0, 0
+    delays, errors = [], []
+
+    def send_snapshot(node_id, status):
+        nonlocal snapshots, snapshot_bytes
+        if mode == 'stream':
+            status.update(epoch=publishers[node_id].epoch, seq=publishers[node_id].next_seq())
+            publishers[node_id].snapshot_sent(status)
+        manager.record_fog_node_status(dict(status))
+        snapshots += 1
+        snapshot_bytes += len(json.dumps(status))
+
+    def push_changes(node_id):
+        # A node publishes at most once per min_interval; later changes wait for its next chance
+        if mode == 'stream' and now - last_published[node_id] >= args.min_interval:
+            if publishers[node_id].publish_changes():
+                last_published[node_id] = now
+
+    for _ in range(args.tasks):
+        now += rng.expovariate(args.rate)
+        while mode == 'poll' and next_status <= now:
+            for node_id, node in nodes.items():
+                send_snapshot(node_id, node.status(next_status))
+            next_status += args.poll_interval
+        for node_id, node in nodes.items():
+            if mode == 'stream' and publishers[node_id].snapshot_due():
+                send_snapshot(node_id, node.status(now))
+
+        # Tasks finished since the last arrival change the node's queue too
+        for node_id in nodes:
+            push_changes(node_id)
+        errors.extend(abs(manager.fog_node_statuses[node_id]['task_queue_length'] -
+                          node.status(now)['task_queue_length']) for node_id, node in nodes.items())
+
+        task = {'task_type': rng.choice(TASK_TYPES), 'task_size': rng.randint(10, 100), 'deadline': 30}
+        node_id = manager.select_best_fog_node(task)['node_id']
+        delays.append(nodes[node_id].compute(now, task)[1])
+        push_changes(node_id)
+
+    deltas = sum(publisher.published for publisher in publishers.values())
+    return {
+        'messages': snapshots + deltas,
+        'bytes': snapshot_bytes + delivery.bytes_sent,
+        'messages_per_min': (snapshots + deltas) / now * 60,
+        'kb_per_min': (snapshot_bytes + delivery.bytes_sent) / now * 60 / 1024,
+        'queue_error': np.mean(errors),
+        'mean_delay': np.mean(delays),
+        'p95_delay': np.percentile(delays, 95)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=3000)
+    parser.add_argument('--rate', type=float, default=0.8, help="Task arrivals per virtual second")
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--poll-interval', type=float, default=20.0)
+    parser.add_argument('--snapshot-interval', type=float, default=120.0)
+    parser.add_argument('--min-interval', type=float, default=1.0)
+    parser.add_argument('--queue-threshold', type=int, default=4)
+    parser.add_argument('--cpu-threshold', type=float, default=25.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    manager = import_service('manager', 'manager')
+    print(f"{'mode':<8}{'msgs/min':>10}{'KB/min':>9}{'queue err':>11}{'mean delay':>12}{'p95 delay':>11}")
+    results = {}
+    for mode in ('poll', 'stream'):
+        result = results[mode] = simulate(manager, mode, args)
+        print(f"{mode:<8}{result['messages_per_min']:>10.1f}{result['kb_per_min']:>9.1f}"
+              f"{result['queue_error']:>11.2f}{result['mean_delay']:>12.1f}{result['p95_delay']:>11.1f}")
+    assert results['stream']['bytes'] <= results['poll']['bytes'], "Streaming sent more bytes than polling"
+    assert results['stream']['queue_error'] < results['poll']['queue_error'], "Streaming was not fresher than polling"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark: fog node workload kernels run in threads, in a process pool with pickled inputs, and with shared memory.
+
+Each mode runs the same mixed tasks on ``--workers`` concurrent workers. In
+threads, kernels contend for the GIL between NumPy calls. The process pools
+compute in parallel, one by pickling every task's input array to its worker,
+the other (``WorkloadRunner``, as fog nodes with ``FOG_WORKLOAD=cpu`` use) by
+passing only the name of a shared memory block. Throughput only scales with
+workers up to the number of cores.
+
+    python -m benchmarks.bench_workloads --tasks 60 --workers 1 2 4 --task-size 50
+"""
+import argparse
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.harness import import_service
+
+TASK_TYPES = ["image_processing", "data_analysis", "video_streaming"]
+
+
+def timed_kernel(kernel, inputs, cpu_clock=time.process_time):
+    started_at, cpu_started_at = time.perf_counter(), cpu_clock()
+    kernel(inputs)
+    return cpu_clock() - cpu_started_at, time.perf_counter() - started_at
+
+
+def run_mode(mode, workloads, tasks, workers):
+    """Run the tasks in one mode; returns tasks per second, mean CPU seconds and bytes pickled per task."""
+    runner = workloads.WorkloadRunner(workers)
+    arrays, arguments = {}, {}
+    for task in tasks:  # Inputs are built before timing in every mode
+        workload = workloads.WORKLOADS[task['task_type']]
+        rows = workload.rows(task['task_size'], 1.0)
+        block, shape = runner._input(task['task_type'], rows)
+        arrays[task['task_type']] = np.ndarray(shape, workload.dtype, buffer=block.buf)[:rows].copy()
+        arguments[task['task_type']] = (task['task_type'], block.name, shape, workload.dtype.str, rows)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    process_pool = ProcessPoolExecutor(max_workers=workers)
+
+    if mode == 'threads':
+        pickled = 0
+
+        def run(task):
+            kernel = workloads.WORKLOADS[task['task_type']].kernel
+            return timed_kernel(kernel, arrays[task['task_type']], time.thread_time)
+    elif mode == 'processes, pickled':
+        pickled = np.mean([len(pickle.dumps(arrays[task['task_type']])) for task in tasks])
+
+        def run(task):
+            kernel = workloads.WORKLOADS[task['task_type']].kernel
+            return process_pool.submit(timed_kernel, kernel, arrays[task['task_type']]).result()
+    else:
+        pickled = np.mean([len(pickle.dumps(arguments[task['task_type']])) for task in tasks])
+        run = runner.run
+
+    list(pool.map(run, tasks[:workers]))  # Start the worker processes
+    started_at = time.perf_counter()
+    cpu_times = [cpu_time for cpu_time, _ in pool.map(run, tasks)]
+    elapsed = time.perf_counter() - started_at
+    pool.shutdown()
+    process_pool.shutdown()
+    runner.close()
+    return len(tasks) / elapsed, float(np.mean(cpu_times)), pickled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=60)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--task-size', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    workloads = import_service('fog_nodes', 'workloads')
+    rng = random.Random(args.seed)
+    tasks = [{'task_type': rng.choice(TASK_TYPES), 'task_size': args.task_size} for _ in range(args.tasks)]
+
+    print(f"{'mode':<22}{'workers':>8}{'tasks/s':>10}{'cpu ms/task':>13}{'pickled/task':>14}")
+    for workers in args.workers:
+        for mode in ('threads', 'processes, pickled', 'processes, shared'):
+            rate, cpu_time, pickled = run_mode(mode, workloads, tasks, workers)
+            print(f"{mode:<22}{workers:>8}{rate:>10.1f}{cpu_time * 1000:>13.1f}{pickled / 1024:>12.1f}KB")
+
+
+if __name__ == '__main__':
+    main()
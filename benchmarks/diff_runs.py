@@ -0,0 +1,94 @@
+"""Compare two runs of the same trace: throughput, latency and cache-hit metrics side by side.
+
+Takes two JSON reports of the same kind, either load generator reports
+(``iot_device/load_generator.py --report``) or simulation summaries
+(``simulation.run --output``). Replay one recorded trace for both, so the only
+difference between them is the change under test. Metrics that got worse by
+more than ``--threshold`` percent are flagged, and the exit status is 1 if any
+did, so the script can gate a regression run.
+
+    python -m benchmarks.diff_runs baseline.json candidate.json --threshold 5
+"""
+import argparse
+import json
+import sys
+
+# Metrics compared, with whether a higher value is better
+METRICS = {
+    # Load generator reports
+    'goodput': True,
+    'offered_rate': None,
+    'latency_ms.p50': False,
+    'latency_ms.p90': False,
+    'latency_ms.p99': False,
+    'latency_ms.p999': False,
+    'latency_ms.max': False,
+    'cache_hit_rate': True,
+    'mean_reported_delay': False,
+    'throttled': None,
+    'dropped': False,
+    # Simulation summaries
+    'deadline_met': True,
+    'mean_delay': False,
+    'mean_response_time': False,
+    'p95_response_time': False,
+    'total_energy': False,
+    'refused': False,
+    'answered_by_cloud': None,
+    'status_messages': None
+}
+
+
+def lookup(report, metric):
+    value = report
+    for key in metric.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) else None
+
+
+def diff(baseline, candidate, threshold):
+    """Return ``(metric, baseline value, candidate value, change in percent, regressed)`` for shared metrics."""
+    rows = []
+    for metric, higher_is_better in METRICS.items():
+        before, after = lookup(baseline, metric), lookup(candidate, metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / abs(before) * 100 if before else (0.0 if after == before else float('inf'))
+        worse = -change if higher_is_better else change
+        rows.append((metric, before, after, change, higher_is_better is not None and worse > threshold))
+    if 'statuses' in baseline and 'statuses' in candidate:
+        for status in sorted(set(baseline['statuses']) | set(candidate['statuses'])):
+            before, after = baseline['statuses'].get(status, 0), candidate['statuses'].get(status, 0)
+            change = (after - before) / before * 100 if before else (0.0 if after == before else float('inf'))
+            # Fewer successes or more failures is a regression
+            worse = -change if status == '200' else change
+            rows.append((f"statuses.{status}", before, after, change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=5.0, help="Percent change that counts as a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows = diff(baseline, candidate, args.threshold)
+    print(f"{'metric':<22}{'baseline':>14}{'candidate':>14}{'change':>10}")
+    for metric, before, after, change, regressed in rows:
+        print(f"{metric:<22}{before:>14.4g}{after:>14.4g}{change:>9.1f}%{'  REGRESSION' if regressed else ''}")
+    regressions = [row[0] for row in rows if row[4]]
+    print(f"{len(regressions)} regression(s) beyond {args.threshold}%" + (f": {', '.join(regressions)}"
+                                                                        if regressions else ''))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Helpers for running the real manager in-process against stub fog nodes."""
+import asyncio
+import importlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_service(directory, module_name):
+    """Import a service module from its directory, keeping its log files out of the repo."""
+    for path in (REPO_ROOT, os.path.join(REPO_ROOT, directory)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    os.chdir(tempfile.mkdtemp(prefix='bench_'))
+    module = importlib.import_module(module_name)
+    logging.disable(logging.CRITICAL)
+    return module
+
+
+def register_stub_nodes(manager, urls):
+    """Register the stub fog nodes with the manager and give each one a fresh, idle status."""
+    for fog_node in manager.fog_node_registry.nodes():
+        manager.fog_node_registry.deregister(fog_node['node_id'])
+    manager.fog_node_statuses.clear()
+    for i, url in enumerate(urls):
+        manager.register_fog_node({'node_id': str(i + 1), 'url': url})
+        manager.record_fog_node_status({
+            'node_id': str(i + 1),
+            'fog_node_number': str(i + 1),
+            'cpu_usage': 10.0,
+            'memory_available': 512,
+            'total_memory': 1024,
+            'task_queue_length': 0
+        })
+
+
+def start_flask_manager(manager, host='127.0.0.1'):
+    """Serve the Flask manager app on a free port, threaded like ``app.run``."""
+    return start_flask_service(manager, host)
+
+
+def start_flask_service(service, host='127.0.0.1'):
+    """Serve a Flask service module's ``app`` on a free port, threaded like ``app.run``."""
+    from werkzeug.serving import make_server
+    server = make_server(host, 0, service.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown, f"http://{host}:{server.server_port}"
+
+
+def start_async_manager(async_manager, host='127.0.0.1'):
+    """Serve the asyncio manager app on a free port from its own event loop thread."""
+    from aiohttp import web
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(async_manager.create_app(), access_log=None)
+
+    async def start():
+        await runner.setup()
+        site = web.TCPSite(runner, host, 0)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    port = asyncio.run_coroutine_threadsafe(start(), loop).result()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    return stop, f"http://{host}:{port}"
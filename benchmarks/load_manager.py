@@ -0,0 +1,66 @@
+"""Load test: how the Flask and asyncio managers scale with concurrent IoT clients.
+
+Each client is a closed-loop device sending tasks back to back through the
+manager to stub fog nodes that take ``--processing-time`` seconds per task.
+
+    python -m benchmarks.load_manager --clients 1 8 32 128 --processing-time 0.2
+"""
+import argparse
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.harness import (import_service, register_stub_nodes, start_async_manager,
+                                start_flask_manager)
+from benchmarks.stub_fog_node import start_stub_fog_node
+from common.http_client import create_session
+
+
+def drive(manager_url, clients, tasks_per_client):
+    task = {'task_type': 'data_analysis', 'task_size': 40, 'deadline': 20}
+
+    def client(_):
+        session = create_session(pool_maxsize=1)
+        latencies = []
+        for _ in range(tasks_per_client):
+            start = time.perf_counter()
+            response = session.post(manager_url + '/offload_task', json=task)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = np.concatenate([np.asarray(l, dtype=float) for l in pool.map(client, range(clients))])
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.percentile(latencies, 99) * 1000, clients * tasks_per_client - len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--tasks-per-client', type=int, default=5)
+    parser.add_argument('--processing-time', type=float, default=0.2)
+    parser.add_argument('--nodes', type=int, default=3)
+    args = parser.parse_args()
+
+    manager = import_service('manager', 'manager')
+    async_manager = import_service('manager', 'async_manager')
+    urls = [start_stub_fog_node(n + 1, args.processing_time)[1] for n in range(args.nodes)]
+
+    print(f"{'manager':<10}{'clients':>8}{'tasks/sec':>12}{'p99 ms':>10}{'errors':>8}")
+    for name, start in [('flask', start_flask_manager), ('asyncio', start_async_manager)]:
+        stop, manager_url = start(manager if name == 'flask' else async_manager)
+        for clients in args.clients:
+            register_stub_nodes(manager, urls)
+            with contextlib.redirect_stdout(io.StringIO()):  # select_best_fog_node prints per node
+                throughput, p99, errors = drive(manager_url, clients, args.tasks_per_client)
+            print(f"{name:<10}{clients:>8}{throughput:>12.1f}{p99:>10.1f}{errors:>8}")
+        stop()
+
+
+if __name__ == '__main__':
+    main()
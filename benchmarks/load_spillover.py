@@ -0,0 +1,105 @@
+"""Load test: goodput under overload with and without spillover to the cloud node.
+
+Tasks arrive open loop, as a Poisson process at ``--rate`` per second, at the
+manager. The manager routes them to stub fog nodes with ``--workers`` workers
+and ``--queue`` queue slots each, which answer 429 once full. With the cloud
+on, the manager forwards what the fog nodes refuse to the real cloud node
+service, run in-process with its modelled WAN round trip. Goodput counts the
+tasks answered with a result per second.
+
+    python -m benchmarks.load_spillover --rate 60 --duration 10
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.harness import (import_service, register_stub_nodes, start_async_manager, start_flask_manager,
+                                start_flask_service)
+from benchmarks.stub_fog_node import start_stub_fog_node
+from common.http_client import create_session
+
+
+def drive(manager_url, args):
+    rng = random.Random(args.seed)
+    sessions = threading.local()
+    task = {'task_type': 'data_analysis', 'task_size': args.task_size, 'deadline': 20}
+
+    def send(scheduled_at):
+        if not hasattr(sessions, 'http'):
+            sessions.http = create_session(pool_maxsize=1)
+        response = sessions.http.post(manager_url + '/offload_task', json=task)
+        # Latency from the scheduled arrival, so time spent waiting for a client thread counts too
+        latency = time.perf_counter() - scheduled_at
+        served_by = response.json().get('fog_node_number') if response.status_code == 200 else None
+        return response.status_code, served_by, latency
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        start = time.perf_counter()
+        arrival = start
+        while arrival < start + args.duration:
+            arrival += rng.expovariate(args.rate)
+            time.sleep(max(0.0, arrival - time.perf_counter()))
+            futures.append(pool.submit(send, arrival))
+        outcomes = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for status, _, latency in outcomes if status == 200])
+    return {
+        'offered': len(outcomes) / args.duration,
+        'goodput': len(latencies) / elapsed,
+        'cloud': sum(served_by == 'cloud' for _, served_by, _ in outcomes) / len(outcomes),
+        'errors': sum(status != 200 for status, _, _ in outcomes),
+        'p50': np.percentile(latencies, 50) * 1000 if len(latencies) else float('nan'),
+        'p99': np.percentile(latencies, 99) * 1000 if len(latencies) else float('nan')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=float, default=60, help="Task arrivals per second")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds of arrivals")
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=2, help="Tasks a stub fog node processes at a time")
+    parser.add_argument('--queue', type=int, default=4, help="Tasks a stub fog node queues before refusing")
+    parser.add_argument('--processing-time', type=float, default=0.2, help="Seconds a stub fog node takes per task")
+    parser.add_argument('--task-size', type=int, default=4, help="Size of every task, which sets its cloud time")
+    parser.add_argument('--wan-rtt', type=float, default=0.1, help="Cloud node WAN round trip in seconds")
+    parser.add_argument('--clients', type=int, default=256, help="Client threads sending the arrivals")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ['CLOUD_WAN_RTT'] = str(args.wan_rtt)
+    import_service('fog_nodes', 'executor')
+    cloud = import_service('cloud_node', 'cloud')
+    manager = import_service('manager', 'manager')
+    async_manager = import_service('manager', 'async_manager')
+    urls = [start_stub_fog_node(n + 1, args.processing_time, workers=args.workers, max_queue_length=args.queue)[1]
+            for n in range(args.nodes)]
+    cloud_url = start_flask_service(cloud)[1]
+
+    capacity = args.nodes * args.workers / args.processing_time
+    print(f"Fog capacity {capacity:.0f} tasks/s, offered {args.rate:.0f} tasks/s")
+    print(f"{'manager':<10}{'cloud':<7}{'offered/s':>10}{'goodput/s':>11}{'to cloud':>10}{'errors':>8}"
+          f"{'p50 ms':>9}{'p99 ms':>9}")
+    for name, start in [('flask', start_flask_manager), ('asyncio', start_async_manager)]:
+        stop, manager_url = start(manager if name == 'flask' else async_manager)
+        for spillover in (False, True):
+            manager.CLOUD_URL = async_manager.CLOUD_URL = cloud_url if spillover else ''
+            register_stub_nodes(manager, urls)
+            with contextlib.redirect_stdout(io.StringIO()):  # The Flask manager prints every task
+                result = drive(manager_url, args)
+            print(f"{name:<10}{'on' if spillover else 'off':<7}{result['offered']:>10.1f}{result['goodput']:>11.1f}"
+                  f"{result['cloud']:>10.1%}{result['errors']:>8}{result['p50']:>9.0f}{result['p99']:>9.0f}")
+        stop()
+
+
+if __name__ == '__main__':
+    main()
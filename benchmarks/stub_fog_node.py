@@ -0,0 +1,74 @@
+"""Minimal in-process fog node stand-ins used by the benchmarks.
+
+The stubs speak HTTP/1.1 so that clients can keep connections alive, and answer
+``/offload_task`` and ``/offload_batch`` with the same shape of response a real
+fog node produces. A stub started with ``workers`` processes that many requests
+at a time and queues up to ``max_queue_length`` more, answering the rest with
+429 like a fog node whose queue is full.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubFogNodeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Avoid delayed-ACK stalls on kept-alive connections
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+    def task_metrics(self, task):
+        return {
+            'task_id': f"{task.get('task_type')}_{task.get('task_size')}",
+            'fog_node_number': self.server.fog_node_number,
+            'from_cache': False,
+            'delay': self.server.processing_time,
+            'energy_consumption': 0,
+            'result': f"Processed {task.get('task_type')} on fog node {self.server.fog_node_number}",
+            'cache_hit': False
+        }
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if not self.server.slots.acquire(blocking=False):
+            self.respond(429, {'status': 'rejected', 'fog_node_number': self.server.fog_node_number,
+                               'message': 'Task queue is full'})
+            return
+        try:
+            with self.server.workers:
+                if self.server.processing_time:
+                    time.sleep(self.server.processing_time)
+        finally:
+            self.server.slots.release()
+
+        if self.path == '/offload_batch':
+            self.respond(200, {'results': [self.task_metrics(task) for task in payload['tasks']]})
+        else:
+            self.respond(200, self.task_metrics(payload))
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_fog_node(fog_node_number, processing_time=0.0, host='127.0.0.1', workers=None, max_queue_length=0):
+    """Start a stub fog node on a free port and return ``(server, url)``.
+
+    Without ``workers``, every request is processed at once.
+    """
+    server = ThreadingHTTPServer((host, 0), StubFogNodeHandler)
+    server.daemon_threads = True
+    server.fog_node_number = fog_node_number
+    server.processing_time = processing_time
+    unbounded = threading.BoundedSemaphore(2 ** 30)
+    server.workers = threading.BoundedSemaphore(workers) if workers else unbounded
+    server.slots = threading.BoundedSemaphore(workers + max_queue_length) if workers else unbounded
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
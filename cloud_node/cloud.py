@@ -1 +1,137 @@
+import os
+import time
+from flask import Flask, Response, jsonify, request
+from common.metrics import CONTENT_TYPE, REGISTRY, Counter, Gauge, Histogram
+from executor import DeadlineExpiredError, TaskExecutor, QueueFullError
+from instrumentation import PowerModel, TaskTimer
 
+app = Flask(__name__)
+
+port = int(os.getenv('PORT', 7000))
+
+# The cloud has far more workers than a fog node, each processing CLOUD_SERVICE_RATE task size units
+# per second (fog node workers process 10)
+workers = int(os.getenv('CLOUD_WORKERS', 64))
+max_queue_length = int(os.getenv('CLOUD_MAX_QUEUE_LENGTH', 1024))
+service_rate = float(os.getenv('CLOUD_SERVICE_RATE', 20))
+
+# Modelled WAN between the manager and the cloud: each request waits one round trip, and tasks are
+# transmitted at CLOUD_WAN_RATE size units per second (fog nodes are reached at 10 on the LAN)
+wan_round_trip = float(os.getenv('CLOUD_WAN_RTT', 0.1))
+wan_rate = float(os.getenv('CLOUD_WAN_RATE', 5))
+
+# Power model for task energy: a server drawing CLOUD_POWER_IDLE_WATTS idle and CLOUD_POWER_CORE_WATTS per busy core
+power_model = PowerModel(float(os.getenv('CLOUD_POWER_IDLE_WATTS', 100)),
+                         float(os.getenv('CLOUD_POWER_CORE_WATTS', 10)), workers)
+
+# Prometheus metrics, served on /metrics
+task_arrivals = Counter('cloud_task_arrivals', 'Tasks received from the manager', ['endpoint'])
+task_outcomes = Counter('cloud_tasks', 'Tasks answered, by how they were answered', ['outcome'])
+task_wait_seconds = Histogram('cloud_task_wait_seconds', 'Time computed tasks spent queued')
+task_delay_seconds = Histogram('cloud_task_delay_seconds', 'Delay reported for computed tasks')
+queue_depth = Gauge('cloud_queue_depth', 'Tasks waiting in the executor queue',
+                    fn=lambda: executor.stats()['queue_depth'])
+active_tasks = Gauge('cloud_active_tasks', 'Tasks being processed', fn=lambda: executor.active_tasks)
+
+
+def process_task(task):
+    """Simulate task processing in the cloud and measure it, as fog nodes do."""
+    with TaskTimer() as timer:
+        time.sleep(task['task_size'] / service_rate)  # Simulate processing
+
+    return {
+        'transmission_delay': task['task_size'] / wan_rate,
+        'propagation_delay': wan_round_trip / 2,
+        'processing_time': timer.wall_time,
+        'cpu_time': timer.cpu_time,
+        'energy_consumption': power_model.energy(timer.wall_time, timer.wall_time)  # A core busy while it sleeps
+    }
+
+
+# Bounded, deadline-ordered queue and worker pool that runs process_task; like fog nodes, it drops queued tasks
+# that can no longer finish within their deadline unless CLOUD_DROP_LATE_TASKS=0
+executor = TaskExecutor(process_task, workers=workers, max_queue_length=max_queue_length, service_rate=service_rate,
+                        drop_late=os.getenv('CLOUD_DROP_LATE_TASKS', '1') == '1')
+
+
+def submit_task(task):
+    """Queue a task, returning its future or the rejection to answer with when the queue is full."""
+    # The task must be processed within its deadline less the modelled WAN delays
+    deadline = task['deadline'] - task['task_size'] / wan_rate - wan_round_trip / 2 if 'deadline' in task else None
+    try:
+        return executor.submit(task, deadline=deadline), None
+    except QueueFullError as e:
+        task_outcomes.labels(outcome='rejected').inc()
+        return None, {'status': 'rejected', 'fog_node_number': 'cloud', 'message': str(e)}
+
+
+def task_metrics(task, future):
+    """Wait for a queued task and build its metrics, in the shape fog nodes answer with."""
+    try:
+        measurement = future.result()
+    except DeadlineExpiredError as e:
+        task_outcomes.labels(outcome='expired').inc()
+        return {'status': 'expired', 'fog_node_number': 'cloud', 'message': str(e)}
+    total_delay = (measurement['transmission_delay'] + measurement['propagation_delay'] + future.wait_time +
+                   measurement['processing_time'])
+
+    task_outcomes.labels(outcome='computed').inc()
+    task_wait_seconds.observe(future.wait_time)
+    task_delay_seconds.observe(total_delay)
+    task_result = {
+        'task_id': f"{task['task_type']}_{task['task_size']}",
+        'fog_node_number': 'cloud',
+        'from_cache': False,
+        'delay': total_delay,
+        'energy_consumption': measurement['energy_consumption'],
+        'result': f"Processed {task['task_type']} on the cloud node",
+        'cache_hit': False,
+        'wait_time': future.wait_time,
+        'processing_time': measurement['processing_time'],
+        'cpu_time': measurement['cpu_time']
+    }
+    if 'deadline' in task:
+        task_result['deadline_met'] = total_delay <= task['deadline']
+    return task_result
+
+
+@app.route('/metrics')
+def metrics():
+    """Expose counters and histograms in the Prometheus text format."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/status')
+def status():
+    """Report the cloud node's queue and timings."""
+    return jsonify({**executor.stats(), 'service_rate': service_rate, 'wan_round_trip': wan_round_trip})
+
+
+@app.route('/offload_task', methods=['POST'])
+def offload_task():
+    """Receive a task the fog nodes could not take and process it."""
+    task = request.json
+    task_arrivals.labels(endpoint='offload_task').inc()
+    time.sleep(wan_round_trip)  # Simulate the WAN
+
+    future, rejection = submit_task(task)
+    if rejection:
+        return jsonify(rejection), 429
+    task_result = task_metrics(task, future)
+    return jsonify(task_result), 504 if task_result.get('status') == 'expired' else 200
+
+
+@app.route('/offload_batch', methods=['POST'])
+def offload_batch():
+    """Receive a batch of tasks and return per-task results in the same order."""
+    tasks = request.json['tasks']
+    task_arrivals.labels(endpoint='offload_batch').inc(len(tasks))
+    time.sleep(wan_round_trip)  # Simulate the WAN, once for the whole batch
+
+    submitted = [submit_task(task) for task in tasks]
+    return jsonify({'results': [rejection or task_metrics(task, future)
+                                for task, (future, rejection) in zip(tasks, submitted)]})
+
+
+if __name__ == "__main__":
+    app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1 @@
+"""Helpers shared by the manager, fog node and IoT device services."""
@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
+
+    Latencies are recorded in whole microseconds. Values below
+    ``sub_bucket_count`` get a bucket each; above that, every power of two is
+    split into ``sub_bucket_count / 2`` equal buckets. Every value is therefore
+    kept to ``significant_digits`` decimal digits, whatever its magnitude, in a
+    few thousand counters. Percentiles report the highest value equivalent to
+    the bucket they fall in, as HdrHistogram does.
+    """
+
+    def __init__(self, significant_digits=3):
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count // 2
+        self.counts = {}  # bucket index -> count
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        return shift * self.sub_bucket_half + (value >> shift)
+
+    def _highest_equivalent(self, index):
+        shift = max(0, index // self.sub_bucket_half - 1)
+        return ((index - shift * self.sub_bucket_half + 1) << shift) - 1
+
+    def record(self, seconds, count=1):
+        value = max(0, int(round(seconds * 1e6)))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def record_many(self, seconds):
+        """Record an array of latencies at once, with the same buckets as ``record``."""
+        values = np.maximum(0, np.rint(np.asarray(seconds, dtype=float) * 1e6)).astype(np.int64)
+        if not values.size:
+            return
+        # frexp's exponent is the bit length of a positive integer
+        shift = np.maximum(0, np.frexp(values)[1] - self.sub_bucket_bits)
+        indexes, counts = np.unique(shift * self.sub_bucket_half + (values >> shift), return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += int(values.size)
+        self.sum += int(values.sum())
+        low, high = int(values.min()), int(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def merge(self, other):
+        """Add the counts of another histogram with the same precision."""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        for bound, pick in (('min', min), ('max', max)):
+            if getattr(other, bound) is not None:
+                mine = getattr(self, bound)
+                setattr(self, bound, getattr(other, bound) if mine is None else pick(mine, getattr(other, bound)))
+
+    def percentile(self, percentile):
+        """Latency in seconds at or below which ``percentile`` percent of the recorded values fall."""
+        if not self.total:
+            return None
+        target = max(1, math.ceil(percentile / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max) / 1e6
+        return self.max / 1e6
+
+    def mean(self):
+        return self.sum / self.total / 1e6 if self.total else None
+
+    def buckets(self):
+        """``(highest equivalent latency in seconds, count)`` for every non-empty bucket, ascending."""
+        return [(self._highest_equivalent(index) / 1e6, self.counts[index]) for index in sorted(self.counts)]
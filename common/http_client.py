@@ -0,0 +1,116 @@
+import itertools
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
+from urllib3.util.retry import Retry
+
+# Connection pool settings, shared by every service that talks HTTP
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))  # Number of per-host pools to keep
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))  # Keep-alive connections kept per host
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 2))  # Seconds to establish a connection
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 60))  # Seconds to wait for a response
+MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 2))  # Retries for failed connection attempts only
+
+
+class PooledSession(requests.Session):
+    """A requests session that applies default connect/read timeouts to every call."""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                   connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES):
+    """Create a keep-alive session with one connection pool per remote host.
+
+    Only connection errors are retried: a POST that reached the remote side is
+    never sent twice, so offloaded tasks are not duplicated.
+    """
+    retry = Retry(total=max_retries, connect=max_retries, read=0, status=0, other=0,
+                  backoff_factor=0.1, allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = PooledSession(timeout=(connect_timeout, read_timeout))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class ReplicaList:
+    """Client-side load balancing over the replicas of a service, e.g. the managers listed in MANAGER_URL.
+
+    Requests go to the replicas in turn. A replica that cannot be connected to
+    is skipped for ``retry_after`` seconds and the request goes to the next one:
+    it never reached the first, so no task is sent twice. Any other error, and
+    the connection error of the last replica tried, is raised.
+    """
+
+    def __init__(self, urls, session, retry_after=5.0):
+        self.urls = [url.strip().rstrip('/') for url in (urls.split(',') if isinstance(urls, str) else urls)
+                     if url.strip()]
+        self.session = session
+        self.retry_after = retry_after
+        self._down_until = {}  # url -> monotonic time to try it again
+        self._turn = itertools.count()
+
+    def replicas(self):
+        """Return the replicas in the order the next request tries them."""
+        start = next(self._turn)
+        now = time.monotonic()
+        replicas = [self.urls[(start + i) % len(self.urls)] for i in range(len(self.urls))]
+        # Replicas known to be down go last, in case they are back
+        replicas.sort(key=lambda url: self._down_until.get(url, 0) > now)
+        return replicas
+
+    def down(self, url):
+        self._down_until[url] = time.monotonic() + self.retry_after
+
+    def up(self, url):
+        self._down_until.pop(url, None)
+
+    def post(self, path, **kwargs):
+        """POST to ``path`` on the next replica that accepts a connection."""
+        replicas = self.replicas()
+        for i, url in enumerate(replicas):
+            try:
+                response = self.session.post(url + path, **kwargs)
+            except requests.ConnectionError as e:
+                if i == len(replicas) - 1 or not not_connected(e):
+                    raise
+                self.down(url)
+                continue
+            self.up(url)
+            return response
+
+
+class AsyncReplicaList(ReplicaList):
+    """``ReplicaList`` over an aiohttp session, with the same turns and failover."""
+
+    async def post(self, path, **kwargs):
+        """POST to ``path`` on the next replica that accepts a connection; returns the response, body read."""
+        import aiohttp  # Only the asyncio clients install it
+        replicas = self.replicas()
+        for i, url in enumerate(replicas):
+            try:
+                async with self.session.post(url + path, **kwargs) as response:
+                    await response.read()
+            except (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError):
+                if i == len(replicas) - 1:
+                    raise
+                self.down(url)
+                continue
+            self.up(url)
+            return response
+
+
+def not_connected(error):
+    """True if a requests ConnectionError happened before the request was sent."""
+    reason = error.args[0].reason if error.args and isinstance(error.args[0], MaxRetryError) else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
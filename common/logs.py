@@ -0,0 +1,124 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+# Set VERBOSE=0 to silence the per-request console output of the services
+VERBOSE = os.getenv('VERBOSE', '1') == '1'
+
+# Log level for the standard logging module, e.g. DEBUG, INFO or WARNING
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG').upper()
+
+
+def console(message):
+    """Print a per-request message unless verbose output is turned off."""
+    if VERBOSE:
+        print(message)
+
+
+def configure_logging(*handlers, level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(message)s'):
+    """Route standard logging through a queue so handlers write from a background thread."""
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter(format))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    return listener
+
+
+class BufferedLogWriter:
+    """Append-only log file written by a background thread in batches.
+
+    ``write`` only queues a line, so the request path never touches the disk.
+    The writer flushes every ``flush_interval`` seconds or ``batch_size`` lines,
+    and rotates the file to ``path.1``, ``path.2``... when it grows past
+    ``max_bytes`` or gets older than ``rotate_interval`` seconds (0 disables
+    either). ``header`` is written at the top of every new file. An existing
+    file with a different header is rotated away rather than appended to.
+    """
+
+    def __init__(self, path, header=None, truncate=False, flush_interval=1.0, batch_size=256,
+                 max_bytes=0, rotate_interval=0, backup_count=5):
+        self.path = path
+        self.header = header
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self._queue = queue.SimpleQueue()
+        self._stopped = threading.Event()
+
+        if not truncate and self._header_changed():
+            self._shift_backups()
+        self._open('w' if truncate else 'a')
+        self._thread = threading.Thread(target=self._run, name=f"log-writer-{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, line):
+        self._queue.put(line)
+
+    def close(self):
+        """Flush everything queued so far and stop the background thread."""
+        if not self._stopped.is_set():
+            self._stopped.set()
+            self._thread.join()
+
+    def _open(self, mode):
+        self._file = open(self.path, mode, newline='')
+        self._opened_at = time.monotonic()
+        if self.header is not None and self._file.tell() == 0:
+            self._file.write(self.header + '\n')
+
+    def _should_rotate(self):
+        return ((self.max_bytes and self._file.tell() >= self.max_bytes) or
+                (self.rotate_interval and time.monotonic() - self._opened_at >= self.rotate_interval))
+
+    def _header_changed(self):
+        if self.header is None or not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return False
+        with open(self.path, newline='') as f:
+            return f.readline().rstrip('\r\n') != self.header
+
+    def _shift_backups(self):
+        for n in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _rotate(self):
+        self._file.close()
+        self._shift_backups()
+        self._open('w')
+
+    def _run(self):
+        while True:
+            stopping = self._stopped.is_set()
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._file.write('\n'.join(batch) + '\n')
+                self._file.flush()
+                if self._should_rotate():
+                    self._rotate()
+            elif stopping:
+                self._file.close()
+                return
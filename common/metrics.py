@@ -0,0 +1,219 @@
+import bisect
+import threading
+
+# Default histogram buckets in seconds, from sub-millisecond selection up to long task delays
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+class _ThreadCells:
+    """Per-thread value cells, summed when scraped.
+
+    Each thread only updates its own list, so recording needs no lock; the lock
+    is taken once per thread, when its cell is created. Cells of threads that
+    have exited are folded into one retired cell on the next scrape, and when
+    new threads have doubled the cells since the last fold, so servers that
+    start a thread per request keep a bounded number of cells without scrapes.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._cells = []  # (thread, cell) of live threads
+        self._retired = [0.0] * size
+        self._fold_at = 16  # Cell count that triggers the next fold from ``cell``
+        self._lock = threading.Lock()
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = [0.0] * self.size
+            with self._lock:
+                self._cells.append((threading.current_thread(), cell))
+                if len(self._cells) >= self._fold_at:
+                    self._fold()
+            return cell
+
+    def _fold(self):
+        """Fold the cells of exited threads into the retired cell; called with the lock held."""
+        live = []
+        for thread, cell in self._cells:
+            if thread.is_alive():
+                live.append((thread, cell))
+            else:
+                self._retired = [total + value for total, value in zip(self._retired, cell)]
+        self._cells = live
+        self._fold_at = max(16, 2 * len(live))
+
+    def __len__(self):
+        return len(self._cells)
+
+    def totals(self):
+        with self._lock:
+            self._fold()
+            totals = list(self._retired)
+            for _, cell in self._cells:
+                totals = [total + value for total, value in zip(totals, cell)]
+        return totals
+
+
+class _CounterValue:
+    def __init__(self, fn=None):
+        self._fn = fn
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    def value(self):
+        return self._fn() if self._fn else self._cells.totals()[0]
+
+
+class _GaugeValue:
+    def __init__(self, fn=None):
+        self._fn = fn
+        self._value = 0
+
+    def set(self, value):
+        self._value = value  # A single assignment, atomic under the GIL
+
+    def inc(self, amount=1):
+        self._value += amount
+
+    def dec(self, amount=1):
+        self._value -= amount
+
+    def value(self):
+        return self._fn() if self._fn else self._value
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._cells = _ThreadCells(len(buckets) + 2)  # One per bucket, +Inf, then the sum
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def totals(self):
+        return self._cells.totals()
+
+
+class _Metric:
+    """A named metric, optionally split by labels into one child value per label combination."""
+    type = None
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, **labels):
+        """Return the child value for one combination of label values."""
+        key = tuple([str(labels[name]) for name in self.labelnames])
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for key, child in list(self._children.items()):
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.labelnames, key))
+            for name, labels, value in self._samples(child, label_text):
+                lines.append(f"{name}{{{labels}}} {format_value(value)}" if labels
+                             else f"{name} {format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count. ``fn`` reads a count maintained elsewhere instead of ``inc`` calls."""
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=(), registry=None, fn=None):
+        self._fn = fn
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _CounterValue(self._fn)
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def _samples(self, child, labels):
+        yield f"{self.name}_total", labels, child.value()
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from ``fn`` when scraped."""
+    type = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), registry=None, fn=None):
+        self._fn = fn
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _GaugeValue(self._fn)
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def _samples(self, child, labels):
+        yield self.name, labels, child.value()
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets, plus their sum and count."""
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def _samples(self, child, labels):
+        totals = child.totals()
+        cumulative = 0
+        separator = ',' if labels else ''
+        for bound, count in zip(self.buckets + (float('inf'),), totals[:-1]):
+            cumulative += count
+            yield f"{self.name}_bucket", f'{labels}{separator}le="{format_value(bound)}"', cumulative
+        yield f"{self.name}_sum", labels, totals[-1]
+        yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        """Prometheus text exposition format of every registered metric."""
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+# Content type of the Prometheus text format served on /metrics
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = Registry()
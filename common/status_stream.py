@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+
+import redis
+
+# Pub/sub channel on which fog nodes push status deltas to the manager
+STATUS_CHANNEL = 'fog_status_deltas'
+
+
+class StatusPublisher:
+    """Pushes small status deltas from a fog node to the manager over Redis pub/sub.
+
+    ``notify`` is called whenever the node's load may have changed (a task was
+    queued or finished). A background thread then collects the current status
+    and publishes only the fields that moved by at least their threshold since
+    the last status the manager received, at most once per ``min_interval``
+    seconds. It also samples the status every ``sample_interval`` seconds to
+    catch CPU and memory drift. Every status carries the publisher's ``epoch``
+    and a sequence number, so the manager can drop messages that arrive after a
+    newer one and still accept a restarted node counting from 1 again.
+
+    Deltas and the node's full snapshots share one budget in bytes: what
+    posting a snapshot of the current size every ``budget_interval`` seconds,
+    the rate at which nodes used to poll, would send, saved up for at most
+    ``snapshot_interval`` seconds. A delta is a fraction of a snapshot's size,
+    so the same bytes carry several deltas per polling interval, and a delta
+    waits for credit, so pushing never sends more bytes than polling did.
+    ``snapshot_due`` tells the node when to post a snapshot: after
+    ``heartbeat_interval`` seconds without a message, which keeps its status
+    from expiring at the manager, or once the last snapshot is
+    ``snapshot_interval`` seconds old.
+    """
+
+    def __init__(self, client, node_id, collect, thresholds, min_interval=1.0, budget_interval=20.0,
+                 heartbeat_interval=25.0, snapshot_interval=120.0, sample_interval=1.0, clock=time.monotonic):
+        self.client = client
+        self.node_id = node_id
+        self.collect = collect
+        self.thresholds = thresholds  # field -> smallest change worth a delta
+        self.min_interval = min_interval
+        self.budget_interval = budget_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.snapshot_interval = snapshot_interval
+        self.sample_interval = sample_interval
+        self.clock = clock
+        self.epoch = time.time()
+        self.published = 0  # Deltas published, for benchmarking
+        self._baseline = None  # Last status the manager received, as far as this node knows
+        self._seq = 0
+        self._snapshot_bytes = None  # Polling's bytes per budget_interval; None before the first snapshot
+        self._credit = 0.0  # Bytes the node may send now
+        self._credit_at = clock()
+        self._last_sent = self._last_snapshot = -float('inf')
+        self._changed = threading.Event()
+        self._lock = threading.Lock()
+
+    def notify(self):
+        self._changed.set()
+
+    def next_seq(self):
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def _refill(self, now):
+        if self._snapshot_bytes is not None:
+            rate = self._snapshot_bytes / self.budget_interval
+            self._credit = min(rate * self.snapshot_interval, self._credit + (now - self._credit_at) * rate)
+        self._credit_at = now
+
+    def snapshot_due(self):
+        """True if the node should post a full snapshot now, and has the credit for it."""
+        now = self.clock()
+        with self._lock:
+            if self._snapshot_bytes is None:
+                return True  # The initial snapshot, which the manager needs before any delta
+            self._refill(now)
+            return self._credit >= self._snapshot_bytes and (now - self._last_sent >= self.heartbeat_interval or
+                                                             now - self._last_snapshot >= self.snapshot_interval)
+
+    def snapshot_sent(self, status):
+        """Record a full status the manager received, as the baseline for later deltas."""
+        now = self.clock()
+        size = len(json.dumps(status))
+        with self._lock:
+            self._refill(now)
+            self._credit -= size  # Owed until refilled, when epoch and sequence number make it exceed the budget
+            # The budget is what polling sent: the same status, without the epoch and sequence number
+            self._snapshot_bytes = len(json.dumps({key: value for key, value in status.items()
+                                                   if key not in ('epoch', 'seq')}))
+            self._last_sent = self._last_snapshot = now
+            if self._baseline is None or status['seq'] > self._baseline['seq']:
+                self._baseline = status
+
+    def delta(self, status):
+        """Return the fields of ``status`` that crossed their threshold since the baseline, or None."""
+        with self._lock:
+            if self._baseline is None:
+                return None  # The manager has no snapshot to apply a delta to yet
+            fields = {field: status[field] for field, threshold in self.thresholds.items()
+                      if abs(status[field] - self._baseline[field]) >= threshold}
+        return fields or None
+
+    def _take_credit(self, size):
+        """Reserve credit for a delta of ``size`` bytes, unless it is short or a snapshot is owed first."""
+        now = self.clock()
+        with self._lock:
+            self._refill(now)
+            if self._credit < size or now - self._last_snapshot >= self.snapshot_interval:
+                return False
+            self._credit -= size
+            self._last_sent = now
+            return True
+
+    def publish_changes(self):
+        status = self.collect()
+        fields = self.delta(status)
+        if fields is None:
+            return False
+        seq = self.next_seq()  # A gap left by a delta that waits for credit is harmless
+        message = json.dumps({'node_id': self.node_id, 'epoch': self.epoch, 'seq': seq, 'fields': fields},
+                             separators=(',', ':'))
+        if not self._take_credit(len(message)):
+            return False  # A change left waiting for credit goes out with the next sample
+        try:
+            self.client.publish(STATUS_CHANNEL, message)
+        except redis.RedisError as e:
+            print(f"Status delta not published, the manager keeps the last snapshot: {e}")
+            with self._lock:
+                self._credit += len(message)
+            return False
+        with self._lock:
+            self._baseline = {**self._baseline, **fields, 'seq': seq}
+        self.published += 1
+        return True
+
+    def run(self):
+        while True:
+            self._changed.wait(timeout=self.sample_interval)
+            self._changed.clear()
+            self.publish_changes()
+            time.sleep(self.min_interval)  # Changes during the pause go out together in the next delta
+
+    def start(self):
+        publisher_thread = threading.Thread(target=self.run, name='status-publisher')
+        publisher_thread.daemon = True
+        publisher_thread.start()
+
+
+def is_stale_status(previous, status):
+    """True if ``status`` is older than ``previous`` from the same run of a fog node."""
+    return (previous is not None and 'seq' in status and previous.get('epoch') == status.get('epoch')
+            and status['seq'] <= previous.get('seq', 0))
+
+
+def listen_for_status_deltas(host, port, apply_delta, retry_delay=5):
+    """Call ``apply_delta`` with every status delta fog nodes publish. Runs forever; start it in a daemon thread."""
+    while True:
+        try:
+            # Dedicated connection without a read timeout, since nodes stay quiet while their load is steady
+            subscriber = redis.Redis(host=host, port=port, socket_connect_timeout=1.0)
+            pubsub = subscriber.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(STATUS_CHANNEL)
+            for message in pubsub.listen():
+                apply_delta(json.loads(message['data']))
+        except redis.RedisError as e:
+            print(f"Status delta listener lost Redis, retrying in {retry_delay}s: {e}")
+            time.sleep(retry_delay)
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+# One row per task arrival, 21 bytes before compression. Task types are stored once per trace and
+# referenced by index.
+ARRIVAL_DTYPE = np.dtype([
+    ('offset', '<f8'),  # Seconds since the recording started
+    ('device', '<u4'),
+    ('task_type', 'u1'),
+    ('task_size', '<u4'),
+    ('deadline', '<f4')
+])
+
+TRACE_VERSION = 1
+
+# Arrivals per chunk file of a recorded trace: 1.3 MB in memory while it fills
+CHUNK_ROWS = 65536
+
+
+def chunk_path(path, index):
+    """The file of chunk ``index`` of the trace recorded at ``path``: ``arrivals.npz`` has ``arrivals.000.npz``, ..."""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{index:03d}{extension or '.npz'}"
+
+
+def chunk_paths(path):
+    """The files of the trace at ``path``, in recording order. A trace saved as a single file is its own chunk."""
+    if os.path.isfile(path):
+        return [path]
+    paths = []
+    while os.path.isfile(chunk_path(path, len(paths))):
+        paths.append(chunk_path(path, len(paths)))
+    if not paths:
+        raise FileNotFoundError(f"No trace at {path} or {chunk_path(path, 0)}")
+    return paths
+
+
+class TraceRecorder:
+    """Records task arrivals into a compact columnar trace, in compressed ``.npz`` chunks.
+
+    ``record`` is cheap and thread-safe: it fills a preallocated array of
+    ``chunk_rows`` arrivals. Once ``start`` is called, ``save`` runs every
+    ``save_interval`` seconds. It writes the arrays filled since as the next
+    chunks (see ``chunk_path``), and atomically rewrites the chunk being filled,
+    so a crashed run still leaves a readable trace. Memory and save time stay
+    bounded by the chunk size however long the run. Chunks left at ``path`` by
+    an earlier recording are removed.
+    """
+
+    def __init__(self, path, save_interval=10, chunk_rows=CHUNK_ROWS, clock=time.monotonic):
+        self.path = path
+        self.save_interval = save_interval
+        self.chunk_rows = chunk_rows
+        self.clock = clock
+        self.started_at = clock()
+        self.recorded = 0
+        self._rows = np.empty(chunk_rows, dtype=ARRIVAL_DTYPE)
+        self._filled = 0  # Rows of the current chunk recorded so far
+        self._chunk = 0  # Index of the current chunk
+        self._full_chunks = []  # (index, arrivals, task types) of chunks filled and not written yet
+        self._task_types = {}  # task type -> index in the trace's type table
+        self._lock = threading.Lock()
+        index = 0
+        while os.path.isfile(chunk_path(path, index)):
+            os.remove(chunk_path(path, index))
+            index += 1
+
+    def record(self, task, device=0):
+        with self._lock:
+            offset = self.clock() - self.started_at  # Read under the lock, so offsets never go back
+            task_type = self._task_types.setdefault(task['task_type'], len(self._task_types))
+            self._rows[self._filled] = (offset, device, task_type, task['task_size'], task['deadline'])
+            self._filled += 1
+            self.recorded += 1
+            if self._filled == self.chunk_rows:
+                self._full_chunks.append((self._chunk, self._rows, list(self._task_types)))
+                self._rows = np.empty(self.chunk_rows, dtype=ARRIVAL_DTYPE)
+                self._filled = 0
+                self._chunk += 1
+
+    def save(self):
+        with self._lock:
+            chunks, self._full_chunks = self._full_chunks, []
+            if self._filled:
+                chunks.append((self._chunk, self._rows[:self._filled].copy(), list(self._task_types)))
+        for index, arrivals, task_types in chunks:
+            path = chunk_path(self.path, index)
+            temporary_path = path + '.tmp'
+            with open(temporary_path, 'wb') as f:
+                np.savez_compressed(f, arrivals=arrivals, task_types=np.array(task_types, dtype=str),
+                                    version=TRACE_VERSION)
+            os.replace(temporary_path, path)
+
+    def run(self):
+        while True:
+            time.sleep(self.save_interval)
+            self.save()
+
+    def start(self):
+        saver_thread = threading.Thread(target=self.run, name='trace-recorder')
+        saver_thread.daemon = True
+        saver_thread.start()
+
+    def __len__(self):
+        return self.recorded
+
+
+def load_trace(path):
+    """Return the arrivals array (``ARRIVAL_DTYPE``, in offset order) and task type names of one trace file."""
+    with np.load(path) as trace:
+        arrivals = trace['arrivals']
+        task_types = [str(task_type) for task_type in trace['task_types']]
+    return np.sort(arrivals, order='offset', kind='stable'), task_types
+
+
+def trace_tasks(path, speed=1.0):
+    """Yield ``(offset, device, task)`` for every arrival of a trace, with offsets divided by ``speed``.
+
+    Chunks are read one at a time, so a long trace never has to fit in memory.
+    """
+    for chunk in chunk_paths(path):
+        arrivals, task_types = load_trace(chunk)
+        for offset, device, task_type, task_size, deadline in arrivals.tolist():
+            yield offset / speed, device, {
+                'task_type': task_types[task_type],
+                'task_size': task_size,
+                'deadline': int(deadline) if deadline == int(deadline) else deadline
+            }
@@ -0,0 +1,128 @@
+import os
+import socket
+from dataclasses import dataclass, field, fields
+from typing import List
+
+# Node sizes selected with FOG_PROFILE. A profile only changes defaults; any variable set explicitly wins.
+PROFILES = {
+    'small': {'workers': 1, 'max_queue_length': 16, 'cpu_speed': 0.5, 'l1_cache_size': 256,
+              'power_idle_watts': 1.5, 'power_core_watts': 2.0},
+    'medium': {},
+    'large': {'workers': 4, 'max_queue_length': 64, 'cpu_speed': 2.0, 'l1_cache_size': 2048,
+              'power_idle_watts': 8.0, 'power_core_watts': 6.0}
+}
+
+
+def setting(default, env):
+    """A config field with its default and the environment variable that sets it."""
+    return field(default=default, metadata={'env': env})
+
+
+@dataclass(frozen=True)
+class FogNodeConfig:
+    """Everything that differs between fog nodes, read from the environment by ``from_env``.
+
+    Each field is set by the environment variable named in its metadata.
+    ``FOG_PROFILE`` picks a node size from ``PROFILES`` as the starting point,
+    so one image runs heterogeneous nodes.
+    """
+
+    # Identity
+    fog_node_number: str = setting('1', 'FOG_NODE_NUMBER')
+    port: int = setting(5000, 'PORT')
+    node_id: str = setting(socket.gethostname(), 'FOG_NODE_ID')
+    advertise_url: str = setting('', 'ADVERTISE_URL')  # Defaults to http://<hostname>:<port>
+    task_types: List[str] = setting(None, 'FOG_TASK_TYPES')
+    manager_url: str = setting('http://manager:6000', 'MANAGER_URL')  # Comma-separated for several replicas
+    profile: str = setting('medium', 'FOG_PROFILE')
+
+    # Executor: worker pool and queue bound, and how fast a worker processes tasks. A worker handles
+    # service_rate * cpu_speed task size units per second.
+    workers: int = setting(2, 'FOG_WORKERS')
+    max_queue_length: int = setting(32, 'FOG_MAX_QUEUE_LENGTH')
+    executor: str = setting('thread', 'FOG_EXECUTOR')
+    service_rate: float = setting(10.0, 'FOG_SERVICE_RATE')
+    cpu_speed: float = setting(1.0, 'FOG_CPU_SPEED')
+    # Drop queued tasks that can no longer finish within their deadline instead of processing them
+    drop_late_tasks: bool = setting(True, 'FOG_DROP_LATE_TASKS')
+
+    # 'sleep' simulates processing time from the service rate; 'cpu' runs a NumPy kernel per task type in a
+    # process pool (see workloads.py), with workload_scale / cpu_speed times the work per unit of task size
+    workload: str = setting('sleep', 'FOG_WORKLOAD')
+    workload_scale: float = setting(1.0, 'FOG_WORKLOAD_SCALE')
+
+    # Power model for task energy (see instrumentation.py): watts drawn by the idle node and by each busy core
+    power_idle_watts: float = setting(3.0, 'FOG_POWER_IDLE_WATTS')
+    power_core_watts: float = setting(4.0, 'FOG_POWER_CORE_WATTS')
+
+    # Link from the manager: tasks are transmitted at link_rate size units per second after propagation_delay
+    link_rate: float = setting(10.0, 'FOG_LINK_RATE')
+    propagation_delay: float = setting(0.1, 'FOG_PROPAGATION_DELAY')
+
+    # Cache tiers: in-process L1 (0 entries disables it) in front of Redis
+    redis_host: str = setting('redis_cache', 'REDIS_HOST')
+    redis_port: int = setting(6379, 'REDIS_PORT')
+    redis_max_connections: int = setting(16, 'REDIS_MAX_CONNECTIONS')
+    redis_socket_timeout: float = setting(1.0, 'REDIS_SOCKET_TIMEOUT')
+    l1_cache_size: int = setting(512, 'L1_CACHE_SIZE')
+    l1_cache_ttl: float = setting(60.0, 'L1_CACHE_TTL')
+    l2_cache_ttl: int = setting(600, 'CACHE_TTL')
+    lease_time: float = setting(30.0, 'CACHE_LEASE_SECONDS')
+
+    # Status reporting: snapshots over HTTP, deltas over Redis once a field moves by its threshold. Both share a
+    # budget of the bytes a snapshot per status_budget_interval, the old polling rate, sends (see status_stream.py).
+    status_budget_interval: float = setting(20.0, 'STATUS_BUDGET_SECONDS')
+    status_heartbeat_interval: float = setting(25.0, 'STATUS_HEARTBEAT_SECONDS')  # Below the manager's 30 s timeout
+    status_snapshot_interval: float = setting(120.0, 'STATUS_SNAPSHOT_SECONDS')
+    status_delta_queue: int = setting(4, 'STATUS_DELTA_QUEUE')  # Tasks
+    status_delta_cpu: float = setting(25.0, 'STATUS_DELTA_CPU')  # Percentage points
+    status_delta_memory: float = setting(0.05, 'STATUS_DELTA_MEMORY')  # Share of total memory
+    status_delta_min_interval: float = setting(1.0, 'STATUS_DELTA_MIN_INTERVAL')
+
+    # Task log rotation
+    log_max_bytes: int = setting(100 * 1024 * 1024, 'LOG_MAX_BYTES')
+    log_rotate_seconds: float = setting(0.0, 'LOG_ROTATE_SECONDS')
+    log_backup_count: int = setting(5, 'LOG_BACKUP_COUNT')
+
+    def __post_init__(self):
+        if self.task_types is None:
+            object.__setattr__(self, 'task_types', ['image_processing', 'data_analysis', 'video_streaming'])
+        if not self.advertise_url:
+            object.__setattr__(self, 'advertise_url', f"http://{socket.gethostname()}:{self.port}")
+        for name in ('workers', 'service_rate', 'cpu_speed', 'workload_scale', 'link_rate'):
+            if getattr(self, name) <= 0:
+                raise ValueError(f"{name} must be positive, got {getattr(self, name)}")
+        for name in ('power_idle_watts', 'power_core_watts', 'propagation_delay'):
+            if getattr(self, name) < 0:
+                raise ValueError(f"{name} must not be negative, got {getattr(self, name)}")
+        if self.executor not in ('thread', 'process'):
+            raise ValueError(f"FOG_EXECUTOR must be 'thread' or 'process', got {self.executor!r}")
+        if self.workload not in ('sleep', 'cpu'):
+            raise ValueError(f"FOG_WORKLOAD must be 'sleep' or 'cpu', got {self.workload!r}")
+        if self.workload == 'cpu' and self.executor == 'process':
+            raise ValueError("FOG_WORKLOAD=cpu runs kernels in its own process pool and needs FOG_EXECUTOR=thread")
+
+    @property
+    def processing_rate(self):
+        """Task size units one worker processes per second."""
+        return self.service_rate * self.cpu_speed
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        profile = environ.get('FOG_PROFILE', 'medium')
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown FOG_PROFILE {profile!r}, expected one of {', '.join(PROFILES)}")
+        values = dict(PROFILES[profile], profile=profile)
+        for setting_field in fields(cls):
+            raw = environ.get(setting_field.metadata['env'])
+            if raw:
+                values[setting_field.name] = parse(setting_field.type, raw)
+        return cls(**values)
+
+
+def parse(field_type, raw):
+    if field_type == List[str]:
+        return [item.strip() for item in raw.split(',') if item.strip()]
+    if field_type == bool:
+        return raw.lower() in ('1', 'true', 'yes', 'on')
+    return field_type(raw)
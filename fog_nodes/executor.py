@@ -0,0 +1,149 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+# Smoothing factor for the moving averages of wait time, service time and service rate
+EWMA_ALPHA = 0.2
+
+
+class QueueFullError(Exception):
+    """Raised when a task is submitted while the fog node's queue is full."""
+
+
+class DeadlineExpiredError(Exception):
+    """Set on the future of a task dropped from the queue because it could no longer finish within its deadline."""
+
+
+class TaskExecutor:
+    """Bounded, deadline-ordered task queue served by a fixed pool of workers.
+
+    Tasks with the earliest absolute deadline are served first. When the queue
+    already holds ``max_queue_length`` tasks, ``submit`` raises QueueFullError so
+    the caller can push back instead of piling up request threads.
+    With ``kind='process'``, tasks run in a pool of worker processes started
+    from a fork server, so ``process`` must pickle: a module-level function or
+    a method of an importable class, not a function of the node's script.
+    ``on_change`` is called without arguments whenever a task is queued or finishes.
+    ``service_rate`` is the expected per-worker rate, reported until tasks have been measured.
+    With ``drop_late``, a worker drops a task instead of processing it when the
+    task would finish after its deadline at the measured service rate.
+    """
+
+    def __init__(self, process, workers=2, max_queue_length=32, kind='thread', on_change=None, service_rate=0.0,
+                 drop_late=False):
+        self._process = process
+        self._on_change = on_change or (lambda: None)
+        self._queue = queue.PriorityQueue(maxsize=max_queue_length)
+        self._sequence = itertools.count()  # Keeps FIFO order between equal deadlines
+        self._lock = threading.Lock()
+        # Workers start from a fork server rather than forking the node's threads and locks, as in WorkloadRunner
+        self._process_pool = None
+        if kind == 'process':
+            self._process_pool = ProcessPoolExecutor(max_workers=workers,
+                                                     mp_context=multiprocessing.get_context('forkserver'))
+        self._drop_late = drop_late
+
+        self.workers = workers
+        self.max_queue_length = max_queue_length
+        self.active_tasks = 0
+        self.completed_tasks = 0
+        self.rejected_tasks = 0
+        self.expired_tasks = 0
+        self.avg_wait_time = 0.0
+        self.avg_service_time = 0.0
+        self.avg_service_rate = service_rate  # task_size units processed per second by one worker
+
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"fog-worker-{i}", daemon=True).start()
+
+    def submit(self, task, deadline=None):
+        """Queue a task and return a Future resolving to ``process(task)``.
+
+        ``deadline`` is the seconds from now the task must be processed within,
+        by default its ``deadline`` field. The future's ``wait_time`` and
+        ``service_time`` attributes hold the seconds the task spent queued and
+        being processed; a dropped task fails with DeadlineExpiredError.
+        """
+        future = Future()
+        enqueued_at = time.monotonic()
+        deadline = enqueued_at + (task.get('deadline', float('inf')) if deadline is None else deadline)
+        try:
+            self._queue.put_nowait((deadline, next(self._sequence), enqueued_at, task, future))
+        except queue.Full:
+            with self._lock:
+                self.rejected_tasks += 1
+            raise QueueFullError(f"Task queue is full ({self.max_queue_length} tasks)")
+        self._on_change()
+        return future
+
+    def _worker(self):
+        while True:
+            deadline, _, enqueued_at, task, future = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started_at = time.monotonic()
+            if self._drop_late and started_at + self._expected_service_time(task) > deadline:
+                # Processing it would only waste a worker on a result that arrives too late
+                with self._lock:
+                    self.expired_tasks += 1
+                future.wait_time, future.service_time = started_at - enqueued_at, 0.0
+                self._on_change()
+                future.set_exception(DeadlineExpiredError(
+                    f"Deadline expired after {started_at - enqueued_at:.2f}s in the queue"))
+                continue
+
+            with self._lock:
+                self.active_tasks += 1
+            try:
+                if self._process_pool:
+                    result = self._process_pool.submit(self._process, task).result()
+                else:
+                    result = self._process(task)
+            except Exception as e:
+                result, error = None, e
+            else:
+                error = None
+            finished_at = time.monotonic()
+
+            with self._lock:
+                self.active_tasks -= 1
+                self.completed_tasks += 1
+                self.avg_wait_time += EWMA_ALPHA * ((started_at - enqueued_at) - self.avg_wait_time)
+                self.avg_service_time += EWMA_ALPHA * ((finished_at - started_at) - self.avg_service_time)
+                if task.get('task_size') and finished_at > started_at:
+                    rate = task['task_size'] / (finished_at - started_at)
+                    # Without an expected rate, the first sample replaces the initial 0, which is no rate at all
+                    self.avg_service_rate += (EWMA_ALPHA if self.avg_service_rate else 1) * (rate - self.avg_service_rate)
+
+            future.wait_time = started_at - enqueued_at
+            future.service_time = finished_at - started_at
+            self._on_change()
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _expected_service_time(self, task):
+        with self._lock:
+            service_rate = self.avg_service_rate
+        return task.get('task_size', 0) / service_rate if service_rate else 0.0
+
+    def stats(self):
+        """Snapshot of queue depth and timings for status updates."""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'active_tasks': self.active_tasks,
+                'workers': self.workers,
+                'max_queue_length': self.max_queue_length,
+                'completed_tasks': self.completed_tasks,
+                'rejected_tasks': self.rejected_tasks,
+                'expired_tasks': self.expired_tasks,
+                'avg_wait_time': round(self.avg_wait_time, 4),
+                'avg_service_time': round(self.avg_service_time, 4),
+                'avg_service_rate': round(self.avg_service_rate, 4)
+            }
@@ -0,0 +1,431 @@
+import psutil
+import time
+import threading
+import csv
+import io
+from flask import Flask, Response, jsonify, request
+from datetime import datetime
+from common.http_client import ReplicaList, create_session
+from common.logs import BufferedLogWriter
+from common.metrics import CONTENT_TYPE, REGISTRY, Counter, Gauge, Histogram
+from common.status_stream import StatusPublisher
+from config import FogNodeConfig
+from executor import EWMA_ALPHA, DeadlineExpiredError, TaskExecutor, QueueFullError
+from instrumentation import PowerModel, TaskModel, TaskTimer, UsageAverages
+from result_cache import ResultCache
+from single_flight import SingleFlight
+from workloads import WorkloadRunner
+
+app = Flask(__name__)
+
+# Keep-alive HTTP session used for status updates to the manager
+http = create_session()
+
+# Identity, sizing, cache tiers and status settings of this node, from FOG_PROFILE and the environment
+# (see config.py). Every fog node runs this script; only the configuration differs.
+config = FogNodeConfig.from_env()
+
+# Manager replicas this node registers with and sends status snapshots to, each in turn
+managers = ReplicaList(config.manager_url, http)
+
+# Two-tier result cache: in-process L1 in front of Redis with a per-node connection pool.
+# A missing Redis only disables the shared tier.
+cache = ResultCache(config.redis_host, config.redis_port, ttl=config.l2_cache_ttl,
+                    max_connections=config.redis_max_connections,
+                    socket_timeout=config.redis_socket_timeout,
+                    l1_max_entries=config.l1_cache_size,
+                    l1_ttl=config.l1_cache_ttl,
+                    origin=config.node_id)
+if cache.ping():
+    print(f"Connected to Redis at {config.redis_host}:{config.redis_port}")
+
+# Identical tasks computing concurrently on this node share one computation
+task_flights = SingleFlight()
+
+# A full status snapshot goes to the manager over HTTP every STATUS_SNAPSHOT_SECONDS, or after
+# STATUS_HEARTBEAT_SECONDS without a message. In between, load changes are pushed as deltas over Redis once a
+# field moves by its STATUS_DELTA_* threshold, within a budget of one message per STATUS_BUDGET_SECONDS.
+status_delta_thresholds = {
+    'task_queue_length': config.status_delta_queue,
+    'cpu_usage': config.status_delta_cpu,
+    'memory_available': config.status_delta_memory * psutil.virtual_memory().total
+}
+
+# Energy of computed tasks from their measured CPU time, and its averages reported in status updates
+power_model = PowerModel(config.power_idle_watts, config.power_core_watts, config.workers)
+task_model = TaskModel(config.processing_rate, config.link_rate, config.propagation_delay, power_model)
+task_usage = UsageAverages(EWMA_ALPHA)
+
+# Latest CPU usage, sampled by a background thread so the status path never blocks on it
+cpu_usage = psutil.cpu_percent()
+
+log_file = f"fog_node_{config.fog_node_number}_log.csv"  # CSV Log file for task metrics
+
+# CSV Logging, written in batches by a background thread and appended to across restarts
+task_log = BufferedLogWriter(log_file,
+                             header='task_id,fog_node_number,from_cache,delay,energy_consumption,result,cache_hit,'
+                                    'timestamp,wait_time,processing_time,cpu_time,deadline_met',
+                             max_bytes=config.log_max_bytes,
+                             rotate_interval=config.log_rotate_seconds,
+                             backup_count=config.log_backup_count)
+
+# Prometheus metrics, served on /metrics
+task_arrivals = Counter('fog_task_arrivals', 'Tasks received from the manager', ['endpoint'])
+task_outcomes = Counter('fog_tasks', 'Tasks answered, by how they were answered', ['outcome'])
+task_wait_seconds = Histogram('fog_task_wait_seconds', 'Time computed tasks spent queued')
+task_service_seconds = Histogram('fog_task_service_seconds', 'Time computed tasks spent being processed')
+task_delay_seconds = Histogram('fog_task_delay_seconds', 'Delay reported for computed tasks')
+task_cpu_seconds = Histogram('fog_task_cpu_seconds', 'CPU time of computed tasks')
+task_energy_joules = Counter('fog_task_energy_joules', 'Energy estimated for computed tasks')
+task_deadlines = Counter('fog_task_deadlines', 'Computed tasks that met or missed their deadline, or were dropped',
+                         ['outcome'])
+queue_depth = Gauge('fog_queue_depth', 'Tasks waiting in the executor queue',
+                    fn=lambda: executor.stats()['queue_depth'])
+active_tasks = Gauge('fog_active_tasks', 'Tasks being processed', fn=lambda: executor.active_tasks)
+cache_l1_hits = Counter('fog_cache_l1_hits', 'Lookups answered by the in-process cache', fn=lambda: cache.l1_hits)
+cache_l2_hits = Counter('fog_cache_l2_hits', 'Lookups answered by Redis', fn=lambda: cache.l2_hits)
+cache_misses = Counter('fog_cache_misses', 'Lookups found in neither cache', fn=lambda: cache.misses)
+
+
+# Function to log metrics to CSV file
+def log_task_metrics_csv(metrics):
+    row = io.StringIO()
+    csv.writer(row, lineterminator='').writerow([
+        metrics['task_id'], metrics['fog_node_number'], metrics['from_cache'], metrics['delay'],
+        metrics['energy_consumption'], metrics['result'], metrics['cache_hit'], round(time.time(), 3),
+        metrics['wait_time'], metrics['processing_time'], metrics['cpu_time'], metrics.get('deadline_met', '')])
+    task_log.write(row.getvalue())
+
+
+def cached_task_metrics(task_id, cached_result, cache_tier):
+    """Build and log the metrics of a task answered from the cache; ``cache_hit`` names the tier."""
+    task_metrics = {
+        'task_id': task_id,
+        'fog_node_number': config.fog_node_number,
+        'from_cache': True,
+        'delay': 0,
+        'energy_consumption': 0,
+        'result': cached_result,
+        'cache_hit': cache_tier,
+        'wait_time': 0,
+        'processing_time': 0,
+        'cpu_time': 0,
+        'deadline_met': True
+    }
+    task_outcomes.labels(outcome='cached').inc()
+    log_task_metrics_csv(task_metrics)
+    return task_metrics
+
+
+def computed_task_metrics(task, task_id, future):
+    """Wait for a queued task and log its metrics; the caller caches the result.
+
+    A task the executor dropped for its deadline is answered as expired.
+    """
+    # Wait for the worker to process the task; the delay adds the time it spent queued to the measured processing
+    try:
+        measurement = future.result()
+    except DeadlineExpiredError as e:
+        return expired_task_metrics(e)
+    total_delay = (measurement['transmission_delay'] + measurement['propagation_delay'] + future.wait_time +
+                   measurement['processing_time'])
+
+    result = f"Processed {task['task_type']} on fog node {config.fog_node_number}"
+
+    task_metrics = {
+        'task_id': task_id,
+        'fog_node_number': config.fog_node_number,
+        'from_cache': False,
+        'delay': total_delay,
+        'energy_consumption': measurement['energy_consumption'],
+        'result': result,
+        'cache_hit': False,
+        'wait_time': future.wait_time,
+        'processing_time': measurement['processing_time'],
+        'cpu_time': measurement['cpu_time']
+    }
+    if 'deadline' in task:
+        task_metrics['deadline_met'] = total_delay <= task['deadline']
+        task_deadlines.labels(outcome='met' if task_metrics['deadline_met'] else 'missed').inc()
+    task_outcomes.labels(outcome='computed').inc()
+    task_wait_seconds.observe(future.wait_time)
+    task_service_seconds.observe(future.service_time)
+    task_delay_seconds.observe(total_delay)
+    task_cpu_seconds.observe(measurement['cpu_time'])
+    task_energy_joules.inc(measurement['energy_consumption'])
+    task_usage.record(task['task_size'], measurement['cpu_time'], measurement['energy_consumption'])
+    log_task_metrics_csv(task_metrics)
+    return task_metrics
+
+
+def coalesced_task_metrics(leader_metrics):
+    """Build and log the metrics of a task that waited on an identical task already being computed."""
+    if leader_metrics.get('status') in ('rejected', 'expired'):
+        return leader_metrics
+    task_metrics = {**leader_metrics, 'from_cache': True, 'energy_consumption': 0, 'cpu_time': 0,
+                    'cache_hit': 'coalesced'}
+    task_outcomes.labels(outcome='coalesced').inc()
+    log_task_metrics_csv(task_metrics)
+    return task_metrics
+
+
+def rejected_task_metrics(error):
+    task_outcomes.labels(outcome='rejected').inc()
+    return {'status': 'rejected', 'fog_node_number': config.fog_node_number, 'message': str(error)}
+
+
+def expired_task_metrics(error):
+    task_outcomes.labels(outcome='expired').inc()
+    task_deadlines.labels(outcome='expired').inc()
+    return {'status': 'expired', 'fog_node_number': config.fog_node_number, 'message': str(error)}
+
+
+def processing_deadline(task):
+    """Seconds a task may take from being queued to being processed: its deadline less the modelled link delays."""
+    if 'deadline' not in task:
+        return None
+    return task['deadline'] - task['task_size'] / config.link_rate - config.propagation_delay
+
+
+def compute_tasks(tasks_by_id):
+    """Compute tasks once across all fog nodes and return their metrics by task id.
+
+    Tasks another fog node is computing are answered with its result from Redis
+    (see ``ResultCache.compute_once``).
+    """
+    task_metrics = {}
+    queued = {}
+
+    def start(task_id):
+        try:
+            task = tasks_by_id[task_id]
+            queued[task_id] = executor.submit(task, deadline=processing_deadline(task))
+        except QueueFullError as e:
+            task_metrics[task_id] = rejected_task_metrics(e)
+
+    def finish(task_id):
+        if task_id in queued:
+            task_metrics[task_id] = computed_task_metrics(tasks_by_id[task_id], task_id, queued[task_id])
+        return task_metrics[task_id].get('result')
+
+    for task_id, result in cache.compute_once(list(tasks_by_id), start, finish, config.lease_time).items():
+        task_metrics[task_id] = cached_task_metrics(task_id, result, 'L2')
+    return task_metrics
+
+
+def run_single_flight(tasks_by_id):
+    """Compute the tasks no other request on this node is computing, and wait for the rest.
+
+    Returns metrics by task id; tasks that joined another request's computation
+    are reported as coalesced.
+    """
+    flights = {task_id: task_flights.claim(task_id) for task_id in tasks_by_id}
+    leading = {task_id: tasks_by_id[task_id] for task_id, (_, is_leader) in flights.items() if is_leader}
+
+    if leading:
+        try:
+            computed = compute_tasks(leading)
+        except Exception as e:
+            for task_id in leading:
+                flights[task_id][0].set_exception(e)
+            raise
+        for task_id, task_metrics in computed.items():
+            flights[task_id][0].set_result(task_metrics)
+
+    return {task_id: flight.result() if is_leader else coalesced_task_metrics(flight.result())
+            for task_id, (flight, is_leader) in flights.items()}
+
+
+@app.route('/metrics')
+def metrics():
+    """Expose counters and histograms in the Prometheus text format."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/offload_task', methods=['POST'])
+def offload_task():
+    """Receive and process a task, checking the caches first."""
+    task = request.json
+    task_arrivals.labels(endpoint='offload_task').inc()
+    task_id = f"{task['task_type']}_{task['task_size']}"
+
+    # Check the local and Redis caches for the task result
+    cached_result, cache_tier = cache.get(task_id)
+    if cached_result:
+        return jsonify(cached_task_metrics(task_id, cached_result, cache_tier))
+
+    # Compute once, even if identical tasks arrive here or at other fog nodes at the same time
+    task_metrics = run_single_flight({task_id: task})[task_id]
+    if task_metrics.get('status') == 'rejected':
+        return jsonify(task_metrics), 429
+    if task_metrics.get('status') == 'expired':
+        return jsonify(task_metrics), 504  # Dropped before processing, as it could not meet its deadline
+    return jsonify(task_metrics)
+
+
+@app.route('/offload_batch', methods=['POST'])
+def offload_batch():
+    """Receive a batch of tasks and return per-task results in the same order."""
+    tasks = request.json['tasks']
+    task_arrivals.labels(endpoint='offload_batch').inc(len(tasks))
+    results = [None] * len(tasks)
+    misses = {}
+    pending = []
+
+    # Look up the whole batch locally, then in one MGET round trip for the rest
+    task_ids = [f"{task['task_type']}_{task['task_size']}" for task in tasks]
+    cached_results = cache.get_many(task_ids)
+
+    # Answer cached tasks right away and compute each distinct missing task once
+    for i, (task, task_id, (cached_result, cache_tier)) in enumerate(zip(tasks, task_ids, cached_results)):
+        if cached_result:
+            results[i] = cached_task_metrics(task_id, cached_result, cache_tier)
+        else:
+            misses.setdefault(task_id, task)
+            pending.append((i, task_id))
+
+    computed = run_single_flight(misses)
+    answered = set()
+    for i, task_id in pending:
+        results[i] = computed[task_id] if task_id not in answered else coalesced_task_metrics(computed[task_id])
+        answered.add(task_id)
+
+    return jsonify({'results': results})
+
+
+def process_task(task):
+    """Process a task, simulated or with its workload kernel, and measure it.
+
+    Returns the modelled transmission and propagation delays of the task, the
+    measured wall and CPU time of processing it and the energy it used.
+    """
+    if not workload_runner:
+        return task_model.simulate(task)
+    with TaskTimer() as timer:
+        # Real compute in a worker process, which reports the kernel's CPU time
+        cpu_time, _ = workload_runner.run(task)
+        timer.add_cpu_time(cpu_time)
+    return task_model.report(task, timer, busy_time=timer.cpu_time)
+
+
+def current_status():
+    """The node's load as reported to the manager."""
+    memory_info = psutil.virtual_memory()
+    executor_stats = executor.stats()
+    return {
+        'node_id': config.node_id,
+        'fog_node_number': config.fog_node_number,
+        'cpu_usage': cpu_usage,
+        'memory_available': memory_info.available,
+        'total_memory': memory_info.total,
+        'task_queue_length': executor_stats['queue_depth'] + executor_stats['active_tasks'],
+        **executor_stats,
+        **task_usage.stats(),
+        'missed_deadlines': int(task_deadlines.labels(outcome='missed').value()),
+        **cache.stats(),
+        'transmission_rate': config.link_rate,
+        'propagation_delay': config.propagation_delay,
+        'port': config.port,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+# Process pool running the workload kernels, with FOG_WORKLOAD=cpu
+workload_runner = (WorkloadRunner(config.workers, scale=config.workload_scale / config.cpu_speed)
+                   if config.workload == 'cpu' else None)
+
+# Pushes status deltas to the manager as tasks are queued and finish
+status_publisher = StatusPublisher(cache.client, config.node_id, current_status, status_delta_thresholds,
+                                   min_interval=config.status_delta_min_interval,
+                                   budget_interval=config.status_budget_interval,
+                                   heartbeat_interval=config.status_heartbeat_interval,
+                                   snapshot_interval=config.status_snapshot_interval)
+
+# Bounded, deadline-ordered queue and worker pool that runs process_task. Process workers are sent the
+# importable task_model.simulate instead, since FOG_EXECUTOR=process only simulates processing.
+executor = TaskExecutor(process_task if config.executor == 'thread' else task_model.simulate,
+                        workers=config.workers, max_queue_length=config.max_queue_length, kind=config.executor,
+                        on_change=status_publisher.notify,
+                        service_rate=config.processing_rate if config.workload == 'sleep' else 0.0,
+                        drop_late=config.drop_late_tasks)
+
+
+def register_with_manager():
+    """Advertise this fog node's URL, capacity and task types to the manager."""
+    registration = {
+        'node_id': config.node_id,
+        'fog_node_number': config.fog_node_number,
+        'url': config.advertise_url,
+        'capacity': config.workers,
+        'task_types': config.task_types
+    }
+    try:
+        response = managers.post('/register', json=registration)
+        if response.status_code == 200:
+            print(f"Registered with manager as {config.node_id} at {config.advertise_url}")
+            return True
+        print(f"Manager rejected registration: {response.status_code}")
+    except Exception as e:
+        print(f"Error registering with manager: {e}")
+    return False
+
+
+def sample_cpu():
+    """Keep ``cpu_usage`` current, averaged over one-second windows."""
+    global cpu_usage
+    while True:
+        cpu_usage = psutil.cpu_percent(interval=1)
+
+
+def send_status_to_manager():
+    """Send a full status snapshot to the central manager whenever the status publisher says one is due."""
+    update_interval = config.status_budget_interval
+    max_retries = 3  # Maximum number of retries in case of failure
+    retry_delay = 5  # Delay between retries in case of failure
+    registered = False
+
+    while True:
+        if not registered:
+            registered = register_with_manager()
+        if not status_publisher.snapshot_due():
+            time.sleep(1)
+            continue
+
+        status_data = {**current_status(), 'epoch': status_publisher.epoch, 'seq': status_publisher.next_seq()}
+
+        success = False
+        for attempt in range(max_retries):
+            try:
+                # Send status to manager
+                response = managers.post('/status_update', json=status_data)
+                if response.status_code == 200:
+                    status_publisher.snapshot_sent(status_data)
+                    success = True
+                    break  # Exit the retry loop on success
+                if response.status_code == 404:
+                    # The manager does not know this node (e.g. it restarted), so register again
+                    registered = register_with_manager()
+            except Exception as e:
+                print(f"Error sending status update, attempt {attempt + 1}/{max_retries}: {e}")
+                time.sleep(retry_delay)  # Wait before retrying
+
+        if not success:
+            print(f"Failed to send status update after {max_retries} attempts. Will try again after {update_interval} seconds.")
+            time.sleep(update_interval)
+
+
+if __name__ == "__main__":
+    cache.start_invalidation_listener()
+    status_publisher.start()
+
+    cpu_thread = threading.Thread(target=sample_cpu)
+    cpu_thread.daemon = True
+    cpu_thread.start()
+
+    status_thread = threading.Thread(target=send_status_to_manager)
+    status_thread.daemon = True
+    status_thread.start()
+
+    # No reloader: its parent process would run this block too, and start a second set of the threads above
+    app.run(host='0.0.0.0', port=config.port, debug=True, use_reloader=False)
+
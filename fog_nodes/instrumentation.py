@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+class PowerModel:
+    """Estimates the energy a task used from its measured CPU time and how long it held a worker.
+
+    A busy core draws ``core_watts`` on top of the node's ``idle_watts``, and
+    each of the ``workers`` is charged an equal share of the idle power for as
+    long as it processes a task. Energy is in joules.
+    """
+
+    def __init__(self, idle_watts, core_watts, workers):
+        self.idle_watts = idle_watts
+        self.core_watts = core_watts
+        self.workers = workers
+
+    def energy(self, cpu_time, processing_time):
+        return self.core_watts * cpu_time + self.idle_watts * processing_time / self.workers
+
+
+class TaskTimer:
+    """Measures the wall time and CPU time of a block of code run on one thread.
+
+    CPU time is the calling thread's (``time.thread_time``), so tasks running
+    side by side on other workers are not counted. Work handed to another
+    process reports its CPU time with ``add_cpu_time``.
+    """
+
+    def __enter__(self):
+        self._offloaded_cpu_time = 0.0
+        self._started_at, self._cpu_started_at = time.perf_counter(), time.thread_time()
+        return self
+
+    def add_cpu_time(self, cpu_time):
+        self._offloaded_cpu_time += cpu_time
+
+    def __exit__(self, *exc_info):
+        self.wall_time = time.perf_counter() - self._started_at
+        self.cpu_time = time.thread_time() - self._cpu_started_at + self._offloaded_cpu_time
+
+
+class TaskModel:
+    """The reported delays and energy of a node's tasks, and their simulated processing.
+
+    A task is transmitted at ``link_rate`` size units per second after
+    ``propagation_delay``, and a simulated task is processed by sleeping for
+    ``task_size / processing_rate`` seconds. The model pickles, so ``simulate``
+    can run in a process pool.
+    """
+
+    def __init__(self, processing_rate, link_rate, propagation_delay, power_model):
+        self.processing_rate = processing_rate
+        self.link_rate = link_rate
+        self.propagation_delay = propagation_delay
+        self.power_model = power_model
+
+    def simulate(self, task):
+        """Process a task by sleeping, and return its report."""
+        with TaskTimer() as timer:
+            time.sleep(task['task_size'] / self.processing_rate)
+        # A simulated task stands in for a core busy while it sleeps, so its energy is charged for that time
+        return self.report(task, timer, busy_time=timer.wall_time)
+
+    def report(self, task, timer, busy_time):
+        """The task's modelled delays, the measured times of processing it and the energy of ``busy_time``."""
+        return {
+            'transmission_delay': task['task_size'] / self.link_rate,
+            'propagation_delay': self.propagation_delay,
+            'processing_time': timer.wall_time,
+            'cpu_time': timer.cpu_time,
+            'energy_consumption': self.power_model.energy(busy_time, timer.wall_time)
+        }
+
+
+class UsageAverages:
+    """Moving averages of the CPU time and energy of computed tasks per unit of task size, for status updates."""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.avg_cpu_per_unit = 0.0
+        self.avg_energy_per_unit = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, task_size, cpu_time, energy):
+        if not task_size:
+            return
+        with self._lock:
+            # The first sample replaces the initial 0, which is no measurement at all
+            alpha = self.alpha if self.avg_energy_per_unit else 1
+            self.avg_cpu_per_unit += alpha * (cpu_time / task_size - self.avg_cpu_per_unit)
+            self.avg_energy_per_unit += alpha * (energy / task_size - self.avg_energy_per_unit)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'avg_cpu_per_unit': round(self.avg_cpu_per_unit, 6),
+                'avg_energy_per_unit': round(self.avg_energy_per_unit, 6)
+            }
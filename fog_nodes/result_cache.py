@@ -0,0 +1,280 @@
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+# Pub/sub channel on which fog nodes announce cache writes so others drop stale L1 entries
+INVALIDATION_CHANNEL = 'result_cache_invalidations'
+
+# Key prefix of the leases a fog node holds while it computes a result for the other nodes
+LEASE_PREFIX = 'lease:'
+
+# Deletes a lease only if this node still holds it
+RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LocalCache:
+    """Bounded in-process cache with per-entry TTL and least-recently-used eviction.
+
+    ``clock`` returns the current time in seconds, monotonic by default.
+    """
+
+    def __init__(self, max_entries=512, ttl=60, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value), oldest use first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResultCache:
+    """Two-tier task result cache: an in-process L1 in front of Redis (L2), shared by all fog nodes.
+
+    Uses an explicit connection pool and batches lookups (MGET) and writes
+    (pipelined SET with EX). Every write is announced on a pub/sub channel so
+    the other nodes drop their L1 copy. Any Redis error is reported and treated
+    as a cache miss or a skipped write, so the node keeps computing without the cache.
+    """
+
+    def __init__(self, host, port, ttl=600, max_connections=16, socket_timeout=1.0,
+                 l1_max_entries=512, l1_ttl=60, origin='', client=None):
+        self.ttl = ttl
+        self.origin = str(origin)  # Identifies this node's own invalidation messages and leases
+        self.host, self.port, self.socket_timeout = host, port, socket_timeout
+        if client is None:
+            self.pool = redis.ConnectionPool(host=host, port=port, max_connections=max_connections,
+                                             socket_connect_timeout=socket_timeout, socket_timeout=socket_timeout,
+                                             health_check_interval=30)
+            client = redis.Redis(connection_pool=self.pool)
+        self.client = client
+        self._release_lease = self.client.register_script(RELEASE_LEASE_SCRIPT)
+        self.local = LocalCache(l1_max_entries, l1_ttl)
+        self.round_trips = 0  # Redis round trips made, for benchmarking
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+
+    def ping(self):
+        try:
+            self.round_trips += 1
+            return self.client.ping()
+        except redis.RedisError as e:
+            print(f"Redis unavailable, computing without cache: {e}")
+            return False
+
+    def get(self, task_id):
+        """Return ``(result, tier)`` for ``task_id``: tier is 'L1' or 'L2', or ``(None, None)`` on a miss."""
+        return self.get_many([task_id])[0]
+
+    def get_many(self, task_ids):
+        """Look up several task ids, going to Redis with one MGET for the L1 misses only."""
+        found = [(result, 'L1') if result is not None else None
+                 for result in (self.local.get(task_id) for task_id in task_ids)]
+        remote = [i for i, entry in enumerate(found) if entry is None]
+
+        if remote:
+            try:
+                self.round_trips += 1
+                remote_results = self.client.mget([task_ids[i] for i in remote])
+            except redis.RedisError as e:
+                print(f"Redis lookup failed, computing without cache: {e}")
+                remote_results = [None] * len(remote)
+            for i, result in zip(remote, remote_results):
+                if result is None:
+                    found[i] = (None, None)
+                else:
+                    result = result.decode()
+                    self.local.set(task_ids[i], result)
+                    found[i] = (result, 'L2')
+
+        for _, tier in found:
+            if tier == 'L1':
+                self.l1_hits += 1
+            elif tier == 'L2':
+                self.l2_hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def set(self, task_id, result):
+        self.set_many({task_id: result})
+
+    def set_many(self, results):
+        """Cache a ``{task_id: result}`` mapping in L1 and in Redis with one pipelined round trip."""
+        if not results:
+            return
+        for task_id, result in results.items():
+            self.local.set(task_id, result)
+        try:
+            self.round_trips += 1
+            pipeline = self.client.pipeline(transaction=False)
+            for task_id, result in results.items():
+                pipeline.set(task_id, result, ex=self.ttl)
+                pipeline.publish(INVALIDATION_CHANNEL, f"{self.origin}|{task_id}")
+            pipeline.execute()
+        except redis.RedisError as e:
+            print(f"Redis write failed, results not cached: {e}")
+
+    def compute_once(self, task_ids, start, finish, lease_time):
+        """Compute every task id once across all the nodes sharing Redis; returns the results other nodes delivered.
+
+        A lease is taken per task id, and the leased tasks are started here
+        with ``start(task_id)``. For the others this node waits until their
+        result arrives, or until their lease is released or expires without one
+        and it can take the lease itself. ``finish(task_id)`` then waits for
+        each started task and returns its result, or None if it has none. The
+        results are cached in one round trip, and the leases released.
+        """
+        pending = list(task_ids)
+        delivered = {}
+        leased, started = [], []
+        try:
+            while pending:
+                acquired, found = self.acquire_leases(pending, lease_time)
+                leased += acquired
+                delivered.update(found)
+                for task_id in acquired:
+                    if task_id not in found:
+                        start(task_id)
+                        started.append(task_id)
+                waiting = [task_id for task_id in pending if task_id not in found and task_id not in acquired]
+                if waiting:
+                    delivered.update(self.wait_for_results(waiting, lease_time))
+                pending = [task_id for task_id in waiting if task_id not in delivered]
+
+            results = {task_id: finish(task_id) for task_id in started}
+            self.set_many({task_id: result for task_id, result in results.items() if result is not None})
+        finally:
+            self.release_leases(leased)
+        return delivered
+
+    def acquire_leases(self, task_ids, lease_time):
+        """Try to become the only node computing each task id, in one pipelined round trip.
+
+        Returns ``(acquired, found)``: the task ids leased to this node, and the
+        results already in Redis by task id, which no longer need computing.
+        Without Redis every lease counts as acquired, so the node simply computes.
+        """
+        if not task_ids:
+            return [], {}
+        try:
+            self.round_trips += 1
+            pipeline = self.client.pipeline(transaction=False)
+            for task_id in task_ids:
+                pipeline.set(LEASE_PREFIX + task_id, self.origin, nx=True, px=int(lease_time * 1000))
+                pipeline.get(task_id)  # A result cached since this node's lookup
+            replies = pipeline.execute()
+        except redis.RedisError as e:
+            print(f"Redis lease failed, computing without coordination: {e}")
+            return list(task_ids), {}
+        acquired = [task_id for task_id, reply in zip(task_ids, replies[::2]) if reply]
+        found = {task_id: result.decode() for task_id, result in zip(task_ids, replies[1::2]) if result is not None}
+        for task_id, result in found.items():
+            self.local.set(task_id, result)
+        self.l2_hits += len(found)
+        return acquired, found
+
+    def release_leases(self, task_ids):
+        if not task_ids:
+            return
+        try:
+            self.round_trips += 1
+            pipeline = self.client.pipeline(transaction=False)
+            for task_id in task_ids:
+                self._release_lease(keys=[LEASE_PREFIX + task_id], args=[self.origin], client=pipeline)
+            pipeline.execute()
+        except redis.RedisError as e:
+            print(f"Redis lease release failed, leases will expire on their own: {e}")
+
+    def wait_for_results(self, task_ids, timeout, poll_interval=0.1):
+        """Poll Redis until other nodes cache results for ``task_ids`` or ``timeout`` passes.
+
+        Stops early when a lease is gone without a result, so the caller can
+        take it over. Returns ``{task_id: result}`` for the results that arrived.
+        """
+        results = {}
+        pending = list(task_ids)
+        deadline = time.monotonic() + timeout
+        while pending and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            try:
+                self.round_trips += 1
+                pipeline = self.client.pipeline(transaction=False)
+                pipeline.mget(pending)
+                pipeline.mget([LEASE_PREFIX + task_id for task_id in pending])
+                found, leases = pipeline.execute()
+            except redis.RedisError as e:
+                print(f"Redis lookup failed while waiting for results: {e}")
+                break
+            released = False
+            for task_id, result, lease in zip(pending, found, leases):
+                if result is not None:
+                    results[task_id] = result.decode()
+                    self.local.set(task_id, results[task_id])
+                elif lease is None:
+                    released = True  # Its node gave up the lease without a result, so the task is free to take
+            pending = [task_id for task_id in pending if task_id not in results]
+            if released:
+                break
+        self.l2_hits += len(results)
+        return results
+
+    def listen_for_invalidations(self, retry_delay=5):
+        """Drop L1 entries that other nodes overwrite. Runs forever; start it in a daemon thread."""
+        while True:
+            try:
+                # Dedicated connection without a read timeout, since the channel may stay quiet for long
+                subscriber = redis.Redis(host=self.host, port=self.port, socket_connect_timeout=self.socket_timeout)
+                pubsub = subscriber.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    origin, _, task_id = message['data'].decode().partition('|')
+                    if origin != self.origin:
+                        self.local.delete(task_id)
+            except redis.RedisError as e:
+                print(f"Cache invalidation listener lost Redis, retrying in {retry_delay}s: {e}")
+                time.sleep(retry_delay)
+
+    def start_invalidation_listener(self):
+        listener_thread = threading.Thread(target=self.listen_for_invalidations)
+        listener_thread.daemon = True
+        listener_thread.start()
+
+    def stats(self):
+        return {
+            'cache_l1_hits': self.l1_hits,
+            'cache_l2_hits': self.l2_hits,
+            'cache_misses': self.misses,
+            'cache_l1_entries': len(self.local)
+        }
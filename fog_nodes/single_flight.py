@@ -0,0 +1,33 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesces concurrent work on the same key within one fog node.
+
+    The first caller to claim a key becomes its leader and must resolve the
+    returned future; callers that claim the key while it is pending get the same
+    future and only wait for it. The key is released once the future is resolved.
+    """
+
+    def __init__(self):
+        self._flights = {}  # key -> Future of the pending computation
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        """Return ``(future, is_leader)`` for ``key``."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return future, False
+            future = self._flights[key] = Future()
+        future.add_done_callback(lambda _: self._release(key, future))
+        return future, True
+
+    def _release(self, key, future):
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def __len__(self):
+        return len(self._flights)
@@ -0,0 +1,154 @@
+import atexit
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 5x5 Gaussian blur weights
+GAUSSIAN_5X5 = np.outer([1, 4, 6, 4, 1], [1, 4, 6, 4, 1]).astype(np.float32) / 256
+
+# RGB to YCbCr (ITU-R BT.601)
+RGB_TO_YCBCR = np.array([[0.299, 0.587, 0.114],
+                         [-0.168736, -0.331264, 0.5],
+                         [0.5, -0.418688, -0.081312]], dtype=np.float32)
+
+# Orthonormal 8-point DCT-II matrix and the JPEG luminance quantization table
+DCT_8 = np.array([[math.sqrt((1 if k == 0 else 2) / 8) * math.cos((2 * n + 1) * k * math.pi / 16)
+                   for n in range(8)] for k in range(8)], dtype=np.float32)
+LUMINANCE_QUANTIZATION = np.array([
+    [16, 11, 10, 16, 24, 40, 51, 61], [12, 12, 14, 19, 26, 58, 60, 55],
+    [14, 13, 16, 24, 40, 57, 69, 56], [14, 17, 22, 29, 51, 87, 80, 62],
+    [18, 22, 37, 56, 68, 109, 103, 77], [24, 35, 55, 64, 81, 104, 113, 92],
+    [49, 64, 78, 87, 103, 121, 120, 101], [72, 92, 95, 98, 112, 100, 103, 99]], dtype=np.float32)
+
+
+def convolve(image):
+    """Gaussian blur followed by the Sobel gradient magnitude of a grayscale image."""
+    height, width = image.shape[0] - 4, image.shape[1] - 4
+    blurred = np.zeros((height, width), dtype=np.float32)
+    for dy in range(5):
+        for dx in range(5):
+            blurred += GAUSSIAN_5X5[dy, dx] * image[dy:dy + height, dx:dx + width]
+    gradient_x = blurred[1:-1, 2:] - blurred[1:-1, :-2]
+    gradient_y = blurred[2:, 1:-1] - blurred[:-2, 1:-1]
+    return float(np.sqrt(gradient_x * gradient_x + gradient_y * gradient_y).mean())
+
+
+def analyze(table):
+    """Column statistics, percentiles, a correlation matrix and histograms of a table of samples."""
+    samples = table.astype(np.float64)
+    summary = samples.mean(axis=0).sum() + samples.std(axis=0).sum()
+    summary += np.percentile(samples, [5, 50, 95], axis=0).sum()
+    summary += np.corrcoef(samples, rowvar=False).sum()
+    summary += sum(np.histogram(column, bins=64)[0].max() for column in samples.T)
+    return float(summary)
+
+
+def transcode(frames):
+    """JPEG-style intra coding of RGB frames: YCbCr, 4:2:0 chroma and quantized 8x8 luma DCT blocks."""
+    count, height, width, _ = frames.shape
+    ycbcr = frames.astype(np.float32) @ RGB_TO_YCBCR.T
+    chroma = ycbcr[..., 1:].reshape(count, height // 2, 2, width // 2, 2, 2).mean(axis=(2, 4))
+    blocks = (ycbcr[..., 0] - 128).reshape(count, height // 8, 8, width // 8, 8).transpose(0, 1, 3, 2, 4)
+    coefficients = DCT_8 @ blocks @ DCT_8.T
+    quantized = np.round(coefficients / LUMINANCE_QUANTIZATION)
+    return float(np.count_nonzero(quantized)) + float(chroma.mean())
+
+
+class Workload:
+    """A compute kernel and the shape of its input, which has ``rows_per_unit`` rows per unit of task size."""
+
+    def __init__(self, kernel, dtype, row_shape, rows_per_unit, min_rows=1):
+        self.kernel = kernel
+        self.dtype = np.dtype(dtype)
+        self.row_shape = row_shape
+        self.rows_per_unit = rows_per_unit
+        self.min_rows = min_rows
+
+    def rows(self, task_size, scale):
+        return max(self.min_rows, math.ceil(task_size * self.rows_per_unit * scale))
+
+    def fill(self, array, rng):
+        if self.dtype.kind == 'f':
+            rng.standard_normal(out=array, dtype=self.dtype)
+        else:
+            array[...] = rng.integers(0, 256, size=array.shape, dtype=self.dtype)
+
+
+# Kernels by task type, sized for roughly 3 ms of CPU time on one core per unit of task size at scale 1
+WORKLOADS = {
+    'image_processing': Workload(convolve, np.float32, (1024,), rows_per_unit=80, min_rows=7),  # Image rows
+    'data_analysis': Workload(analyze, np.float32, (16,), rows_per_unit=2200, min_rows=2),  # Samples of 16 variables
+    'video_streaming': Workload(transcode, np.uint8, (144, 176, 3), rows_per_unit=1.5)  # QCIF RGB frames
+}
+DEFAULT_WORKLOAD = 'data_analysis'  # For task types without a kernel of their own
+
+# Shared memory blocks this worker process has attached to, by name
+_attached = {}
+
+
+def run_kernel(task_type, block_name, shape, dtype, rows):
+    """Run a kernel on the first ``rows`` rows of a shared input; returns ``(checksum, cpu seconds, seconds)``."""
+    block = _attached.get(block_name)
+    if block is None:
+        block = _attached[block_name] = shared_memory.SharedMemory(name=block_name)
+    inputs = np.ndarray(shape, dtype=dtype, buffer=block.buf)[:rows]
+    started_at, cpu_started_at = time.perf_counter(), time.process_time()
+    checksum = WORKLOADS[task_type].kernel(inputs)
+    return checksum, time.process_time() - cpu_started_at, time.perf_counter() - started_at
+
+
+class WorkloadRunner:
+    """Runs the workload kernels of tasks in a pool of processes, so they compute in parallel despite the GIL.
+
+    Kernel inputs are synthetic arrays in shared memory, one block per task type
+    that every task of the type reads a prefix of, so nothing but a block name
+    and shape is pickled per task. A block is replaced by one twice as large when
+    a larger task arrives. ``scale`` multiplies the work done per unit of task size.
+    """
+
+    def __init__(self, workers, scale=1.0, seed=0):
+        self.scale = scale
+        # Workers start from a fork server rather than forking the node's threads and locks
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver'))
+        self._rng = np.random.default_rng(seed)
+        self._inputs = {}  # task type -> (shared memory block, shape)
+        self._blocks = []  # Every block created; outgrown ones may still be read by running tasks
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _input(self, task_type, rows):
+        workload = WORKLOADS[task_type]
+        with self._lock:
+            current = self._inputs.get(task_type)
+            if current is not None and current[1][0] >= rows:
+                return current
+            shape = (1 << (rows - 1).bit_length(), *workload.row_shape)
+            block = shared_memory.SharedMemory(create=True, size=math.prod(shape) * workload.dtype.itemsize)
+            workload.fill(np.ndarray(shape, dtype=workload.dtype, buffer=block.buf), self._rng)
+            self._blocks.append(block)
+            self._inputs[task_type] = block, shape
+            return block, shape
+
+    def run(self, task):
+        """Compute a task's kernel and return ``(cpu seconds, seconds)`` it took in its worker process."""
+        task_type = task['task_type'] if task['task_type'] in WORKLOADS else DEFAULT_WORKLOAD
+        workload = WORKLOADS[task_type]
+        rows = workload.rows(task['task_size'], self.scale)
+        block, shape = self._input(task_type, rows)
+        _, cpu_time, processing_time = self.pool.submit(run_kernel, task_type, block.name, shape,
+                                                        workload.dtype.str, rows).result()
+        return cpu_time, processing_time
+
+    def close(self):
+        self.pool.shutdown()
+        with self._lock:
+            for block in self._blocks:
+                block.close()
+                block.unlink()
+            self._blocks.clear()
+            self._inputs.clear()
@@ -1,20 +1,40 @@
+import os
 import numpy as np
-import requests
 import random
 import time
 from datetime import datetime, timedelta
+from common.http_client import ReplicaList, create_session
+from common.traces import TraceRecorder
 
 
-manager_url = 'http://manager:6000'
-
 task_types = ["image_processing", "data_analysis", "video_streaming"]
 
+# Keep-alive HTTP session reused for every task sent to the manager
+http = create_session()
+
+# Manager replicas, comma-separated: tasks go to each in turn, skipping any that cannot be reached
+managers = ReplicaList(os.getenv('MANAGER_URL', 'http://manager:6000'), http)
+
 
 # Define rate-limiting parameters
 task_limit = 5  # Maximum number of tasks that can be offloaded per minute
 tasks_sent = 0
 last_reset_time = datetime.now()
 
+# Batching mode: send up to batch_size tasks in one request, holding a partial batch at most batch_linger seconds
+batch_size = int(os.getenv('BATCH_SIZE', 1))
+batch_linger = float(os.getenv('BATCH_LINGER', 10))
+
+# A fixed DEVICE_SEED makes the device generate the same tasks at the same intervals on every run
+device_seed = os.getenv('DEVICE_SEED')
+if device_seed is not None:
+    random.seed(int(device_seed))
+    np.random.seed(int(device_seed))
+
+# Record every generated task to a replayable trace at TRACE_RECORD_PATH (see common/traces.py)
+device_id = int(os.getenv('DEVICE_ID', 0))
+trace_recorder = TraceRecorder(os.environ['TRACE_RECORD_PATH']) if os.getenv('TRACE_RECORD_PATH') else None
+
 def generate_task():
     task = {
         'task_type': random.choice(task_types),
@@ -26,7 +46,7 @@ def generate_task():
 def send_task_to_manager(task):
     try:
         network_delay = task['task_size'] / 100  # Simplified network delay
-        response = requests.post(f'http://manager:6000/offload_task', json=task)
+        response = managers.post('/offload_task', json=task)
         if response.status_code == 200:
             result = response.json()
             result['network_delay'] = network_delay
@@ -39,9 +59,44 @@ def send_task_to_manager(task):
         return None
 
 
+def send_batch_to_manager(tasks):
+    """Offload several tasks in one request; returns per-task results in order."""
+    try:
+        response = managers.post('/offload_batch', json={'tasks': tasks})
+        if response.status_code == 200:
+            results = response.json()['results']
+            for task, result in zip(tasks, results):
+                result['network_delay'] = task['task_size'] / 100  # Simplified network delay
+            return results
+        else:
+            print(f"Failed to offload batch: {response.status_code}")
+            return None
+    except Exception as e:
+        print(f"Error communicating with manager: {e}")
+        return None
+
+
+def task_processed(result):
+    """Whether a node ran the task, as the manager's offload_status labels it 'offloaded'."""
+    return 'fog_node_number' in result and result.get('status') not in ('error', 'rejected', 'expired')
+
+
+def flush_batch(batch):
+    results = send_batch_to_manager(batch)
+    if results is None:
+        print(f"Batch of {len(batch)} tasks could not be processed.")
+        return
+    for task, result in zip(batch, results):
+        if task_processed(result):
+            print(f"Task processed by fog node {result['fog_node_number']}: {result}")
+        else:
+            print(f"Task {task} could not be processed: {result}")
+
 
 def run():
     global tasks_sent, last_reset_time
+    batch = []
+    batch_started = None
 
     while True:
         # Reset the task counter every minute
@@ -53,20 +108,33 @@ def run():
         if tasks_sent < task_limit:
             task = generate_task()
             print(f"Generated task: {task}")
-            result = send_task_to_manager(task)
-            if result:
-                print(f"Task processed by fog node {result['fog_node_number']}: {result}")
+            if trace_recorder:
+                trace_recorder.record(task, device_id)
+            if batch_size > 1:
+                batch.append(task)
+                batch_started = batch_started or time.monotonic()
             else:
-                print("Task could not be processed.")
+                result = send_task_to_manager(task)
+                if result:
+                    print(f"Task processed by fog node {result['fog_node_number']}: {result}")
+                else:
+                    print("Task could not be processed.")
 
             tasks_sent += 1
         else:
             print("Task limit reached. Waiting for the next cycle.")
 
+        # Send the batch once it is full or has waited long enough
+        if batch and (len(batch) >= batch_size or time.monotonic() - batch_started >= batch_linger):
+            flush_batch(batch)
+            batch, batch_started = [], None
+
         # Random wait time between task generations
         wait_time = np.random.poisson(lam=5)
         time.sleep(wait_time)
 
 
 if __name__ == "__main__":
+    if trace_recorder:
+        trace_recorder.start()
     run()
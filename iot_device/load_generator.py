@@ -0,0 +1,272 @@
+"""Open-loop load generator: many simulated IoT devices sending tasks to the manager at once.
+
+Arrivals follow a schedule fixed in advance, so a slow manager does not slow the
+load down. The schedule is Poisson at ``--rate`` tasks per second; bursty, with
+``--burst-factor`` times the rate for the first ``--burst-duty`` of every
+``--burst-period`` seconds and less in between, for the same mean; or a replay
+of a recorded trace, at its original speed or ``--speed`` times faster. Each
+arrival comes from one of ``--devices`` devices, whose token bucket allows
+``--device-limit`` tasks per minute like the device's ``task_limit``. Tasks
+over the limit are throttled and never sent.
+
+Latency is measured from each task's scheduled time, so time spent behind a
+stalled manager counts, and recorded in an HDR-style histogram. The report,
+with the cache tiers and delays the fog nodes reported, is printed and written
+as JSON to ``--report``; ``benchmarks/diff_runs.py`` compares two reports.
+
+    python load_generator.py --devices 2000 --rate 100 --duration 60 --report report.json
+    python load_generator.py --arrivals trace --trace arrivals.npz --speed 2 --device-limit 0
+
+A trace is a compact ``.npz`` trace recorded by the device or the manager (see
+``common/traces.py``), a CSV with an ``offset`` column (seconds from the start)
+and, optionally, ``device``, ``task_type``, ``task_size`` and ``deadline``, or
+JSON lines with the same fields.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import time
+
+import aiohttp
+
+from common.hdr_histogram import LatencyHistogram
+from common.http_client import AsyncReplicaList
+from common.traces import trace_tasks
+
+task_types = ["image_processing", "data_analysis", "video_streaming"]
+
+
+class TokenBucket:
+    """Allows ``rate`` events per second on average, and bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = 0.0
+
+    def take(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def generate_task(rng):
+    """A task with the IoT device's mix of types, sizes and deadlines."""
+    return {
+        'task_type': rng.choice(task_types),
+        'task_size': rng.randint(10, 100),
+        'deadline': rng.randint(5, 30)
+    }
+
+
+def poisson_arrivals(rate, duration, rng):
+    """Yield ``(offset, device, task)`` with exponential gaps; device and task are chosen later."""
+    offset = rng.expovariate(rate)
+    while offset < duration:
+        yield offset, None, None
+        offset += rng.expovariate(rate)
+
+
+def bursty_arrivals(rate, duration, rng, burst_factor, burst_duty, burst_period):
+    """Poisson arrivals whose rate switches between a burst and a quieter phase, averaging ``rate``."""
+    burst_rate = rate * burst_factor
+    quiet_rate = max(0.0, rate * (1 - burst_duty * burst_factor) / (1 - burst_duty))
+    offset = 0.0
+    while offset < duration:
+        period_start = offset - offset % burst_period
+        in_burst = offset - period_start < burst_duty * burst_period
+        phase_end = period_start + (burst_duty if in_burst else 1) * burst_period
+        phase_rate = burst_rate if in_burst else quiet_rate
+        # Arrivals are memoryless, so a gap that crosses into the next phase restarts from its start
+        gap = rng.expovariate(phase_rate) if phase_rate else float('inf')
+        if offset + gap >= phase_end:
+            offset = phase_end
+            continue
+        offset += gap
+        if offset < duration:
+            yield offset, None, None
+
+
+def trace_arrivals(path, speed=1.0):
+    """Yield ``(offset, device, task)`` from a trace, in offset order, ``speed`` times faster than recorded."""
+    if path.endswith('.npz'):
+        yield from trace_tasks(path, speed)
+        return
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    for row in sorted(rows, key=lambda row: float(row['offset'])):
+        task = None
+        if row.get('task_type'):
+            task = {'task_type': row['task_type'], 'task_size': int(row['task_size']),
+                    'deadline': int(row['deadline'])}
+        device = int(row['device']) if row.get('device') not in (None, '') else None
+        yield float(row['offset']) / speed, device, task
+
+
+class LoadGenerator:
+    """Sends a schedule of arrivals to the manager without waiting for responses.
+
+    ``manager_url`` may list several manager replicas, comma-separated, which get the tasks in turn
+    the way ``ReplicaList`` gives them to IoT devices.
+    """
+
+    def __init__(self, manager_url, devices, device_limit, device_burst, max_in_flight, rng):
+        self.manager_url = manager_url
+        self.devices = devices
+        self.rng = rng
+        self.max_in_flight = max_in_flight
+        # Per-device token buckets, created on a device's first task
+        self.device_rate = device_limit / 60
+        self.device_burst = device_burst
+        self.buckets = {}
+        self.latency = LatencyHistogram()
+        self.scheduled = 0
+        self.throttled = 0
+        self.dropped = 0  # Not sent because max_in_flight tasks were already waiting for a response
+        self.statuses = {}  # HTTP status or error type -> count
+        self.cache_hits = {}  # Cache tier the fog node answered from ('miss' for computed tasks) -> count
+        self.reported_delay = 0.0  # Sum of the delays fog nodes reported for answered tasks
+        self.in_flight = 0
+        self.max_lag = 0.0  # Latest a task was sent after its scheduled time
+        self.last_offset = 0.0
+
+    def allow(self, device, now):
+        if not self.device_rate:
+            return True
+        bucket = self.buckets.get(device)
+        if bucket is None:
+            bucket = self.buckets[device] = TokenBucket(self.device_rate, self.device_burst)
+            bucket.updated_at = now
+        return bucket.take(now)
+
+    async def send(self, managers, task, scheduled_at):
+        try:
+            response = await managers.post('/offload_task', json=task)
+            task_result = await response.json(content_type=None) if response.status == 200 else None
+            outcome = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            outcome = type(e).__name__
+        finally:
+            self.in_flight -= 1
+        self.statuses[outcome] = self.statuses.get(outcome, 0) + 1
+        if outcome == 200:
+            self.latency.record(time.perf_counter() - scheduled_at)
+            tier = task_result.get('cache_hit') or 'miss'
+            self.cache_hits[tier] = self.cache_hits.get(tier, 0) + 1
+            self.reported_delay += task_result.get('delay', 0)
+
+    async def run(self, arrivals, connections):
+        connector = aiohttp.TCPConnector(limit=connections)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=2, sock_read=60)
+        pending = set()
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            managers = AsyncReplicaList(self.manager_url, session)
+            started_at = time.perf_counter()
+            for offset, device, task in arrivals:
+                scheduled_at = started_at + offset
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.max_lag = max(self.max_lag, time.perf_counter() - scheduled_at)
+
+                self.scheduled += 1
+                self.last_offset = offset
+                device = self.rng.randrange(self.devices) if device is None else device
+                if not self.allow(device, offset):
+                    self.throttled += 1
+                    continue
+                if self.in_flight >= self.max_in_flight:
+                    self.dropped += 1
+                    continue
+                self.in_flight += 1
+                sent = asyncio.ensure_future(self.send(managers, task or generate_task(self.rng), scheduled_at))
+                pending.add(sent)
+                sent.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+        return time.perf_counter() - started_at
+
+    def report(self, elapsed, config):
+        succeeded = self.statuses.get(200, 0)
+        return {
+            'config': config,
+            'elapsed_seconds': round(elapsed, 3),
+            'scheduled': self.scheduled,
+            'throttled': self.throttled,
+            'dropped': self.dropped,
+            'sent': sum(self.statuses.values()),
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            'offered_rate': round(self.scheduled / self.last_offset, 2) if self.last_offset else None,
+            'goodput': round(succeeded / elapsed, 2),
+            'cache_hits': self.cache_hits,
+            'cache_hit_rate': round(1 - self.cache_hits.get('miss', 0) / succeeded, 4) if succeeded else None,
+            'mean_reported_delay': round(self.reported_delay / succeeded, 4) if succeeded else None,
+            'max_schedule_lag_ms': round(self.max_lag * 1000, 3),
+            'latency_ms': {
+                name: None if self.latency.percentile(p) is None else round(self.latency.percentile(p) * 1000, 3)
+                for name, p in (('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9), ('max', 100))
+            },
+            'latency_histogram_ms': [[round(value * 1000, 3), count] for value, count in self.latency.buckets()]
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--manager-url', default=os.getenv('MANAGER_URL', 'http://manager:6000'))
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--arrivals', choices=['poisson', 'bursty', 'trace'], default='poisson')
+    parser.add_argument('--rate', type=float, default=50, help="Mean task arrivals per second, all devices together")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of arrivals")
+    parser.add_argument('--burst-factor', type=float, default=4, help="Arrival rate during bursts, times --rate")
+    parser.add_argument('--burst-duty', type=float, default=0.2, help="Share of every period spent in a burst")
+    parser.add_argument('--burst-period', type=float, default=10, help="Seconds from one burst to the next")
+    parser.add_argument('--trace', help="Arrival trace to replay with --arrivals trace")
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay the trace this many times faster")
+    parser.add_argument('--device-limit', type=float, default=5, help="Tasks per minute per device, 0 for no limit")
+    parser.add_argument('--device-burst', type=float, default=5, help="Tasks a device may send back to back")
+    parser.add_argument('--connections', type=int, default=256, help="HTTP connections to the manager")
+    parser.add_argument('--max-in-flight', type=int, default=10000, help="Unanswered tasks before arrivals drop")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', default='load_report.json')
+    args = parser.parse_args()
+    if args.arrivals == 'bursty':
+        if not 0 <= args.burst_duty < 1:
+            parser.error("--burst-duty must be at least 0 and less than 1")
+        if args.burst_duty * args.burst_factor > 1:
+            parser.error("--burst-duty times --burst-factor must be at most 1, or bursts alone exceed the mean rate")
+
+    rng = random.Random(args.seed)
+    if args.arrivals == 'poisson':
+        arrivals = poisson_arrivals(args.rate, args.duration, rng)
+    elif args.arrivals == 'bursty':
+        arrivals = bursty_arrivals(args.rate, args.duration, rng, args.burst_factor, args.burst_duty,
+                                   args.burst_period)
+    else:
+        arrivals = trace_arrivals(args.trace, args.speed)
+
+    generator = LoadGenerator(args.manager_url, args.devices, args.device_limit, args.device_burst,
+                              args.max_in_flight, rng)
+    elapsed = asyncio.run(generator.run(arrivals, args.connections))
+    report = generator.report(elapsed, vars(args))
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Scheduled {report['scheduled']}, throttled {report['throttled']}, dropped {report['dropped']}, "
+          f"statuses {report['statuses']}")
+    print(f"Goodput {report['goodput']} tasks/s, cache hit rate {report['cache_hit_rate']}, latency ms: "
+          + ", ".join(f"{name} {value}" for name, value in report['latency_ms'].items()))
+    print(f"Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
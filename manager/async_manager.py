@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import os
+import time
+
+import aiohttp
+from aiohttp import web
+
+from common.http_client import CONNECT_TIMEOUT, READ_TIMEOUT, POOL_MAXSIZE
+from common.metrics import CONTENT_TYPE, REGISTRY
+from manager import (CLOUD_URL, fog_node_registry, forward_seconds, log_cloud_offload, log_manager_actions,
+                     offload_status, partition_tasks, record_arrivals, record_fog_node_status, refuse_task,
+                     register_fog_node, route_task, start_eviction_thread, start_state_sync_thread,
+                     start_status_listener, status_updates, trace_recorder, with_remaining_deadline)
+
+# Maximum number of tasks forwarded to fog nodes at the same time
+MAX_IN_FLIGHT_TASKS = int(os.getenv('MAX_IN_FLIGHT_TASKS', 256))
+
+
+async def off_loop(func, *args):
+    """Call ``func``, which may wait on the shared state store, in the default thread pool.
+
+    A Redis round trip would otherwise stall every request on the event loop.
+    With the in-memory store nothing waits, and ``func`` runs inline.
+    """
+    if not fog_node_registry.store.shared:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+async def register(request):
+    """Register a fog node advertising its URL, capacity and task types."""
+    fog_node = await off_loop(register_fog_node, await request.json())
+    logging.info(f"Registered fog node {fog_node['node_id']} at {fog_node['url']}: {fog_node}")
+    return web.json_response({'status': 'registered', 'node_id': fog_node['node_id']})
+
+
+async def update_fog_node_status(request):
+    """Receive status updates from fog nodes."""
+    status_data = await request.json()
+    fog_node_number = status_data['fog_node_number']
+    status_updates.labels(kind='snapshot').inc()
+
+    # Update the shared status dictionary and registry used by select_best_fog_node
+    if await off_loop(record_fog_node_status, status_data) is None:
+        return web.json_response({'status': 'unregistered'}, status=404)
+
+    logging.info(f"Received status update from Fog Node {fog_node_number}: {status_data}")
+    return web.json_response({'status': 'updated'})
+
+
+async def offload_task(request):
+    """Handle task offloading requests from IoT devices without blocking on the fog node."""
+    task = await request.json()
+    received_at = time.monotonic()
+    record_arrivals('offload_task', [task])
+    logging.info(f"Received task for offloading: {task}")
+
+    best_fog_node, reason = await off_loop(route_task, task)
+    if best_fog_node is None:
+        logging.warning(f"No fog node can take the task: {reason}")
+        task_result, status = await spill_task(request, task, reason, received_at)
+        return web.json_response(task_result, status=status)
+
+    try:
+        logging.info(f"Selected fog node for offloading: {best_fog_node['url']}")
+
+        # Wait for a free slot so the number of in-flight forwards stays bounded
+        async with request.app['in_flight']:
+            started_at = time.perf_counter()
+            token = await off_loop(fog_node_registry.dispatch, best_fog_node['node_id'])
+            try:
+                async with request.app['http'].post(best_fog_node['url'] + '/offload_task',
+                                                    json=with_remaining_deadline(task, received_at)) as response:
+                    saturated = response.status == 429  # The node's queue filled up since its last status
+                    # 504: the node dropped the task from its queue, as it could no longer meet its deadline
+                    status = response.status
+                    if status not in (200, 504) and not saturated:
+                        raise Exception(f"Failed to offload task. Status code: {response.status}, "
+                                        f"Response: {await response.text()}")
+                    task_result = await response.json()
+            finally:
+                await off_loop(fog_node_registry.complete, best_fog_node['node_id'], token)
+            forward_seconds.labels(node_id=best_fog_node['node_id']).observe(time.perf_counter() - started_at)
+
+        if saturated:
+            task_result, status = await spill_task(request, task, 'saturated', received_at)
+            return web.json_response(task_result, status=status)
+
+        log_manager_actions({
+            'task_type': task['task_type'],
+            'task_size': task['task_size'],
+            'deadline': task['deadline'],
+            'fog_node': best_fog_node['url'],
+            'node_id': best_fog_node['node_id'],
+            'status': offload_status(task_result),
+            'response': task_result
+        })
+        logging.info(f"Successfully offloaded task to {best_fog_node['url']}: {task_result}")
+        return web.json_response(task_result, status=status)
+
+    except Exception as e:
+        logging.error(f"Error during task offloading: {str(e)}")
+        log_manager_actions({
+            'task_type': task['task_type'],
+            'task_size': task['task_size'],
+            'deadline': task['deadline'],
+            'fog_node': best_fog_node['url'],
+            'node_id': best_fog_node['node_id'],
+            'status': 'failed',
+            'error': str(e)
+        })
+        return web.json_response(
+            {'status': 'error', 'message': f"Failed to offload to {best_fog_node['url']}. Error: {str(e)}"},
+            status=500)
+
+
+async def spill_task(request, task, reason, received_at):
+    """Send a task no fog node can take to the cloud node, or refuse it without one.
+
+    Returns the task's result and HTTP status.
+    """
+    if not CLOUD_URL:
+        return refuse_task(task, reason)
+    try:
+        async with request.app['in_flight']:
+            started_at = time.perf_counter()
+            async with request.app['http'].post(CLOUD_URL + '/offload_task',
+                                                json=with_remaining_deadline(task, received_at)) as response:
+                task_result, status = await response.json(), response.status
+            forward_seconds.labels(node_id='cloud').observe(time.perf_counter() - started_at)
+    except Exception as e:
+        logging.error(f"Error during cloud offloading: {str(e)}")
+        task_result = {'status': 'error', 'message': f"Failed to offload to the cloud. Error: {str(e)}"}
+        status = 500
+    log_cloud_offload(task, reason, task_result)
+    return task_result, status
+
+
+async def spill_batch(request, tasks, unassigned, received_at):
+    """Send the tasks of a batch that no fog node took to the cloud node in one request, or refuse them.
+
+    ``unassigned`` maps task indices to the reason they have no fog node.
+    Returns their results by index.
+    """
+    if not unassigned:
+        return {}
+    if not CLOUD_URL:
+        return {i: refuse_task(tasks[i], reason)[0] for i, reason in unassigned.items()}
+
+    spilled = [tasks[i] for i in unassigned]
+    try:
+        async with request.app['in_flight']:
+            started_at = time.perf_counter()
+            forwarded = [with_remaining_deadline(task, received_at) for task in spilled]
+            async with request.app['http'].post(CLOUD_URL + '/offload_batch', json={'tasks': forwarded}) as response:
+                if response.status != 200:
+                    raise Exception(f"Failed to offload batch. Status code: {response.status}, "
+                                    f"Response: {await response.text()}")
+                cloud_results = (await response.json())['results']
+            forward_seconds.labels(node_id='cloud').observe(time.perf_counter() - started_at)
+    except Exception as e:
+        logging.error(f"Error during batch offloading to the cloud: {str(e)}")
+        cloud_results = [{'status': 'error', 'message': f"Failed to offload to the cloud. Error: {str(e)}"}
+                         ] * len(spilled)
+
+    for task, reason, task_result in zip(spilled, unassigned.values(), cloud_results):
+        log_cloud_offload(task, reason, task_result)
+    return dict(zip(unassigned, cloud_results))
+
+
+async def forward_batch(request, fog_node, tasks, tokens):
+    """Send a chunk of tasks dispatched by ``partition_tasks`` to a fog node in one request.
+
+    Returns per-task results in order.
+    """
+    async with request.app['in_flight']:
+        started_at = time.perf_counter()
+        try:
+            async with request.app['http'].post(fog_node['url'] + '/offload_batch', json={'tasks': tasks}) as response:
+                if response.status != 200:
+                    raise Exception(f"Failed to offload batch. Status code: {response.status}, "
+                                    f"Response: {await response.text()}")
+                results = (await response.json())['results']
+        finally:
+            await off_loop(fog_node_registry.complete_each, fog_node['node_id'], tokens)
+        forward_seconds.labels(node_id=fog_node['node_id']).observe(time.perf_counter() - started_at)
+        return results
+
+
+async def offload_batch(request):
+    """Handle a batch of tasks, forwarding one chunk per selected fog node concurrently."""
+    tasks = (await request.json())['tasks']
+    received_at = time.monotonic()
+    record_arrivals('offload_batch', tasks)
+    logging.info(f"Received batch of {len(tasks)} tasks for offloading")
+
+    chunks, unassigned = await off_loop(partition_tasks, tasks)
+    results = [None] * len(tasks)
+
+    chunks = list(chunks.values())
+    chunk_results = await asyncio.gather(
+        *(forward_batch(request, fog_node, [with_remaining_deadline(tasks[i], received_at) for i in indices], tokens)
+          for fog_node, indices, tokens in chunks),
+        return_exceptions=True)
+
+    for (fog_node, indices, _), chunk_result in zip(chunks, chunk_results):
+        if isinstance(chunk_result, Exception):
+            logging.error(f"Error during batch offloading to {fog_node['url']}: {str(chunk_result)}")
+            chunk_result = [{'status': 'error',
+                             'message': f"Failed to offload to {fog_node['url']}. Error: {str(chunk_result)}"}
+                            ] * len(indices)
+
+        for i, task_result in zip(indices, chunk_result):
+            if task_result.get('status') == 'rejected':
+                unassigned[i] = 'saturated'  # The node's queue filled up since its last status
+                continue
+            results[i] = task_result
+            log_manager_actions({
+                'task_type': tasks[i]['task_type'],
+                'task_size': tasks[i]['task_size'],
+                'deadline': tasks[i]['deadline'],
+                'fog_node': fog_node['url'],
+                'node_id': fog_node['node_id'],
+                'status': offload_status(task_result),
+                'response': task_result
+            })
+
+    for i, task_result in (await spill_batch(request, tasks, unassigned, received_at)).items():
+        results[i] = task_result
+    return web.json_response({'results': results})
+
+
+async def metrics(request):
+    """Expose counters and histograms in the Prometheus text format."""
+    return web.Response(body=REGISTRY.render(), headers={'Content-Type': CONTENT_TYPE})
+
+
+async def open_http_session(app):
+    """Create the shared non-blocking HTTP client when the app starts, and close it on shutdown."""
+    connector = aiohttp.TCPConnector(limit=MAX_IN_FLIGHT_TASKS, limit_per_host=max(POOL_MAXSIZE, MAX_IN_FLIGHT_TASKS))
+    timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+    app['http'] = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    app['in_flight'] = asyncio.Semaphore(MAX_IN_FLIGHT_TASKS)
+    yield
+    await app['http'].close()
+
+
+def create_app():
+    app = web.Application()
+    app.router.add_post('/register', register)
+    app.router.add_post('/status_update', update_fog_node_status)
+    app.router.add_post('/offload_task', offload_task)
+    app.router.add_post('/offload_batch', offload_batch)
+    app.router.add_get('/metrics', metrics)
+    app.cleanup_ctx.append(open_http_session)
+    return app
+
+
+if __name__ == '__main__':
+    start_eviction_thread()
+    start_status_listener()
+    start_state_sync_thread()
+    if trace_recorder:
+        trace_recorder.start()
+    web.run_app(create_app(), host='0.0.0.0', port=6000)
@@ -0,0 +1,51 @@
+import bisect
+import hashlib
+import threading
+
+
+def ring_position(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent-hash ring of fog node ids, with virtual points to spread keys evenly.
+
+    Adding or removing a node only moves the keys next to its points, so most
+    task ids keep mapping to the node that already has them cached.
+    """
+
+    def __init__(self, points_per_node=64):
+        self.points_per_node = points_per_node
+        self._positions = []  # Sorted ring positions
+        self._owners = []  # Node id owning the position at the same index
+        self._lock = threading.Lock()
+
+    def add(self, node_id):
+        with self._lock:
+            if node_id in self._owners:
+                return
+            for point in range(self.points_per_node):
+                position = ring_position(f"{node_id}#{point}")
+                index = bisect.bisect(self._positions, position)
+                self._positions.insert(index, position)
+                self._owners.insert(index, node_id)
+
+    def remove(self, node_id):
+        with self._lock:
+            kept = [(position, owner) for position, owner in zip(self._positions, self._owners) if owner != node_id]
+            self._positions = [position for position, _ in kept]
+            self._owners = [owner for _, owner in kept]
+
+    def walk(self, key):
+        """Yield distinct node ids in ring order, starting with the owner of ``key``."""
+        with self._lock:
+            positions, owners = self._positions, self._owners
+        if not owners:
+            return
+        start = bisect.bisect(positions, ring_position(key))
+        seen = set()
+        for offset in range(len(owners)):
+            owner = owners[(start + offset) % len(owners)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
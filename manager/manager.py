@@ -1,18 +1,25 @@
-from flask import Flask, request, jsonify
-import requests
+from flask import Flask, Response, request, jsonify
 import json
 import logging
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import redis
+from common.http_client import create_session
+from common.logs import BufferedLogWriter, configure_logging, console
+from common.metrics import CONTENT_TYPE, REGISTRY, Counter, Gauge, Histogram
+from common.status_stream import is_stale_status, listen_for_status_deltas
+from common.traces import TraceRecorder
+from policies import POLICIES, DeadlineAdmission, InfeasibleTaskError
+from registry import FogNodeRegistry
+from state_store import create_state_store
 
 app = Flask(__name__)
 
-# List of fog nodes with predefined URLs and ports
-fog_nodes = [
-    {'url': 'http://fog_node1:5000', 'port': 5000},
-    {'url': 'http://fog_node2:5001', 'port': 5001},
-    {'url': 'http://fog_node3:5002', 'port': 5002}
-]
+# Keep-alive HTTP session with one connection pool per fog node
+http = create_session()
 
 # Store fog node statuses
 fog_node_statuses = {}
@@ -20,22 +27,275 @@ fog_node_statuses = {}
 # Define how long to consider a fog node's status as valid
 STATUS_TIMEOUT_SECONDS = 30  # Keep statuses for 30 seconds
 
-# Log file for manager actions
-manager_log_file = "manager_log.json"
+# Define how long a fog node may go without a status update before it is removed
+EVICTION_TIMEOUT_SECONDS = int(os.getenv('FOG_NODE_EVICTION_SECONDS', 60))
+
+# Redis carries the status deltas fog nodes push between their periodic snapshots
+redis_host = os.getenv('REDIS_HOST', 'redis_cache')
+redis_port = int(os.getenv('REDIS_PORT', 6379))
+
+# Weight a node gains for each task dispatched or assigned to it in a batch that its status does not
+# show yet: one more queued task, as in calculate_weight
+QUEUED_TASK_WEIGHT = 0.2
+
+# Where fog node registrations, statuses and in-flight task counts are kept (see state_store.py): 'memory' in
+# this process, or 'redis' on the Redis server, shared by every manager replica so that any of them can take
+# any task and fog node message. Replicas pick up each other's changes every MANAGER_STATE_SYNC_SECONDS.
+MANAGER_STATE_STORE = os.getenv('MANAGER_STATE_STORE', 'memory')
+STATE_SYNC_SECONDS = float(os.getenv('MANAGER_STATE_SYNC_SECONDS', 0.5))
+
+# Fog nodes that registered themselves, ranked by weight plus their in-flight tasks for selection
+fog_node_registry = FogNodeRegistry(STATUS_TIMEOUT_SECONDS, EVICTION_TIMEOUT_SECONDS,
+                                    in_flight_weight=QUEUED_TASK_WEIGHT,
+                                    store=create_state_store(MANAGER_STATE_STORE, redis_host, redis_port))
+
+# Routing policy (see policies.py): 'weighted' picks the lowest weight, 'affinity' prefers the node a task
+# id hashes to, 'power_of_two' the lighter of two random nodes, 'least_ect' the earliest expected completion
+# and 'deadline' the lowest weight among nodes expected to meet the task's deadline
+ROUTING_MODE = os.getenv('ROUTING_MODE', 'weighted')
+
+# In affinity mode, how much heavier than the best node a task's hashed node may be and still get it
+AFFINITY_WEIGHT_SLACK = float(os.getenv('AFFINITY_WEIGHT_SLACK', 10))
+
+# In least_ect mode, the seconds of expected delay each joule a node is expected to spend on a task is worth
+ENERGY_WEIGHT = float(os.getenv('ENERGY_WEIGHT', 0.02))
 
-# Configure logging to print both to console and file
-logging.basicConfig(level=logging.DEBUG,
-                    format='%(asctime)s %(levelname)s %(message)s',
-                    handlers=[
-                        logging.FileHandler("manager_debug.log"),
-                        logging.StreamHandler()  # This prints to console
-                    ])
+def create_routing_policy(name):
+    """Build the routing policy ``name`` over the manager's registry and fog node statuses."""
+    options = {'affinity': {'weight_slack': AFFINITY_WEIGHT_SLACK},
+               'least_ect': {'energy_weight': ENERGY_WEIGHT}}.get(name, {})
+    return POLICIES[name](fog_node_registry, fog_node_statuses, **options)
+
+
+routing_policy = create_routing_policy(ROUTING_MODE)
+
+# Deadline check on top of the routing policy: a task the chosen node is expected to finish after its deadline
+# goes to the lowest-weight node expected to meet it instead. Fog nodes drop the tasks that still cannot make
+# it before computing them. DEADLINE_ADMISSION=0 turns the check off.
+DEADLINE_ADMISSION = os.getenv('DEADLINE_ADMISSION', '1') == '1'
+deadline_admission = DeadlineAdmission(fog_node_registry, fog_node_statuses)
+
+# Cloud node that takes the tasks no fog node can: when every fog node is stale, saturated or predicted
+# to miss the task's deadline. An empty CLOUD_URL disables spillover, and such tasks are refused instead.
+CLOUD_URL = os.getenv('CLOUD_URL', 'http://cloud_node:7000')
+
+# Record every task arrival to a replayable trace at TRACE_RECORD_PATH (see common/traces.py)
+trace_recorder = TraceRecorder(os.environ['TRACE_RECORD_PATH']) if os.getenv('TRACE_RECORD_PATH') else None
+
+# Threads used to forward the chunks of a batch to fog nodes concurrently
+batch_forward_pool = ThreadPoolExecutor(max_workers=int(os.getenv('BATCH_FORWARD_WORKERS', 16)))
+
+# Log file for manager actions, written in batches by a background thread
+manager_log_file = "manager_log.json"
+manager_log = BufferedLogWriter(manager_log_file,
+                                max_bytes=int(os.getenv('LOG_MAX_BYTES', 100 * 1024 * 1024)),
+                                rotate_interval=float(os.getenv('LOG_ROTATE_SECONDS', 0)),
+                                backup_count=int(os.getenv('LOG_BACKUP_COUNT', 5)))
+
+# Configure logging to print both to console and file, off the request path (level from LOG_LEVEL)
+log_listener = configure_logging(logging.FileHandler("manager_debug.log"),
+                                 logging.StreamHandler())  # This prints to console
+
+# Prometheus metrics, served on /metrics
+task_arrivals = Counter('manager_task_arrivals', 'Tasks received from IoT devices', ['endpoint'])
+offload_outcomes = Counter('manager_offloads', 'Tasks handled, by outcome', ['outcome'])
+selection_seconds = Histogram('manager_selection_seconds', 'Time spent choosing fog nodes for a task or batch',
+                              buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1))
+forward_seconds = Histogram('manager_forward_seconds', 'Round trip of a forward to a fog node', ['node_id'])
+fog_delay_seconds = Histogram('manager_fog_delay_seconds', 'Task delay reported by fog nodes', ['node_id'])
+deadline_outcomes = Counter('manager_deadline_outcomes',
+                            'Tasks answered in time, late, or dropped by a queue for their deadline, by node',
+                            ['node_id', 'outcome'])
+fog_queue_length = Gauge('manager_fog_queue_length', 'Task queue length last reported by each fog node', ['node_id'])
+status_updates = Counter('manager_status_updates', 'Fog node status messages received', ['kind'])
+registered_fog_nodes = Gauge('manager_registered_fog_nodes', 'Fog nodes in the registry',
+                             fn=lambda: len(fog_node_registry))
 
 
 # Function to log manager actions in JSON format
 def log_manager_actions(action_data):
-    with open(manager_log_file, 'a') as f:
-        f.write(json.dumps(action_data) + "\n")
+    manager_log.write(json.dumps({**action_data, 'timestamp': round(time.time(), 3)}))
+    record_offload_metrics(action_data)
+
+
+def record_arrivals(endpoint, tasks):
+    """Count tasks received from IoT devices, and add them to the trace being recorded."""
+    task_arrivals.labels(endpoint=endpoint).inc(len(tasks))
+    if trace_recorder:
+        for task in tasks:
+            trace_recorder.record(task)
+
+
+def record_offload_metrics(action_data):
+    """Count a logged task outcome, and the delay and deadline outcome the node reported for it."""
+    offload_outcomes.labels(outcome=action_data['status']).inc()
+    response = action_data.get('response', {})
+    delay = response.get('delay')
+    if delay is not None:
+        fog_delay_seconds.labels(node_id=action_data['node_id']).observe(delay)
+    if action_data['status'] == 'expired':
+        deadline_outcomes.labels(node_id=action_data['node_id'], outcome='expired').inc()
+    elif 'deadline_met' in response:
+        deadline_outcomes.labels(node_id=action_data['node_id'],
+                                 outcome='met' if response['deadline_met'] else 'missed').inc()
+
+
+def offload_status(task_result):
+    """The status to log for a task a node answered: 'offloaded', 'expired' or 'failed'."""
+    if task_result.get('status') == 'expired':
+        return 'expired'  # Dropped from the node's queue as it could no longer meet its deadline
+    return 'failed' if task_result.get('status') in ('error', 'rejected') else 'offloaded'
+
+
+def with_remaining_deadline(task, received_at):
+    """``task`` as forwarded: its deadline less the seconds it has spent at the manager since ``received_at``."""
+    if 'deadline' not in task:
+        return task
+    return {**task, 'deadline': task['deadline'] - (time.monotonic() - received_at)}
+
+
+def reject_infeasible_task(task, error):
+    """Log a task the routing policy rejected for its deadline and return its result."""
+    logging.warning(f"Rejected task {task}: {error}")
+    log_manager_actions({
+        'task_type': task['task_type'],
+        'task_size': task['task_size'],
+        'deadline': task['deadline'],
+        'status': 'deadline_infeasible',
+        'error': str(error)
+    })
+    return {'status': 'rejected', 'message': str(error)}
+
+
+def refuse_task(task, reason):
+    """Log a task that has no fog node and no cloud to spill to; returns its result and HTTP status."""
+    if isinstance(reason, InfeasibleTaskError):
+        return reject_infeasible_task(task, reason), 429
+    log_manager_actions({
+        'task_type': task['task_type'],
+        'task_size': task['task_size'],
+        'deadline': task['deadline'],
+        'status': reason
+    })
+    if reason == 'saturated':
+        return {'status': 'rejected', 'message': 'All fog nodes are saturated'}, 429
+    return {'status': 'error', 'message': 'No fog nodes available'}, 500
+
+
+def log_cloud_offload(task, reason, task_result):
+    """Log a task spilled over to the cloud node, with why no fog node took it."""
+    log_manager_actions({
+        'task_type': task['task_type'],
+        'task_size': task['task_size'],
+        'deadline': task['deadline'],
+        'fog_node': CLOUD_URL,
+        'node_id': 'cloud',
+        'status': 'cloud' if offload_status(task_result) == 'offloaded' else offload_status(task_result),
+        'reason': reason if isinstance(reason, str) else 'deadline_infeasible',
+        'response': task_result
+    })
+
+
+def register_fog_node(registration):
+    """Add a fog node to the registry from its self-registration data."""
+    return fog_node_registry.register(str(registration['node_id']), registration['url'],
+                                      capacity=registration.get('capacity', 1),
+                                      task_types=registration.get('task_types', []))
+
+
+def record_fog_node_status(status_data, now=None):
+    """Store a registered fog node's status and re-rank it; returns None for unknown nodes."""
+    node_id = str(status_data['node_id'])
+    if is_stale_status(fog_node_statuses.get(node_id), status_data):
+        # Overtaken by a newer status, e.g. a snapshot that arrived after a delta
+        return fog_node_registry.get(node_id)
+
+    # Record the current timestamp
+    status_data['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    recorded = fog_node_registry.heartbeat(node_id, calculate_weight(status_data), now, status=status_data)
+    if recorded is None:
+        return None
+    fog_node, accepted = recorded
+    if not accepted:
+        return fog_node  # Another manager replica already recorded a newer status
+
+    # Update the status dictionary with fog node status
+    fog_node_statuses[node_id] = status_data
+    fog_queue_length.labels(node_id=node_id).set(status_data.get('task_queue_length', 0))
+    return fog_node
+
+
+def apply_status_delta(delta, now=None):
+    """Merge a status delta pushed by a fog node into its last status and re-rank the node."""
+    status_updates.labels(kind='delta').inc()
+    previous = fog_node_statuses.get(str(delta['node_id']))
+    if previous is None or previous.get('epoch') != delta['epoch']:
+        return None  # Nothing from this run of the node to apply it to until its next snapshot
+    return record_fog_node_status({**previous, **delta['fields'], 'epoch': delta['epoch'], 'seq': delta['seq']}, now)
+
+
+def start_status_listener():
+    listener_thread = threading.Thread(target=listen_for_status_deltas,
+                                       args=(redis_host, redis_port, apply_status_delta))
+    listener_thread.daemon = True
+    listener_thread.start()
+
+
+def evict_silent_fog_nodes():
+    """Periodically remove fog nodes that stopped sending status updates."""
+    while True:
+        for fog_node in fog_node_registry.evict_silent():
+            fog_node_statuses.pop(fog_node['node_id'], None)
+            logging.warning(f"Evicted silent fog node {fog_node['node_id']} at {fog_node['url']}")
+        time.sleep(EVICTION_TIMEOUT_SECONDS / 4)
+
+
+def sync_node_state(now=None):
+    """Adopt the fog nodes, statuses and in-flight counts other manager replicas recorded in the shared store."""
+    shared = fog_node_registry.store.load()
+    weights = {}
+    for node_id, state in shared.items():
+        if state['status'] is not None and not is_stale_status(fog_node_statuses.get(node_id), state['status']):
+            fog_node_statuses[node_id] = state['status']
+            fog_queue_length.labels(node_id=node_id).set(state['status'].get('task_queue_length', 0))
+        if node_id in fog_node_statuses:
+            weights[node_id] = calculate_weight(fog_node_statuses[node_id])
+    for node_id in [node_id for node_id in fog_node_statuses if node_id not in shared]:
+        fog_node_statuses.pop(node_id, None)
+    fog_node_registry.sync(shared, weights, now)
+
+
+def sync_node_state_forever():
+    while True:
+        try:
+            sync_node_state()
+        except redis.RedisError as e:
+            logging.error(f"Node state not synced from Redis, routing on the last state seen: {e}")
+        time.sleep(STATE_SYNC_SECONDS)
+
+
+def start_state_sync_thread():
+    """Keep this replica up to date with the others, when the state store is shared."""
+    if not fog_node_registry.store.shared:
+        return
+    sync_thread = threading.Thread(target=sync_node_state_forever)
+    sync_thread.daemon = True
+    sync_thread.start()
+
+
+def start_eviction_thread():
+    eviction_thread = threading.Thread(target=evict_silent_fog_nodes)
+    eviction_thread.daemon = True
+    eviction_thread.start()
+
+
+@app.route('/register', methods=['POST'])
+def register():
+    """Register a fog node advertising its URL, capacity and task types."""
+    fog_node = register_fog_node(request.json)
+    logging.info(f"Registered fog node {fog_node['node_id']} at {fog_node['url']}: {fog_node}")
+    return jsonify({'status': 'registered', 'node_id': fog_node['node_id']})
 
 
 @app.route('/status_update', methods=['POST'])
@@ -43,55 +303,75 @@ def update_fog_node_status():
     """Receive status updates from fog nodes."""
     status_data = request.json
     fog_node_number = status_data['fog_node_number']
+    status_updates.labels(kind='snapshot').inc()
 
-    # Record the current timestamp
-    status_data['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-    # Update the status dictionary with fog node status
-    fog_node_statuses[fog_node_number] = status_data
+    if record_fog_node_status(status_data) is None:
+        # Unknown node, e.g. after a manager restart: ask it to register again
+        return jsonify({'status': 'unregistered'}), 404
 
     logging.info(f"Received status update from Fog Node {fog_node_number}: {status_data}")
 
     # Print to console
-    print(f"Status received from Fog Node {fog_node_number}: {status_data}")
+    console(f"Status received from Fog Node {fog_node_number}: {status_data}")
 
     return jsonify({'status': 'updated'})
 
 
+@app.route('/metrics')
+def metrics():
+    """Expose counters and histograms in the Prometheus text format."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
 @app.route('/offload_task', methods=['POST'])
 def offload_task():
     """Handle task offloading requests from IoT devices."""
     task = request.json
+    received_at = time.monotonic()
+    record_arrivals('offload_task', [task])
     logging.info(f"Received task for offloading: {task}")
 
     # Print to console
-    print(f"Task received for offloading: {task}")
-
-    best_fog_node = select_best_fog_node()
+    console(f"Task received for offloading: {task}")
 
+    best_fog_node, reason = route_task(task)
     if best_fog_node:
         try:
             logging.info(f"Selected fog node for offloading: {best_fog_node['url']}")
-            print(f"Sending task to fog node {best_fog_node['url']}...")
-
-            response = requests.post(best_fog_node['url'] + '/offload_task', json=task)
+            console(f"Sending task to fog node {best_fog_node['url']}...")
 
-            if response.status_code == 200:
+            started_at = time.perf_counter()
+            token = fog_node_registry.dispatch(best_fog_node['node_id'])
+            try:
+                response = http.post(best_fog_node['url'] + '/offload_task',
+                                     json=with_remaining_deadline(task, received_at))
+            finally:
+                fog_node_registry.complete(best_fog_node['node_id'], token)
+            forward_seconds.labels(node_id=best_fog_node['node_id']).observe(time.perf_counter() - started_at)
+
+            if response.status_code == 429:
+                # The node's queue filled up since its last status
+                console(f"Fog node {best_fog_node['url']} is saturated")
+                task_result, status_code = spill_task(task, 'saturated', received_at)
+                return jsonify(task_result), status_code
+            elif response.status_code in (200, 504):
+                # 504: the node dropped the task from its queue, as it could no longer meet its deadline
                 task_result = response.json()
                 log_manager_actions({
                     'task_type': task['task_type'],
                     'task_size': task['task_size'],
                     'deadline': task['deadline'],
                     'fog_node': best_fog_node['url'],
-                    'status': 'offloaded',
+                    'node_id': best_fog_node['node_id'],
+                    'status': offload_status(task_result),
                     'response': task_result
                 })
                 logging.info(f"Successfully offloaded task to {best_fog_node['url']}: {task_result}")
 
                 # Print to console
-                print(f"Task successfully offloaded to Fog Node {best_fog_node['url']}. Response: {task_result}")
+                console(f"Task successfully offloaded to Fog Node {best_fog_node['url']}. Response: {task_result}")
 
-                return task_result
+                return jsonify(task_result), response.status_code
             else:
                 raise Exception(
                     f"Failed to offload task. Status code: {response.status_code}, Response: {response.text}")
@@ -103,60 +383,215 @@ def offload_task():
                 'task_size': task['task_size'],
                 'deadline': task['deadline'],
                 'fog_node': best_fog_node['url'],
+                'node_id': best_fog_node['node_id'],
                 'status': 'failed',
                 'error': str(e)
             })
-            print(f"Error offloading task to Fog Node {best_fog_node['url']}: {e}")
+            console(f"Error offloading task to Fog Node {best_fog_node['url']}: {e}")
             return jsonify(
                 {'status': 'error', 'message': f"Failed to offload to {best_fog_node['url']}. Error: {str(e)}"}), 500
     else:
-        logging.warning("No available fog nodes to offload task.")
-        log_manager_actions({
-            'task_type': task['task_type'],
-            'task_size': task['task_size'],
-            'deadline': task['deadline'],
-            'status': 'no_fog_available'
-        })
-        print("No available fog nodes for offloading.")
-        return jsonify({'status': 'error', 'message': 'No fog nodes available'}), 500
-
-
-def select_best_fog_node():
-    best_fog_node = None
-    best_weight = float('inf')
-    current_time = datetime.now()
-
-    for fog_node in fog_nodes:
-        fog_node_number = str(fog_node['port'] - 4999)  # Map port to string fog node number
-        status = fog_node_statuses.get(fog_node_number)  # Retrieve the status using the correct fog node number
-
-        if status:
-            try:
-                # Parse the timestamp from the fog node's status update
-                status_timestamp = datetime.strptime(status['timestamp'], '%Y-%m-%d %H:%M:%S')
-                time_diff = (current_time - status_timestamp).total_seconds()
-
-                # Only consider fog nodes whose status update is within the time limit
-                if time_diff <= STATUS_TIMEOUT_SECONDS:
-                    weight = calculate_weight(status)
-                    print(f"Fog Node {fog_node['url']} has weight: {weight}, Status: {status}")
-                    if weight < best_weight:
-                        best_weight = weight
-                        best_fog_node = fog_node
-                else:
-                    print(f"Fog Node {fog_node['url']} has outdated status (last update {time_diff} seconds ago).")
-            except KeyError as e:
-                print(f"Error: Missing key in status data: {e}")
-        else:
-            print(f"No status available for Fog Node {fog_node['url']}")
+        logging.warning(f"No fog node can take the task: {reason}")
+        console(f"No fog node can take the task: {reason}")
+        task_result, status_code = spill_task(task, reason, received_at)
+        return jsonify(task_result), status_code
+
+
+def spill_task(task, reason, received_at):
+    """Send a task no fog node can take to the cloud node, or refuse it without one.
+
+    ``reason`` is the one ``route_task`` gave, or 'saturated' when the fog node
+    refused the task. Returns the task's result and HTTP status.
+    """
+    if not CLOUD_URL:
+        return refuse_task(task, reason)
+    try:
+        started_at = time.perf_counter()
+        response = http.post(CLOUD_URL + '/offload_task', json=with_remaining_deadline(task, received_at))
+        forward_seconds.labels(node_id='cloud').observe(time.perf_counter() - started_at)
+        task_result = response.json()
+        status_code = response.status_code
+    except Exception as e:
+        logging.error(f"Error during cloud offloading: {str(e)}")
+        task_result = {'status': 'error', 'message': f"Failed to offload to the cloud. Error: {str(e)}"}
+        status_code = 500
+    log_cloud_offload(task, reason, task_result)
+    return task_result, status_code
+
+
+@app.route('/offload_batch', methods=['POST'])
+def offload_batch():
+    """Handle a batch of tasks, forwarding one chunk per selected fog node."""
+    tasks = request.json['tasks']
+    received_at = time.monotonic()
+    record_arrivals('offload_batch', tasks)
+    logging.info(f"Received batch of {len(tasks)} tasks for offloading")
+
+    chunks, unassigned = partition_tasks(tasks)
+    results = [None] * len(tasks)
+
+    futures = [(batch_forward_pool.submit(forward_batch, fog_node,
+                                          [with_remaining_deadline(tasks[i], received_at) for i in indices], tokens),
+                fog_node, indices)
+               for fog_node, indices, tokens in chunks.values()]
+    for future, fog_node, indices in futures:
+        try:
+            chunk_results = future.result()
+        except Exception as e:
+            logging.error(f"Error during batch offloading to {fog_node['url']}: {str(e)}")
+            chunk_results = [{'status': 'error', 'message': f"Failed to offload to {fog_node['url']}. Error: {str(e)}"}
+                             ] * len(indices)
+
+        for i, task_result in zip(indices, chunk_results):
+            if task_result.get('status') == 'rejected':
+                unassigned[i] = 'saturated'  # The node's queue filled up since its last status
+                continue
+            results[i] = task_result
+            log_manager_actions({
+                'task_type': tasks[i]['task_type'],
+                'task_size': tasks[i]['task_size'],
+                'deadline': tasks[i]['deadline'],
+                'fog_node': fog_node['url'],
+                'node_id': fog_node['node_id'],
+                'status': offload_status(task_result),
+                'response': task_result
+            })
+
+    for i, task_result in spill_batch(tasks, unassigned, received_at).items():
+        results[i] = task_result
+    return jsonify({'results': results})
+
+
+def spill_batch(tasks, unassigned, received_at):
+    """Send the tasks of a batch that no fog node took to the cloud node in one request, or refuse them.
+
+    ``unassigned`` maps task indices to the reason they have no fog node.
+    Returns their results by index.
+    """
+    if not unassigned:
+        return {}
+    if not CLOUD_URL:
+        return {i: refuse_task(tasks[i], reason)[0] for i, reason in unassigned.items()}
+
+    spilled = [tasks[i] for i in unassigned]
+    try:
+        started_at = time.perf_counter()
+        response = http.post(CLOUD_URL + '/offload_batch',
+                             json={'tasks': [with_remaining_deadline(task, received_at) for task in spilled]})
+        forward_seconds.labels(node_id='cloud').observe(time.perf_counter() - started_at)
+        if response.status_code != 200:
+            raise Exception(f"Failed to offload batch. Status code: {response.status_code}, Response: {response.text}")
+        cloud_results = response.json()['results']
+    except Exception as e:
+        logging.error(f"Error during batch offloading to the cloud: {str(e)}")
+        cloud_results = [{'status': 'error', 'message': f"Failed to offload to the cloud. Error: {str(e)}"}
+                         ] * len(spilled)
+
+    for task, reason, task_result in zip(spilled, unassigned.values(), cloud_results):
+        log_cloud_offload(task, reason, task_result)
+    return dict(zip(unassigned, cloud_results))
+
+
+def partition_tasks(tasks):
+    """Assign every task of a batch to a fog node with ``route_task``.
+
+    Each assignment is counted as in flight right away, so the rest of the batch
+    sees the load it adds. Returns ``(chunks, unassigned)``: ``chunks`` maps node
+    ids to ``(fog_node, task indices, tokens)``, with each task's token to pass
+    to ``fog_node_registry.complete``. ``unassigned`` maps the indices of tasks
+    that got no node to the reason ``route_task`` gave.
+    """
+    started_at = time.perf_counter()
+    chunks = {}
+    unassigned = {}
+
+    for i, task in enumerate(tasks):
+        fog_node, reason = route_task(task, select=routing_policy.select)
+        if fog_node is None:
+            unassigned[i] = reason
+            continue
+
+        _, indices, tokens = chunks.setdefault(fog_node['node_id'], (fog_node, [], []))
+        indices.append(i)
+        tokens.append(fog_node_registry.dispatch(fog_node['node_id']))
+
+    selection_seconds.observe(time.perf_counter() - started_at)
+    return chunks, unassigned
+
+
+def forward_batch(fog_node, tasks, tokens):
+    """Send a chunk of tasks dispatched by ``partition_tasks`` to a fog node in one request.
+
+    Returns per-task results in order.
+    """
+    started_at = time.perf_counter()
+    try:
+        response = http.post(fog_node['url'] + '/offload_batch', json={'tasks': tasks})
+    finally:
+        fog_node_registry.complete_each(fog_node['node_id'], tokens)
+    forward_seconds.labels(node_id=fog_node['node_id']).observe(time.perf_counter() - started_at)
+    if response.status_code != 200:
+        raise Exception(f"Failed to offload batch. Status code: {response.status_code}, Response: {response.text}")
+    return response.json()['results']
+
+
+def is_saturated(fog_node):
+    """True if the node's last status plus the tasks sent since fill all its workers and queue slots."""
+    status = fog_node_statuses.get(fog_node['node_id'], {})
+    if 'max_queue_length' not in status:
+        return False
+    backlog = status.get('task_queue_length', 0) + fog_node['in_flight']
+    return backlog >= status['max_queue_length'] + status.get('workers', fog_node['capacity'])
+
+
+def route_task(task, select=None, now=None):
+    """Choose the fog node for ``task``, or give the reason it has none.
+
+    Returns ``(fog_node, None)`` or ``(None, reason)``. ``reason`` is
+    'no_fog_available' when no fresh fog node runs the task's type, the
+    InfeasibleTaskError of a policy that rejected the task for its deadline, or,
+    with a cloud to spill to, 'saturated' when every fresh node is full.
+    ``select`` replaces ``select_best_fog_node``, e.g. to skip its per-task timing.
+    """
+    try:
+        fog_node = (select or select_best_fog_node)(task, now)
+    except InfeasibleTaskError as e:
+        return None, e
+    if fog_node is None:
+        return None, 'no_fog_available'
+
+    if CLOUD_URL and is_saturated(fog_node):
+        # Fall back to the lightest node with room left
+        fog_node = next((fog_node for _, fog_node in fog_node_registry.ranked(task.get('task_type'), now)
+                         if not is_saturated(fog_node)), None)
+        if fog_node is None:
+            return None, 'saturated'
+
+    if DEADLINE_ADMISSION:
+        fog_node = deadline_admission.admit(task, fog_node, now)
+    return fog_node, None
+
+
+def select_best_fog_node(task, now=None):
+    """Return the fog node the routing policy picks for ``task`` among fresh nodes that advertise its type.
+
+    Returns None when there is no such node, and raises InfeasibleTaskError when
+    the policy rejects the task.
+    """
+    started_at = time.perf_counter()
+    try:
+        best_fog_node = routing_policy.select(task, now)
+    finally:
+        selection_seconds.observe(time.perf_counter() - started_at)
 
     if best_fog_node is None:
-        print(f"No suitable fog node found. All weights: {[calculate_weight(status) for status in fog_node_statuses.values()]}")
+        console(f"No suitable fog node found. All weights: {[calculate_weight(status) for status in fog_node_statuses.values()]}")
+    else:
+        logging.debug(f"Selected Fog Node {best_fog_node['url']} with the {ROUTING_MODE} policy")
 
     return best_fog_node
 
 
-
 def calculate_weight(status):
     try:
         return (0.4 * status['cpu_usage'] +  # Lower CPU impact
@@ -168,4 +603,10 @@ def calculate_weight(status):
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=6000, debug=True)
+    start_eviction_thread()
+    start_status_listener()
+    start_state_sync_thread()
+    if trace_recorder:
+        trace_recorder.start()
+    # No reloader: its parent process would run this block too, and start a second set of the threads above
+    app.run(host='0.0.0.0', port=6000, debug=True, use_reloader=False)
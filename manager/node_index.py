@@ -0,0 +1,87 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class FogNodeIndex:
+    """Min-heap of fog nodes keyed by weight, kept up to date as status updates arrive.
+
+    Each update pushes a new heap entry and supersedes the node's previous one,
+    which is discarded lazily when it reaches the top. Entries expire at a
+    monotonic-clock deadline, so the best node is found in O(log n) amortized
+    time instead of rescanning every status.
+    """
+
+    def __init__(self, status_timeout):
+        self.status_timeout = status_timeout
+        self._heap = []  # (weight, version, key)
+        self._entries = {}  # key -> (weight, version, expires_at, fog_node)
+        self._version = itertools.count()
+        self._lock = threading.Lock()
+
+    def update(self, key, fog_node, weight, now=None):
+        """Record a node's latest weight; its status stays valid for ``status_timeout`` seconds."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._push(key, fog_node, weight, now + self.status_timeout)
+
+    def reweight(self, key, weight):
+        """Change a node's weight without extending its status; ignored for nodes not in the index."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._push(key, entry[3], weight, entry[2])
+
+    def _push(self, key, fog_node, weight, expires_at):
+        version = next(self._version)
+        self._entries[key] = (weight, version, expires_at, fog_node)
+        heapq.heappush(self._heap, (weight, version, key))
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._compact()
+
+    def remove(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def best(self, now=None):
+        """Return ``(fog_node, weight)`` for the lowest-weight node with a fresh status, or ``(None, None)``."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._heap:
+                weight, version, key = self._heap[0]
+                entry = self._entries.get(key)
+                if entry is None or entry[1] != version:
+                    heapq.heappop(self._heap)  # Superseded by a newer update
+                elif entry[2] <= now:
+                    heapq.heappop(self._heap)  # Status is older than the timeout
+                    del self._entries[key]
+                else:
+                    return entry[3], weight
+            return None, None
+
+    def get(self, key, now=None):
+        """Return ``(fog_node, weight)`` if ``key`` has a fresh status, else ``(None, None)``."""
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None or entry[2] <= now:
+            return None, None
+        return entry[3], entry[0]
+
+    def fresh(self, now=None):
+        """Return ``(weight, fog_node)`` for every node with a fresh status, in no particular order."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [(weight, fog_node) for weight, _, expires_at, fog_node in self._entries.values()
+                    if expires_at > now]
+
+    def ranked(self, now=None):
+        """Return ``(weight, fog_node)`` for every node with a fresh status, lowest weight first."""
+        return sorted(self.fresh(now), key=lambda entry: entry[0])
+
+    def _compact(self):
+        self._heap = [(weight, version, key) for key, (weight, version, _, _) in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,176 @@
+import random
+
+# Delay model of the fog nodes' process_task: a task is transmitted at TRANSMISSION_RATE size units
+# per second, propagates for PROPAGATION_DELAY seconds, waits for a worker and is processed. Nodes that
+# report their own link in transmission_rate and propagation_delay are modelled with it.
+TRANSMISSION_RATE = 10
+PROPAGATION_DELAY = 0.1
+
+# Size units a fog node worker processes per second, until the node reports its own avg_service_rate
+DEFAULT_SERVICE_RATE = 10
+
+
+class InfeasibleTaskError(Exception):
+    """Raised by a policy that rejects a task because no fog node can finish it within its deadline."""
+
+
+def task_cache_key(task):
+    """The id fog nodes cache a task's result under."""
+    return f"{task['task_type']}_{task['task_size']}"
+
+
+class SchedulingPolicy:
+    """Chooses the fog node that runs a task.
+
+    Policies read the fog node registry, which ranks fresh nodes by their status
+    weight plus the tasks the manager has in flight to them, and the nodes' last
+    statuses. ``select`` returns a fog node, or None when no fresh node runs the
+    task's type.
+    """
+
+    def __init__(self, registry, statuses):
+        self.registry = registry
+        self.statuses = statuses
+
+    def select(self, task, now=None):
+        raise NotImplementedError
+
+
+class WeightedPolicy(SchedulingPolicy):
+    """The node with the lowest ``calculate_weight`` (CPU, memory and queue), counting in-flight tasks."""
+
+    def select(self, task, now=None):
+        return self.registry.best(task.get('task_type'), now)[0]
+
+
+class AffinityPolicy(SchedulingPolicy):
+    """The node a task id hashes to on the ring, where its result is likely cached.
+
+    The ring is walked until a node within ``weight_slack`` of the best weight is
+    found, so busy nodes are skipped; the best node itself always qualifies.
+    """
+
+    def __init__(self, registry, statuses, weight_slack=10):
+        super().__init__(registry, statuses)
+        self.weight_slack = weight_slack
+
+    def select(self, task, now=None):
+        task_type = task.get('task_type')
+        best_fog_node, best_weight = self.registry.best(task_type, now)
+        if best_fog_node is None:
+            return None
+        for node_id in self.registry.ring.walk(task_cache_key(task)):
+            fog_node, weight = self.registry.status_weight(node_id, task_type, now)
+            if fog_node is not None and weight <= best_weight + self.weight_slack:
+                return fog_node
+        return best_fog_node
+
+
+class PowerOfTwoPolicy(SchedulingPolicy):
+    """The lighter of two fresh nodes picked at random.
+
+    Spreads tasks that would all see the same best node on stale statuses, at
+    the cost of sometimes missing the single best node.
+    """
+
+    def __init__(self, registry, statuses, rng=None):
+        super().__init__(registry, statuses)
+        self.rng = rng or random.Random()
+
+    def select(self, task, now=None):
+        candidates = self.registry.candidates(task.get('task_type'), now)
+        if len(candidates) < 2:
+            return candidates[0][1] if candidates else None
+        return min(self.rng.sample(candidates, 2), key=lambda candidate: candidate[0])[1]
+
+
+class LeastExpectedCompletionPolicy(SchedulingPolicy):
+    """The node expected to return the task soonest, from its backlog and service rate.
+
+    Each joule the node is expected to spend on the task, from the energy per
+    unit of task size it measured, counts as ``energy_weight`` seconds of delay,
+    so a node that burns more energy loses to one about as fast.
+    """
+
+    def __init__(self, registry, statuses, energy_weight=0.0):
+        super().__init__(registry, statuses)
+        self.energy_weight = energy_weight
+
+    def expected_delay(self, task, fog_node):
+        """The delay the fog node would report for ``task``: transmission, propagation, queue wait and processing."""
+        status = self.statuses.get(fog_node['node_id'], {})
+        # A node that has not reported its service rate processes at the rate its measured CPU time gives
+        cpu_per_unit = status.get('avg_cpu_per_unit')
+        service_rate = status.get('avg_service_rate') or (1 / cpu_per_unit if cpu_per_unit else DEFAULT_SERVICE_RATE)
+        workers = status.get('workers') or fog_node['capacity']
+        processing_time = task['task_size'] / service_rate
+        per_task = status.get('avg_service_time') or processing_time
+
+        # Queued and running tasks the node reported, plus those dispatched since; one more than a free worker waits
+        backlog = status.get('task_queue_length', 0) + fog_node['in_flight']
+        wait = max(0, backlog + 1 - workers) * per_task / workers
+        transmission_rate = status.get('transmission_rate') or TRANSMISSION_RATE
+        propagation_delay = status.get('propagation_delay', PROPAGATION_DELAY)
+        return task['task_size'] / transmission_rate + propagation_delay + wait + processing_time
+
+    def expected_energy(self, task, fog_node):
+        """The joules the fog node is expected to spend computing ``task``, 0 until it has measured any."""
+        return task['task_size'] * self.statuses.get(fog_node['node_id'], {}).get('avg_energy_per_unit', 0)
+
+    def cost(self, task, fog_node):
+        return self.expected_delay(task, fog_node) + self.energy_weight * self.expected_energy(task, fog_node)
+
+    def select(self, task, now=None):
+        candidates = self.registry.candidates(task.get('task_type'), now)
+        if not candidates:
+            return None
+        return min((fog_node for _, fog_node in candidates), key=lambda fog_node: self.cost(task, fog_node))
+
+
+class DeadlinePolicy(LeastExpectedCompletionPolicy):
+    """The lowest-weight node expected to finish the task within its deadline.
+
+    Reroutes a task away from the best node when that node would miss the
+    deadline, and raises InfeasibleTaskError when every node would, instead of
+    queueing work that is bound to be late. Fog nodes then serve it in earliest
+    deadline first order.
+    """
+
+    def select(self, task, now=None):
+        candidates = self.registry.ranked(task.get('task_type'), now)
+        if not candidates or 'deadline' not in task:
+            return candidates[0][1] if candidates else None
+        for _, fog_node in candidates:
+            if self.expected_delay(task, fog_node) <= task['deadline']:
+                return fog_node
+        fastest = min(self.expected_delay(task, fog_node) for _, fog_node in candidates)
+        raise InfeasibleTaskError(f"No fog node can finish the task within its {task['deadline']}s deadline "
+                                  f"(fastest expected: {fastest:.1f}s)")
+
+
+class DeadlineAdmission(LeastExpectedCompletionPolicy):
+    """Deadline check on the node any policy chose, redirecting tasks it is expected to finish late.
+
+    ``admit`` keeps the chosen node when it is expected to compute the task in
+    time, and otherwise returns the lowest-weight node that is. When no node
+    is, the task stays on the chosen node: that node may still answer it from
+    its cache, and drops it from its queue unprocessed otherwise.
+    """
+
+    def admit(self, task, fog_node, now=None):
+        if 'deadline' not in task or self.expected_delay(task, fog_node) <= task['deadline']:
+            return fog_node
+        for _, candidate in self.registry.ranked(task.get('task_type'), now):
+            if self.expected_delay(task, candidate) <= task['deadline']:
+                return candidate
+        return fog_node
+
+
+# Routing policies by the name ROUTING_MODE selects them with
+POLICIES = {
+    'weighted': WeightedPolicy,
+    'affinity': AffinityPolicy,
+    'power_of_two': PowerOfTwoPolicy,
+    'least_ect': LeastExpectedCompletionPolicy,
+    'deadline': DeadlinePolicy
+}
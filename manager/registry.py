@@ -0,0 +1,225 @@
+import collections
+import threading
+import time
+
+from hash_ring import HashRing
+from node_index import FogNodeIndex
+from state_store import MemoryStateStore
+
+
+class FogNodeRegistry:
+    """Fog nodes that registered with the manager, with heartbeat-based eviction.
+
+    Every node is ranked in one selection index per task type it advertises, plus
+    an index over all nodes, so selection follows membership changes directly.
+    Members are also placed on a consistent-hash ring for cache-affinity routing.
+
+    Between status updates, the registry counts the tasks dispatched to each node
+    and not yet answered, and ranks the node by its status weight plus
+    ``in_flight_weight`` per such task. The next status already includes those
+    tasks, so it resets the count.
+
+    Registrations, statuses and in-flight counts are written through to
+    ``store``. With a store shared by several manager replicas, ``sync``
+    brings in what the other replicas recorded.
+    """
+
+    def __init__(self, status_timeout, eviction_timeout, in_flight_weight=0.2, store=None):
+        self.status_timeout = status_timeout
+        self.eviction_timeout = eviction_timeout
+        self.in_flight_weight = in_flight_weight
+        self._lock = threading.Lock()
+        self.reset(store)
+
+    def reset(self, store=None):
+        """Forget every node, e.g. between simulation or benchmark runs, and start over in ``store``."""
+        with self._lock:
+            self.store = store or MemoryStateStore()  # Registrations, statuses, in-flight counts
+            self._nodes = {}  # node_id -> fog node
+            self._indexes = {None: FogNodeIndex(self.status_timeout)}  # task_type -> index, None covers every node
+            self.ring = HashRing()
+
+    def register(self, node_id, url, capacity=1, task_types=()):
+        """Add or refresh a fog node and return its registry entry."""
+        registration = {'node_id': node_id, 'url': url, 'capacity': capacity, 'task_types': list(task_types)}
+        generation = self.store.register(registration)
+        with self._lock:
+            return self._add(registration, generation, time.monotonic())
+
+    def _add(self, registration, generation, now):
+        fog_node = {
+            **registration,
+            'last_heartbeat': now,
+            'status_weight': None,  # Weight of the last status, before in-flight tasks
+            'in_flight': 0,  # Tasks dispatched since the last status and not answered yet
+            'status_generation': generation  # Generation of the last status, to match answers to dispatches
+        }
+        previous = self._nodes.get(fog_node['node_id'])
+        if previous:
+            self._unindex(previous)
+        self._nodes[fog_node['node_id']] = fog_node
+        self.ring.add(fog_node['node_id'])
+        for task_type in fog_node['task_types']:
+            self._indexes.setdefault(task_type, FogNodeIndex(self.status_timeout))
+        return fog_node
+
+    def deregister(self, node_id):
+        self.store.deregister(node_id)
+        with self._lock:
+            return self._remove(node_id)
+
+    def _remove(self, node_id):
+        fog_node = self._nodes.pop(node_id, None)
+        if fog_node:
+            self._unindex(fog_node)
+            self.ring.remove(node_id)
+        return fog_node
+
+    def heartbeat(self, node_id, weight, now=None, status=None):
+        """Record a status heartbeat and re-rank the node.
+
+        Returns ``(fog_node, accepted)``, or None for unknown nodes. ``status``
+        is stored for the other managers sharing the store. One older than the
+        status stored there is not ``accepted``, and leaves the node's weight as
+        it was until ``sync`` brings in the newer one. A node another manager
+        registered is added from the store.
+        """
+        now = time.monotonic() if now is None else now
+        recorded = self.store.record_status(node_id, status or {}, time.time())
+        if recorded is None:
+            return None
+        generation, in_flight, accepted = recorded
+        registration = None if node_id in self._nodes else self.store.registration(node_id)
+        with self._lock:
+            fog_node = self._nodes.get(node_id)
+            if fog_node is None:
+                if registration is None:
+                    return None
+                fog_node = self._add(registration, None, now)
+            if accepted:
+                fog_node['last_heartbeat'] = now
+                fog_node['status_weight'] = weight
+                fog_node['status_generation'], fog_node['in_flight'] = generation, in_flight
+                self._rank(fog_node, now)
+        return fog_node, accepted
+
+    def dispatch(self, node_id, count=1):
+        """Count ``count`` tasks sent to a node and re-rank it; returns the token to pass to ``complete``."""
+        if node_id not in self._nodes:
+            return None
+        dispatched = self.store.dispatch(node_id, count)
+        if dispatched is None:
+            return None
+        in_flight, token = dispatched
+        self._set_in_flight(node_id, in_flight)
+        return token
+
+    def complete(self, node_id, token, count=1):
+        """Stop counting answered tasks, unless a status received since their dispatch already reset the count."""
+        if token is None:
+            return  # Dispatched to a node the registry did not know
+        in_flight = self.store.complete(node_id, token, count)
+        if in_flight is not None:
+            self._set_in_flight(node_id, in_flight)
+
+    def complete_each(self, node_id, tokens):
+        """``complete`` for tasks answered together, given the token each one's ``dispatch`` returned."""
+        for token, count in collections.Counter(tokens).items():
+            self.complete(node_id, token, count)
+
+    def _set_in_flight(self, node_id, in_flight):
+        with self._lock:
+            fog_node = self._nodes.get(node_id)
+            if fog_node is not None:
+                fog_node['in_flight'] = in_flight
+                self._reweight(fog_node)
+
+    def sync(self, shared, weights, now=None):
+        """Bring the registry up to date with node state other managers recorded in a shared store.
+
+        ``shared`` is the store's ``load()``, and ``weights`` maps node ids to
+        the weight of their current status. Nodes gone from the store are
+        dropped, nodes new to it added, and nodes with a status this manager
+        has not seen re-ranked as of when that status was received.
+        """
+        now = time.monotonic() if now is None else now
+        wall_clock = time.time()
+        with self._lock:
+            for node_id in [node_id for node_id in self._nodes if node_id not in shared]:
+                self._remove(node_id)
+            for node_id, state in shared.items():
+                fog_node = self._nodes.get(node_id)
+                registration = state['registration']
+                if fog_node is None or any(fog_node[key] != value for key, value in registration.items()):
+                    fog_node = self._add(registration, None, now)
+                elif fog_node['status_generation'] is not None and state['generation'] < fog_node['status_generation']:
+                    continue  # Loaded before a status this manager has recorded since
+                if state['generation'] != fog_node['status_generation'] and node_id in weights:
+                    fog_node['last_heartbeat'] = now - (wall_clock - state['received_at'])
+                    fog_node['status_weight'] = weights[node_id]
+                fog_node['status_generation'], fog_node['in_flight'] = state['generation'], state['in_flight']
+                if fog_node['status_weight'] is not None:
+                    self._rank(fog_node, fog_node['last_heartbeat'])
+
+    def best(self, task_type=None, now=None):
+        """Return ``(fog_node, weight)`` for the best fresh node able to run ``task_type``.
+
+        Falls back to every node when no registered node advertises ``task_type``.
+        """
+        index = self._indexes.get(task_type, self._indexes[None])
+        return index.best(now)
+
+    def status_weight(self, node_id, task_type=None, now=None):
+        """Return ``(fog_node, weight)`` if the node has a fresh status and runs ``task_type``."""
+        index = self._indexes.get(task_type, self._indexes[None])
+        return index.get(node_id, now)
+
+    def ranked(self, task_type=None, now=None):
+        """Return ``(weight, fog_node)`` for every fresh node able to run ``task_type``, best first."""
+        index = self._indexes.get(task_type, self._indexes[None])
+        return index.ranked(now)
+
+    def candidates(self, task_type=None, now=None):
+        """Return ``(weight, fog_node)`` for every fresh node able to run ``task_type``, unordered."""
+        index = self._indexes.get(task_type, self._indexes[None])
+        return index.fresh(now)
+
+    def evict_silent(self, now=None):
+        """Drop nodes whose last heartbeat is older than ``eviction_timeout``; returns them."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            silent = [fog_node for fog_node in self._nodes.values()
+                      if now - fog_node['last_heartbeat'] > self.eviction_timeout]
+            for fog_node in silent:
+                self._remove(fog_node['node_id'])
+        for fog_node in silent:
+            self.store.deregister(fog_node['node_id'])
+        return silent
+
+    def get(self, node_id):
+        return self._nodes.get(node_id)
+
+    def nodes(self):
+        with self._lock:
+            return list(self._nodes.values())
+
+    def _weight(self, fog_node):
+        return fog_node['status_weight'] + self.in_flight_weight * fog_node['in_flight']
+
+    def _rank(self, fog_node, heartbeat):
+        """Index the node by its weight, with its status valid from ``heartbeat``."""
+        for task_type in [None] + fog_node['task_types']:
+            self._indexes[task_type].update(fog_node['node_id'], fog_node, self._weight(fog_node), heartbeat)
+
+    def _reweight(self, fog_node):
+        if fog_node['status_weight'] is None:
+            return  # Not ranked until its first status
+        for task_type in [None] + fog_node['task_types']:
+            self._indexes[task_type].reweight(fog_node['node_id'], self._weight(fog_node))
+
+    def _unindex(self, fog_node):
+        for task_type in [None] + fog_node['task_types']:
+            self._indexes[task_type].remove(fog_node['node_id'])
+
+    def __len__(self):
+        return len(self._nodes)
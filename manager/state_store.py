@@ -0,0 +1,239 @@
+import itertools
+import json
+import threading
+
+import redis
+
+from common.status_stream import is_stale_status
+
+# Every script below takes the store's keys in this order:
+# registrations, statuses, status receipt times, in-flight counts, status generations, generation counter
+RECORD_STATUS_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+    return nil
+end
+local stored = redis.call('HGET', KEYS[2], ARGV[1])
+if stored and ARGV[4] ~= '' then
+    local previous = cjson.decode(stored)
+    if previous.epoch == tonumber(ARGV[3]) and tonumber(ARGV[4]) <= (tonumber(previous.seq) or 0) then
+        return {tonumber(redis.call('HGET', KEYS[5], ARGV[1])), tonumber(redis.call('HGET', KEYS[4], ARGV[1])), 0}
+    end
+end
+local generation = redis.call('INCR', KEYS[6])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[5])
+redis.call('HSET', KEYS[4], ARGV[1], 0)
+redis.call('HSET', KEYS[5], ARGV[1], generation)
+return {generation, 0, 1}
+"""
+
+REGISTER_SCRIPT = """
+local generation = redis.call('INCR', KEYS[6])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('HSET', KEYS[4], ARGV[1], 0)
+redis.call('HSET', KEYS[5], ARGV[1], generation)
+return generation
+"""
+
+# Adds in-flight deltas given as (node id, generation, delta) triples, skipping those of a generation since reset
+ADD_IN_FLIGHT_SCRIPT = """
+for i = 1, #ARGV, 3 do
+    if redis.call('HGET', KEYS[5], ARGV[i]) == ARGV[i + 1] then
+        if redis.call('HINCRBY', KEYS[4], ARGV[i], ARGV[i + 2]) < 0 then
+            redis.call('HSET', KEYS[4], ARGV[i], 0)
+        end
+    end
+end
+"""
+
+
+class MemoryStateStore:
+    """Fog node registrations, statuses and in-flight task counts, held by this manager process alone.
+
+    Each status a node reports starts a new generation, which resets its
+    in-flight count: the status already includes the tasks dispatched before it.
+    Generations are unique across nodes and registrations, and serve as the
+    token that matches answered tasks to the count they were added to.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._nodes = {}  # node_id -> {'registration', 'status', 'received_at', 'in_flight', 'generation'}
+        self._generations = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def register(self, registration):
+        """Store a node's registration, dropping any earlier status; returns its generation."""
+        with self._lock:
+            generation = next(self._generations)
+            self._nodes[registration['node_id']] = {'registration': registration, 'status': None,
+                                                    'received_at': None, 'in_flight': 0, 'generation': generation}
+            return generation
+
+    def deregister(self, node_id):
+        with self._lock:
+            self._nodes.pop(node_id, None)
+
+    def registration(self, node_id):
+        with self._lock:
+            state = self._nodes.get(node_id)
+            return state and state['registration']
+
+    def record_status(self, node_id, status, received_at):
+        """Store a node's status and start a new generation; returns ``(generation, in_flight, accepted)``.
+
+        A status older than the stored one leaves the node as it is, and is
+        not ``accepted``. Returns None for unknown nodes.
+        """
+        with self._lock:
+            state = self._nodes.get(node_id)
+            if state is None:
+                return None
+            accepted = not is_stale_status(state['status'], status)
+            if accepted:
+                state.update(status=status, received_at=received_at, in_flight=0,
+                             generation=next(self._generations))
+            return state['generation'], state['in_flight'], accepted
+
+    def dispatch(self, node_id, count=1):
+        """Count ``count`` more tasks in flight to a node; returns ``(in_flight, generation)``, or None."""
+        with self._lock:
+            state = self._nodes.get(node_id)
+            if state is None:
+                return None
+            state['in_flight'] += count
+            return state['in_flight'], state['generation']
+
+    def complete(self, node_id, token, count=1):
+        """Count ``count`` tasks answered; returns the node's in-flight count, or None if a status reset it."""
+        with self._lock:
+            state = self._nodes.get(node_id)
+            if state is None or state['generation'] != token:
+                return None
+            state['in_flight'] = max(0, state['in_flight'] - count)
+            return state['in_flight']
+
+    def load(self):
+        """Return a copy of every node's state, by node id."""
+        with self._lock:
+            return {node_id: dict(state) for node_id, state in self._nodes.items()}
+
+
+class RedisStateStore:
+    """The same node state in Redis hashes, shared by every manager replica using the same ``prefix``.
+
+    Each update is one Lua script run, so replicas counting tasks to the same
+    node, or recording the same status delta, do not overwrite each other.
+
+    Dispatches and answers do not wait on Redis: each replica counts them
+    against the generation it last saw, and adds its counts to the shared
+    ones in one script run. A count made against a generation another
+    replica has since reset is dropped there, as the new status includes it.
+    Each ``load`` flushes the counts this replica made since the previous one,
+    so other replicas see them one sync later.
+    """
+
+    shared = True
+
+    def __init__(self, client, prefix='manager'):
+        self.client = client
+        self.keys = [f"{prefix}:{name}" for name in
+                     ('nodes', 'statuses', 'received_at', 'in_flight', 'generation', 'generations')]
+        self._record_status = client.register_script(RECORD_STATUS_SCRIPT)
+        self._register = client.register_script(REGISTER_SCRIPT)
+        self._add_in_flight = client.register_script(ADD_IN_FLIGHT_SCRIPT)
+        self._nodes = {}  # node_id -> [generation, shared in-flight count] as last seen in Redis
+        self._pending = {}  # (node_id, generation) -> in-flight delta not flushed yet
+        self._lock = threading.Lock()
+
+    def _in_flight(self, node_id):
+        generation, in_flight = self._nodes[node_id]
+        return max(0, in_flight + self._pending.get((node_id, generation), 0))
+
+    def register(self, registration):
+        generation = self._register(keys=self.keys, args=[registration['node_id'], json.dumps(registration)])
+        with self._lock:
+            self._nodes[registration['node_id']] = [generation, 0]
+        return generation
+
+    def deregister(self, node_id):
+        pipeline = self.client.pipeline()
+        for key in self.keys[:5]:
+            pipeline.hdel(key, node_id)
+        pipeline.execute()
+        with self._lock:
+            self._nodes.pop(node_id, None)
+
+    def registration(self, node_id):
+        registration = self.client.hget(self.keys[0], node_id)
+        return registration and json.loads(registration)
+
+    def record_status(self, node_id, status, received_at):
+        recorded = self._record_status(keys=self.keys, args=[
+            node_id, json.dumps(status), status.get('epoch', ''), status.get('seq', ''), received_at])
+        if recorded is None:
+            return None
+        generation, in_flight, accepted = recorded
+        with self._lock:
+            self._nodes[node_id] = [generation, in_flight]
+            return generation, self._in_flight(node_id), bool(accepted)
+
+    def dispatch(self, node_id, count=1):
+        with self._lock:
+            if node_id not in self._nodes:
+                return None
+            generation = self._nodes[node_id][0]
+            self._pending[node_id, generation] = self._pending.get((node_id, generation), 0) + count
+            return self._in_flight(node_id), generation
+
+    def complete(self, node_id, token, count=1):
+        with self._lock:
+            if node_id not in self._nodes or self._nodes[node_id][0] != token:
+                return None
+            self._pending[node_id, token] = self._pending.get((node_id, token), 0) - count
+            return self._in_flight(node_id)
+
+    def load(self):
+        """Flush this replica's in-flight counts, then return every node's state, by node id."""
+        with self._lock:
+            flushed = {key: delta for key, delta in self._pending.items() if delta}
+        pipeline = self.client.pipeline()
+        if flushed:
+            self._add_in_flight(keys=self.keys, args=[value for (node_id, generation), delta in flushed.items()
+                                                      for value in (node_id, generation, delta)], client=pipeline)
+        for key in self.keys[:5]:
+            pipeline.hgetall(key)
+        registrations, statuses, received_at, in_flight, generations = [
+            {field.decode(): value for field, value in values.items()} for values in pipeline.execute()[-5:]]
+        loaded = {}
+        with self._lock:
+            for key, delta in flushed.items():
+                self._pending[key] -= delta
+            self._pending = {key: delta for key, delta in self._pending.items() if delta}
+            nodes = {node_id: [int(generations.get(node_id, 0)), int(in_flight.get(node_id, 0))]
+                     for node_id in registrations}
+            for node_id, node in nodes.items():
+                if node_id in self._nodes and self._nodes[node_id][0] > node[0]:
+                    nodes[node_id] = self._nodes[node_id]  # A status recorded here since the load
+            self._nodes = nodes
+            for node_id, registration in registrations.items():
+                loaded[node_id] = {
+                    'registration': json.loads(registration),
+                    'status': json.loads(statuses[node_id]) if node_id in statuses else None,
+                    'received_at': float(received_at[node_id]) if node_id in received_at else None,
+                    'in_flight': self._in_flight(node_id),
+                    'generation': self._nodes[node_id][0]
+                }
+        return loaded
+
+
+def create_state_store(name, host, port):
+    """Build the node state store ``name``: 'memory', or 'redis' on the server at ``host:port``."""
+    if name == 'memory':
+        return MemoryStateStore()
+    if name == 'redis':
+        return RedisStateStore(redis.Redis(host=host, port=port, socket_connect_timeout=1.0, socket_timeout=1.0))
+    raise ValueError(f"Unknown manager state store {name!r}, expected 'memory' or 'redis'")
@@ -0,0 +1,33 @@
+import heapq
+import itertools
+
+
+class Simulation:
+    """Discrete-event loop on a virtual clock.
+
+    Callbacks scheduled for the same time run in the order they were scheduled,
+    so a run is fully determined by its inputs and random seeds.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._events = []  # (time, sequence, callback, args)
+        self._sequence = itertools.count()
+
+    def at(self, time, callback, *args):
+        """Run ``callback(*args)`` at virtual ``time``, or right after the current event if that has passed."""
+        heapq.heappush(self._events, (max(time, self.now), next(self._sequence), callback, args))
+
+    def after(self, delay, callback, *args):
+        self.at(self.now + delay, callback, *args)
+
+    def run(self, until=None):
+        """Process events in time order until none are left or the next one is after ``until``."""
+        while self._events:
+            if until is not None and self._events[0][0] > until:
+                break
+            self.now, _, callback, args = heapq.heappop(self._events)
+            callback(*args)
+
+    def __len__(self):
+        return len(self._events)
@@ -0,0 +1,365 @@
+import heapq
+import itertools
+import math
+
+from fog_nodes.executor import EWMA_ALPHA
+from fog_nodes.instrumentation import PowerModel, UsageAverages
+from fog_nodes.result_cache import LocalCache
+
+# Fog node settings, as deployed: Redis TTL, L1 size and TTL, lease time and how often a node polls
+# Redis for a result another node is computing
+L2_TTL = 600
+L1_MAX_ENTRIES = 512
+L1_TTL = 60
+LEASE_TIME = 30
+RESULT_POLL_INTERVAL = 0.1
+
+# Delay model of the fog nodes' process_task: transmission at 10 size units per second and 0.1 s of
+# propagation, plus processing at the node's speed and the time spent queued
+TRANSMISSION_RATE = 10
+PROPAGATION_DELAY = 0.1
+SERVICE_RATE = 10
+
+# The fog nodes' default power model (FOG_POWER_IDLE_WATTS, FOG_POWER_CORE_WATTS) and the cloud node's
+IDLE_WATTS = 3.0
+CORE_WATTS = 4.0
+CLOUD_IDLE_WATTS = 100.0
+CLOUD_CORE_WATTS = 10.0
+
+
+class SimulatedExecutor:
+    """The fog nodes' TaskExecutor on the virtual clock.
+
+    A bounded queue served earliest deadline first by a fixed pool of workers,
+    with the same statistics. ``on_change`` is called whenever a task is queued
+    or finishes. With ``drop_late``, a task that would finish after its deadline
+    is dropped when it reaches a worker.
+    """
+
+    def __init__(self, sim, workers, max_queue_length, service_rate, on_change=None, drop_late=False):
+        self.sim = sim
+        self.drop_late = drop_late
+        self.workers = workers
+        self.max_queue_length = max_queue_length
+        self.service_rate = service_rate  # Size units one worker processes per second
+        self.on_change = on_change or (lambda: None)
+        self._queue = []  # (absolute deadline, sequence, enqueued_at, task, done)
+        self._sequence = itertools.count()
+        self.active_tasks = 0
+        self.completed_tasks = 0
+        self.rejected_tasks = 0
+        self.expired_tasks = 0
+        self.avg_wait_time = 0.0
+        self.avg_service_time = 0.0
+        self.avg_service_rate = 0.0
+
+    def submit(self, task, done, deadline=None, expired=None):
+        """Queue a task; returns False if the queue is full.
+
+        ``deadline`` is the seconds from now the task must be processed within,
+        by default its ``deadline`` field. Once processed,
+        ``done(processing_time, wait_time)`` is called, or ``expired(wait_time)``
+        if the task was dropped.
+        """
+        if len(self._queue) >= self.max_queue_length:
+            self.rejected_tasks += 1
+            return False
+        deadline = self.sim.now + (task.get('deadline', float('inf')) if deadline is None else deadline)
+        heapq.heappush(self._queue, (deadline, next(self._sequence), self.sim.now, task, (done, expired)))
+        self.on_change()
+        self._start_next()
+        return True
+
+    def _start_next(self):
+        while self.active_tasks < self.workers and self._queue:
+            deadline, _, enqueued_at, task, (done, expired) = heapq.heappop(self._queue)
+            processing_time = task['task_size'] / self.service_rate
+            if self.drop_late and self.sim.now + processing_time > deadline:
+                self.expired_tasks += 1
+                self.on_change()
+                expired(self.sim.now - enqueued_at)
+                continue
+            self.active_tasks += 1
+            self.sim.after(processing_time, self._finish, task, done, processing_time, self.sim.now - enqueued_at)
+
+    def _finish(self, task, done, processing_time, wait_time):
+        self.active_tasks -= 1
+        self.completed_tasks += 1
+        self.avg_wait_time += EWMA_ALPHA * (wait_time - self.avg_wait_time)
+        self.avg_service_time += EWMA_ALPHA * (processing_time - self.avg_service_time)
+        self.avg_service_rate += (EWMA_ALPHA if self.avg_service_rate else 1) * (self.service_rate -
+                                                                                   self.avg_service_rate)
+        self.on_change()
+        done(processing_time, wait_time)
+        self._start_next()
+
+    def stats(self):
+        return {
+            'queue_depth': len(self._queue),
+            'active_tasks': self.active_tasks,
+            'workers': self.workers,
+            'max_queue_length': self.max_queue_length,
+            'completed_tasks': self.completed_tasks,
+            'rejected_tasks': self.rejected_tasks,
+            'expired_tasks': self.expired_tasks,
+            'avg_wait_time': round(self.avg_wait_time, 4),
+            'avg_service_time': round(self.avg_service_time, 4),
+            'avg_service_rate': round(self.avg_service_rate, 4)
+        }
+
+
+class SharedCache:
+    """Redis as the fog nodes use it: results with a TTL, compute leases and L1 invalidation.
+
+    A node waiting on another node's lease polls every ``RESULT_POLL_INTERVAL``
+    seconds, so it sees a result, or a lease released without one, at its first
+    poll after the change.
+    """
+
+    def __init__(self, sim, ttl=L2_TTL):
+        self.sim = sim
+        self.ttl = ttl
+        self.nodes = []  # Fog nodes that drop their L1 copy when another node writes a result
+        self._results = {}  # task_id -> (expires_at, result)
+        self._leases = {}  # task_id -> (node_id, expires_at)
+        self._waiters = {}  # task_id -> [(started_at, waiter)]
+
+    def get(self, task_id):
+        entry = self._results.get(task_id)
+        return entry[1] if entry and entry[0] > self.sim.now else None
+
+    def acquire_lease(self, task_id, node_id, lease_time=LEASE_TIME):
+        lease = self._leases.get(task_id)
+        if lease and lease[1] > self.sim.now:
+            return False
+        self._leases[task_id] = (node_id, self.sim.now + lease_time)
+        return True
+
+    def release_lease(self, task_id, node_id):
+        if self._leases.get(task_id, (None,))[0] == node_id:
+            del self._leases[task_id]
+            if self.get(task_id) is None:
+                self._wake(task_id, None)  # Released without a result, so a waiting node may take it
+
+    def set(self, task_id, result, origin):
+        self._results[task_id] = (self.sim.now + self.ttl, result)
+        for node in self.nodes:
+            if node.node_id != origin:
+                node.l1.delete(task_id)
+        self._wake(task_id, result)
+
+    def _wake(self, task_id, result):
+        for started_at, waiter in self._waiters.pop(task_id, []):
+            if not waiter['done']:
+                waiter['done'] = True
+                polls = max(1, math.ceil((self.sim.now - started_at) / RESULT_POLL_INTERVAL - 1e-9))
+                self.sim.at(started_at + polls * RESULT_POLL_INTERVAL, waiter['callback'], result)
+
+    def wait_for_result(self, task_id, callback, timeout=LEASE_TIME):
+        """Call ``callback(result)`` once another node writes the result, or ``callback(None)`` once the lease
+        is released without one or after ``timeout``."""
+        waiter = {'done': False, 'callback': callback}
+        self._waiters.setdefault(task_id, []).append((self.sim.now, waiter))
+        self.sim.after(timeout, self._expire, waiter)
+
+    def _expire(self, waiter):
+        if not waiter['done']:
+            waiter['done'] = True
+            waiter['callback'](None)
+
+
+class SimulatedFogNode:
+    """A fog node's ``/offload_task`` on the virtual clock.
+
+    Checks its L1 (the fog nodes' own LocalCache) and the shared cache,
+    coalesces identical tasks, takes the Redis lease or waits for the node that
+    holds it, and computes on a SimulatedExecutor with the fog nodes' delay and
+    energy model, which charges processing time as CPU time of the node's
+    ``power_model``. ``speed`` scales how fast its workers process. Every answered
+    task is kept in ``log`` with the fields of the fog node's CSV log.
+    """
+
+    def __init__(self, sim, cache, node_id, fog_node_number, workers=2, speed=1.0, max_queue_length=32,
+                 total_memory=1024 * 2 ** 20, memory_available=512 * 2 ** 20, power_model=None, drop_late=True):
+        self.sim = sim
+        self.cache = cache
+        self.node_id = node_id
+        self.fog_node_number = fog_node_number
+        self.total_memory = total_memory
+        self.memory_available = memory_available
+        self.executor = SimulatedExecutor(sim, workers, max_queue_length, SERVICE_RATE * speed,
+                                          on_change=self.notify, drop_late=drop_late)
+        self.l1 = LocalCache(L1_MAX_ENTRIES, L1_TTL, clock=lambda: sim.now)
+        self.power_model = power_model or PowerModel(IDLE_WATTS, CORE_WATTS, workers)
+        self.usage = UsageAverages(EWMA_ALPHA)  # CPU time and energy per unit of task size, for its status
+        self.on_change = lambda: None  # Set by whoever publishes this node's status
+        self._flights = {}  # task_id -> callbacks waiting for the computation in progress, leader first
+        self.log = []
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        cache.nodes.append(self)
+
+    def notify(self):
+        self.on_change()
+
+    def offload(self, task, respond):
+        """Answer ``task`` like the fog node's endpoint; calls ``respond(metrics, status_code)`` when done."""
+        task_id = f"{task['task_type']}_{task['task_size']}"
+        result = self.l1.get(task_id)
+        if result is not None:
+            self.l1_hits += 1
+            respond(self._log_metrics(task_id, result, from_cache=True, cache_hit='L1'), 200)
+            return
+        result = self.cache.get(task_id)
+        if result is not None:
+            self.l2_hits += 1
+            self.l1.set(task_id, result)
+            respond(self._log_metrics(task_id, result, from_cache=True, cache_hit='L2'), 200)
+            return
+        self.misses += 1
+
+        if task_id in self._flights:
+            self._flights[task_id].append(respond)  # Identical task already in progress here
+            return
+        self._flights[task_id] = [respond]
+        self._lease_or_wait(task, task_id)
+
+    def _lease_or_wait(self, task, task_id):
+        if self.cache.acquire_lease(task_id, self.node_id):
+            result = self.cache.get(task_id)  # Rechecked with the lease, as ResultCache.compute_once does
+            if result is None:
+                self._compute(task, task_id)
+            else:
+                self.cache.release_lease(task_id, self.node_id)
+                self._remote_result(task, task_id, result)
+        else:
+            self.cache.wait_for_result(task_id, lambda result: self._remote_result(task, task_id, result))
+
+    def _remote_result(self, task, task_id, result):
+        if result is None:
+            self._lease_or_wait(task, task_id)  # The leaseholder gave up or never delivered
+            return
+        self.l2_hits += 1
+        self.l1.set(task_id, result)
+        self._resolve(task_id, self._log_metrics(task_id, result, from_cache=True, cache_hit='L2'))
+
+    def _compute(self, task, task_id):
+        def done(processing_time, wait_time):
+            delay = task['task_size'] / TRANSMISSION_RATE + PROPAGATION_DELAY + processing_time
+            result = f"Processed {task['task_type']} on fog node {self.fog_node_number}"
+            energy = self.power_model.energy(processing_time, processing_time)
+            self.usage.record(task['task_size'], processing_time, energy)
+            task_metrics = self._log_metrics(task_id, result, delay=delay + wait_time, energy_consumption=energy,
+                                             wait_time=wait_time, processing_time=processing_time,
+                                             deadline_met=delay + wait_time <= task['deadline'])
+            self.l1.set(task_id, result)
+            self.cache.set(task_id, result, self.node_id)
+            self.cache.release_lease(task_id, self.node_id)
+            self._resolve(task_id, task_metrics)
+
+        def expired(wait_time):
+            self.cache.release_lease(task_id, self.node_id)
+            self._resolve(task_id, {'status': 'expired', 'fog_node_number': self.fog_node_number,
+                                    'message': f"Deadline expired after {wait_time:.2f}s in the queue"})
+
+        # Processed within the deadline less the modelled link delays, like the fog node's processing_deadline
+        deadline = task['deadline'] - task['task_size'] / TRANSMISSION_RATE - PROPAGATION_DELAY
+        if not self.executor.submit(task, done, deadline, expired):
+            self.cache.release_lease(task_id, self.node_id)
+            self._resolve(task_id, {'status': 'rejected', 'fog_node_number': self.fog_node_number,
+                                    'message': f"Task queue is full ({self.executor.max_queue_length} tasks)"})
+
+    def _resolve(self, task_id, task_metrics):
+        leader, *followers = self._flights.pop(task_id)
+        status_code = {'rejected': 429, 'expired': 504}.get(task_metrics.get('status'), 200)
+        leader(task_metrics, status_code)
+        for respond in followers:
+            if status_code == 200:
+                respond(self._log_metrics(task_id, task_metrics['result'], delay=task_metrics['delay'],
+                                          from_cache=True, cache_hit='coalesced',
+                                          wait_time=task_metrics['wait_time'],
+                                          processing_time=task_metrics['processing_time'], cpu_time=0,
+                                          deadline_met=task_metrics['deadline_met']), 200)
+            else:
+                respond(task_metrics, status_code)
+
+    def _log_metrics(self, task_id, result, delay=0, energy_consumption=0, from_cache=False, cache_hit=False,
+                     wait_time=0, processing_time=0, cpu_time=None, deadline_met=True):
+        task_metrics = {
+            'task_id': task_id,
+            'fog_node_number': self.fog_node_number,
+            'from_cache': from_cache,
+            'delay': delay,
+            'energy_consumption': energy_consumption,
+            'result': result,
+            'cache_hit': cache_hit,
+            'wait_time': wait_time,
+            'processing_time': processing_time,
+            'cpu_time': processing_time if cpu_time is None else cpu_time,  # Simulated processing is all CPU
+            'deadline_met': deadline_met
+        }
+        self.log.append({**task_metrics, 'timestamp': self.sim.now})
+        return task_metrics
+
+    def status(self):
+        """The node's load as its current_status reports it."""
+        executor_stats = self.executor.stats()
+        return {
+            'node_id': self.node_id,
+            'fog_node_number': self.fog_node_number,
+            'cpu_usage': 100.0 * executor_stats['active_tasks'] / executor_stats['workers'],
+            'memory_available': self.memory_available,
+            'total_memory': self.total_memory,
+            'task_queue_length': executor_stats['queue_depth'] + executor_stats['active_tasks'],
+            **executor_stats,
+            **self.usage.stats(),
+            'cache_l1_hits': self.l1_hits,
+            'cache_l2_hits': self.l2_hits,
+            'cache_misses': self.misses,
+            'cache_l1_entries': len(self.l1)
+        }
+
+
+class SimulatedCloudNode:
+    """The cloud node's ``/offload_task`` on the virtual clock, behind its modelled WAN round trip."""
+
+    def __init__(self, sim, workers=64, service_rate=20, max_queue_length=1024, wan_round_trip=0.1, wan_rate=5,
+                 drop_late=True):
+        self.sim = sim
+        self.wan_round_trip = wan_round_trip
+        self.wan_rate = wan_rate
+        self.executor = SimulatedExecutor(sim, workers, max_queue_length, service_rate, drop_late=drop_late)
+        self.power_model = PowerModel(CLOUD_IDLE_WATTS, CLOUD_CORE_WATTS, workers)
+        self.log = []
+
+    def offload(self, task, respond):
+        self.sim.after(self.wan_round_trip, self._submit, task, respond)
+
+    def _submit(self, task, respond):
+        def done(processing_time, wait_time):
+            delay = task['task_size'] / self.wan_rate + self.wan_round_trip / 2 + processing_time
+            task_metrics = {
+                'task_id': f"{task['task_type']}_{task['task_size']}",
+                'fog_node_number': 'cloud',
+                'from_cache': False,
+                'delay': delay + wait_time,
+                'energy_consumption': self.power_model.energy(processing_time, processing_time),
+                'result': f"Processed {task['task_type']} on the cloud node",
+                'cache_hit': False,
+                'wait_time': wait_time,
+                'processing_time': processing_time,
+                'cpu_time': processing_time,
+                'deadline_met': delay + wait_time <= task['deadline']
+            }
+            self.log.append({**task_metrics, 'timestamp': self.sim.now})
+            respond(task_metrics, 200)
+
+        def expired(wait_time):
+            respond({'status': 'expired', 'fog_node_number': 'cloud',
+                     'message': f"Deadline expired after {wait_time:.2f}s in the queue"}, 504)
+
+        deadline = task['deadline'] - task['task_size'] / self.wan_rate - self.wan_round_trip / 2
+        if not self.executor.submit(task, done, deadline, expired):
+            respond({'status': 'rejected', 'fog_node_number': 'cloud',
+                     'message': f"Task queue is full ({self.executor.max_queue_length} tasks)"}, 429)
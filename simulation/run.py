@@ -0,0 +1,305 @@
+"""Discrete-event simulation of the offloading system on a virtual clock.
+
+IoT devices send tasks as Poisson processes to the manager's real routing
+(``route_task``, ``calculate_weight``, the registry with in-flight accounting
+and the configured policy). Simulated fog nodes answer with the fog nodes'
+cache semantics, EDF executor and delay/energy model, and report their status
+as snapshots plus deltas through the real ``StatusPublisher``. Tasks
+no fog node takes spill over to a simulated cloud node with ``--cloud``. With
+``--trace``, the arrivals of a recorded trace (see ``common/traces.py``) are
+replayed instead, ``--speed`` times faster than recorded.
+
+Per-node and per-device lists are cycled, so ``--nodes 6 --workers 2 4`` gives
+alternating 2- and 4-worker nodes, and ``--profiles small large`` alternates
+the fog nodes' size profiles. The same ``--seed`` reproduces a run
+exactly. With ``--output``, every node's CSV log is written in the fog nodes'
+format, with a ``summary.json``.
+
+    python -m simulation.run --tasks 10000 --devices 10 --rates 0.2 --nodes 3
+"""
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from benchmarks.harness import import_service
+from common.status_stream import StatusPublisher
+from common.traces import trace_tasks
+from fog_nodes.config import PROFILES, FogNodeConfig
+from fog_nodes.instrumentation import PowerModel
+from simulation.engine import Simulation
+from simulation.nodes import SharedCache, SimulatedCloudNode, SimulatedFogNode
+
+TASK_TYPES = ["image_processing", "data_analysis", "video_streaming"]
+
+# Header of the fog nodes' CSV task log
+LOG_HEADER = ['task_id', 'fog_node_number', 'from_cache', 'delay', 'energy_consumption', 'result', 'cache_hit',
+              'timestamp', 'wait_time', 'processing_time', 'cpu_time', 'deadline_met']
+
+
+class DirectDelivery:
+    """Stands in for the Redis client: hands published status deltas straight to the manager."""
+
+    def __init__(self, manager, sim):
+        self.manager = manager
+        self.sim = sim
+
+    def publish(self, channel, message):
+        self.manager.apply_status_delta(json.loads(message), self.sim.now)
+
+
+class StatusReporter:
+    """Reports a simulated node's status like a fog node: snapshots when due, deltas on load changes."""
+
+    def __init__(self, sim, manager, node, config, args):
+        self.sim = sim
+        self.manager = manager
+        self.node = node
+        self.min_interval = args.delta_min_interval
+        self.snapshots_only = args.snapshots_only
+        self.status_interval = args.status_interval
+        self.publisher = StatusPublisher(DirectDelivery(manager, sim), node.node_id, node.status,
+                                         {'task_queue_length': config.status_delta_queue,
+                                          'cpu_usage': config.status_delta_cpu},
+                                         min_interval=args.delta_min_interval, budget_interval=args.status_interval,
+                                         heartbeat_interval=config.status_heartbeat_interval,
+                                         snapshot_interval=config.status_snapshot_interval, clock=lambda: sim.now)
+        self.snapshots = 0
+        self._last_delta = -float('inf')
+        self._pending = False
+        if not args.snapshots_only:
+            node.on_change = self.changed
+
+    def tick(self):
+        if self.snapshots_only:
+            # One snapshot every --status-interval seconds, as the nodes used to poll
+            self.send_snapshot()
+            self.sim.after(self.status_interval, self.tick)
+            return
+        # Once a second, like the fog node's status threads: a due snapshot, else any change waiting for credit
+        if self.publisher.snapshot_due():
+            self.send_snapshot()
+        elif not self._pending:
+            self.publish_changes()
+        self.sim.after(self.publisher.sample_interval, self.tick)
+
+    def send_snapshot(self):
+        status = {**self.node.status(), 'epoch': self.publisher.epoch, 'seq': self.publisher.next_seq()}
+        self.manager.record_fog_node_status(dict(status), self.sim.now)
+        self.publisher.snapshot_sent(status)
+        self.snapshots += 1
+
+    def changed(self):
+        # At most one delta per min_interval; changes in between go out together
+        if not self._pending:
+            self._pending = True
+            self.sim.at(self._last_delta + self.min_interval, self.publish_changes)
+
+    def publish_changes(self):
+        self._pending = False
+        if self.publisher.publish_changes():
+            self._last_delta = self.sim.now
+
+
+def cycle(values, count):
+    return list(itertools.islice(itertools.cycle(values), count))
+
+
+def node_configs(args):
+    """The FogNodeConfig of every node, from ``--profiles`` or the per-node lists."""
+    if args.profiles:
+        return [FogNodeConfig(**PROFILES[profile]) for profile in cycle(args.profiles, args.nodes)]
+    return [FogNodeConfig(workers=workers, cpu_speed=speed, max_queue_length=args.max_queue_length)
+            for workers, speed in zip(cycle(args.workers, args.nodes), cycle(args.speeds, args.nodes))]
+
+
+def simulate(manager, args):
+    """Run one simulation and return every task's outcome, the nodes and the status message count."""
+    sim = Simulation()
+    rng = random.Random(args.seed)
+    manager.fog_node_registry.reset()
+    manager.fog_node_statuses.clear()
+    manager.routing_policy = manager.create_routing_policy(args.policy)
+    if hasattr(manager.routing_policy, 'rng'):
+        manager.routing_policy.rng = random.Random(args.seed)
+    manager.CLOUD_URL = 'simulated' if args.cloud else ''  # Lets route_task report saturated nodes
+    manager.DEADLINE_ADMISSION = not args.no_deadline_control
+
+    cache = SharedCache(sim)
+    nodes, reporters = {}, []
+    for n, config in enumerate(node_configs(args), 1):
+        power_model = PowerModel(config.power_idle_watts, config.power_core_watts, config.workers)
+        node = SimulatedFogNode(sim, cache, str(n), n, config.workers, config.cpu_speed, config.max_queue_length,
+                                power_model=power_model, drop_late=not args.no_deadline_control)
+        nodes[node.node_id] = node
+        manager.register_fog_node({'node_id': node.node_id, 'url': f"http://fog_node{n}:5000",
+                                   'capacity': config.workers, 'task_types': TASK_TYPES})
+        reporter = StatusReporter(sim, manager, node, config, args)
+        reporters.append(reporter)
+        sim.at(0.0, reporter.tick)
+    cloud = (SimulatedCloudNode(sim, wan_round_trip=args.wan_rtt, drop_late=not args.no_deadline_control)
+             if args.cloud else None)
+
+    outcomes = []
+
+    def record(task, arrived_at, served_by, status_code, task_metrics):
+        outcomes.append({'served_by': served_by, 'status_code': status_code, 'deadline': task['deadline'],
+                         'response_time': sim.now - arrived_at, **task_metrics})
+
+    def spill(task, arrived_at, reason):
+        if cloud is None:
+            refused = 429 if reason != 'no_fog_available' else 500
+            record(task, arrived_at, None, refused, {'status': 'refused'})
+            return
+        cloud.offload(task, lambda task_metrics, status_code: record(task, arrived_at, 'cloud', status_code,
+                                                                     task_metrics))
+
+    def offload(task):
+        arrived_at = sim.now
+        fog_node, reason = manager.route_task(task, now=sim.now)
+        if fog_node is None:
+            spill(task, arrived_at, reason)
+            return
+        token = manager.fog_node_registry.dispatch(fog_node['node_id'])
+
+        def respond(task_metrics, status_code):
+            manager.fog_node_registry.complete(fog_node['node_id'], token)
+            if status_code == 429:
+                spill(task, arrived_at, 'saturated')
+            else:
+                record(task, arrived_at, fog_node['node_id'], status_code, task_metrics)
+
+        nodes[fog_node['node_id']].offload(task, respond)
+
+    generated = 0
+
+    def arrival(rate):
+        nonlocal generated
+        if generated >= args.tasks:
+            return
+        generated += 1
+        # Same task mix as the IoT device's generate_task
+        offload({'task_type': rng.choice(TASK_TYPES), 'task_size': rng.randint(10, 100),
+                 'deadline': rng.randint(5, 30)})
+        sim.after(rng.expovariate(rate), arrival, rate)
+
+    if args.trace:
+        for offset, _, task in trace_tasks(args.trace, args.speed):
+            sim.at(offset, offload, task)
+            generated += 1
+    else:
+        for rate in cycle(args.rates, args.devices):
+            sim.after(rng.expovariate(rate), arrival, rate)
+    expected = generated if args.trace else args.tasks
+
+    # Status timers run forever, so stop once every task has been answered
+    while len(outcomes) < expected and len(sim):
+        sim.run(until=sim.now + args.status_interval)
+    status_messages = sum(r.snapshots + r.publisher.published for r in reporters)
+    return outcomes, nodes, cloud, sim.now, status_messages
+
+
+def deadline_miss_rates(outcomes, served_by):
+    """Share of the tasks each node answered late or dropped for their deadline, by node."""
+    rates = {}
+    for node_id in served_by:
+        handled = [o for o in outcomes if o['served_by'] == node_id and o['status_code'] in (200, 504)]
+        missed = sum(o['status_code'] == 504 or not o['deadline_met'] for o in handled)
+        rates[node_id] = round(missed / len(handled), 4) if handled else None
+    return rates
+
+
+def summarize(outcomes, nodes, duration, status_messages, cpu_seconds):
+    answered = [o for o in outcomes if o['status_code'] == 200]
+    expired = sum(o['status_code'] == 504 for o in outcomes)
+    response_times = np.array([o['response_time'] for o in outcomes if o['status_code'] == 200])
+    by_tier = {tier: sum(o.get('cache_hit') == tier for o in answered) for tier in ('L1', 'L2', 'coalesced')}
+    fog_answered = sum(o['served_by'] not in (None, 'cloud') for o in answered)
+    return {
+        'tasks': len(outcomes),
+        'virtual_seconds': round(duration, 1),
+        'cpu_seconds': round(cpu_seconds, 2),
+        'answered_by_fog': fog_answered,
+        'answered_by_cloud': len(answered) - fog_answered,
+        'refused': len(outcomes) - len(answered) - expired,
+        'expired': expired,
+        'deadline_met': sum(o['deadline_met'] for o in answered) / len(outcomes),
+        'deadline_miss_rate_by_node': deadline_miss_rates(outcomes, [*nodes, 'cloud']),
+        'mean_delay': float(np.mean([o['delay'] for o in answered])) if answered else None,
+        'mean_response_time': float(np.mean(response_times)) if answered else None,
+        'p95_response_time': float(np.percentile(response_times, 95)) if answered else None,
+        'total_energy': float(sum(o['energy_consumption'] for o in answered)),
+        'cache_hit_rate': sum(by_tier.values()) / fog_answered if fog_answered else 0.0,
+        **{f"{tier}_hits": count for tier, count in by_tier.items()},
+        'tasks_per_node': {node_id: sum(o['served_by'] == node_id for o in answered) for node_id in nodes},
+        'status_messages': status_messages
+    }
+
+
+def write_logs(output, nodes, cloud, summary):
+    """Write every node's task log in the fog nodes' CSV format, and the summary."""
+    os.makedirs(output, exist_ok=True)
+    logs = {f"fog_node_{node.fog_node_number}_log.csv": node.log for node in nodes.values()}
+    if cloud is not None:
+        logs['cloud_log.csv'] = cloud.log
+    for file_name, rows in logs.items():
+        with open(os.path.join(output, file_name), 'w', newline='') as f:
+            writer = csv.DictWriter(f, LOG_HEADER)
+            writer.writeheader()
+            writer.writerows(rows)
+    with open(os.path.join(output, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=10000)
+    parser.add_argument('--devices', type=int, default=10)
+    parser.add_argument('--rates', type=float, nargs='+', default=[0.2], help="Task arrivals per second per device")
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', default=[2], help="Workers per fog node")
+    parser.add_argument('--speeds', type=float, nargs='+', default=[1.0], help="Processing speed per fog node")
+    parser.add_argument('--max-queue-length', type=int, default=32)
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES),
+                        help="Fog node profiles (FOG_PROFILE) instead of --workers, --speeds and --max-queue-length")
+    parser.add_argument('--policy', default='weighted', help="Manager routing policy (ROUTING_MODE)")
+    parser.add_argument('--status-interval', type=float, default=20.0,
+                        help="Seconds per snapshot of status bytes, the polling budget (STATUS_BUDGET_SECONDS)")
+    parser.add_argument('--delta-min-interval', type=float, default=1.0)
+    parser.add_argument('--snapshots-only', action='store_true', help="Report status without deltas")
+    parser.add_argument('--cloud', action='store_true', help="Spill tasks no fog node takes to a cloud node")
+    parser.add_argument('--wan-rtt', type=float, default=0.1, help="Cloud node WAN round trip in seconds")
+    parser.add_argument('--no-deadline-control', action='store_true',
+                        help="Turn off the manager's deadline admission and the nodes' dropping of late tasks")
+    parser.add_argument('--trace', help="Replay the arrivals of a recorded .npz trace instead of devices")
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay the trace this many times faster")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Directory for the CSV logs and summary.json")
+    args = parser.parse_args()
+
+    # Resolved before import_service moves to a scratch directory
+    output = os.path.abspath(args.output) if args.output else None
+    if args.trace:
+        args.trace = os.path.abspath(args.trace)
+    manager = import_service('manager', 'manager')
+    started_at = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):  # The manager prints when no fog node is available
+        outcomes, nodes, cloud, duration, status_messages = simulate(manager, args)
+    summary = summarize(outcomes, nodes, duration, status_messages, time.process_time() - started_at)
+
+    for key, value in summary.items():
+        print(f"{key:<22}{value:.3f}" if isinstance(value, float) else f"{key:<22}{value}")
+    if output:
+        write_logs(output, nodes, cloud, summary)
+        print(f"Logs written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Per-thread metric cells under a server that starts a thread per request."""
+import threading
+
+from common.metrics import Counter, Histogram, Registry
+
+
+def run_threads(count, target):
+    for _ in range(count):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+
+def test_cells_of_exited_threads_are_folded_without_scrapes():
+    registry = Registry()
+    requests = Counter('requests', 'Requests handled', registry=registry)
+    latency = Histogram('latency_seconds', 'Request latency', registry=registry, buckets=(0.1, 1))
+
+    def handle_request():
+        requests.inc()
+        latency.observe(0.5)
+
+    run_threads(2500, handle_request)
+    assert len(requests._children[()]._cells) <= 16
+    assert len(latency._children[()]._cells) <= 16
+
+    assert requests._children[()].value() == 2500
+    assert latency._children[()].totals() == [0, 2500, 0, 1250.0]
+
+
+def test_cells_of_live_threads_are_kept():
+    registry = Registry()
+    requests = Counter('requests', 'Requests handled', registry=registry)
+    done = threading.Event()
+
+    def hold():
+        requests.inc()
+        done.wait()
+
+    held = [threading.Thread(target=hold) for _ in range(40)]
+    for thread in held:
+        thread.start()
+    run_threads(500, requests.inc)
+    assert len(requests._children[()]._cells) <= 2 * 40 + 1
+
+    done.set()
+    for thread in held:
+        thread.join()
+    assert requests._children[()].value() == 540
@@ -0,0 +1,54 @@
+"""Least expected completion routing with the energy fog nodes measure."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'manager'))
+
+from policies import LeastExpectedCompletionPolicy  # noqa: E402
+from registry import FogNodeRegistry  # noqa: E402
+
+
+def route(energy_per_unit, energy_weight, tasks=60):
+    """Place ``tasks`` tasks on two equally fast nodes that spend ``energy_per_unit`` joules per unit of size."""
+    registry = FogNodeRegistry(status_timeout=30, eviction_timeout=60)
+    statuses = {}
+    for node_id, energy in energy_per_unit.items():
+        registry.register(node_id, f"http://fog_node{node_id}:5000", capacity=2)
+        statuses[node_id] = {'workers': 2, 'task_queue_length': 0, 'avg_service_rate': 10,
+                             'avg_cpu_per_unit': 0.1, 'avg_energy_per_unit': energy}
+        registry.heartbeat(node_id, 10.0, now=0.0, status=statuses[node_id])
+
+    policy = LeastExpectedCompletionPolicy(registry, statuses, energy_weight=energy_weight)
+    placements = dict.fromkeys(energy_per_unit, 0)
+    for _ in range(tasks):
+        fog_node = policy.select({'task_type': 'data_analysis', 'task_size': 50, 'deadline': 30}, now=1.0)
+        placements[fog_node['node_id']] += 1
+        registry.dispatch(fog_node['node_id'])
+    return placements
+
+
+def test_costlier_node_loses_placements():
+    # 0.02 s per joule: the costlier node's extra 200 J per task outweigh about two tasks of queue wait
+    placements = route({'1': 1.0, '2': 5.0}, energy_weight=0.02)
+
+    assert placements['1'] >= placements['2'] + 2
+    assert placements['2'] > 0  # Still used once the cheaper node's backlog outweighs the energy
+
+
+def test_energy_is_ignored_without_a_weight():
+    placements = route({'1': 1.0, '2': 5.0}, energy_weight=0.0)
+
+    assert abs(placements['1'] - placements['2']) <= 1
+
+
+def test_measured_cpu_time_stands_in_for_an_unreported_service_rate():
+    registry = FogNodeRegistry(status_timeout=30, eviction_timeout=60)
+    statuses = {'1': {'workers': 1, 'avg_cpu_per_unit': 0.2}, '2': {'workers': 1, 'avg_cpu_per_unit': 0.05}}
+    for node_id, status in statuses.items():
+        registry.register(node_id, f"http://fog_node{node_id}:5000")
+        registry.heartbeat(node_id, 10.0, now=0.0, status=status)
+    policy = LeastExpectedCompletionPolicy(registry, statuses)
+
+    task = {'task_type': 'data_analysis', 'task_size': 50}
+    assert policy.expected_delay(task, registry.get('1')) - policy.expected_delay(task, registry.get('2')) == 7.5
+    assert policy.select(task, now=1.0)['node_id'] == '2'
@@ -0,0 +1,51 @@
+"""Manager replicas ranking fog nodes from statuses they record in a shared, in-memory Redis."""
+import os
+import sys
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'manager'))
+
+from registry import FogNodeRegistry  # noqa: E402
+from state_store import RedisStateStore  # noqa: E402
+
+
+def status(seq):
+    return {'node_id': '1', 'epoch': 7, 'seq': seq}
+
+
+@pytest.fixture
+def replicas():
+    server = fakeredis.FakeServer()
+    first, second = (FogNodeRegistry(60, 120, store=RedisStateStore(fakeredis.FakeRedis(server=server)))
+                     for _ in range(2))
+    first.register('1', 'http://fog_node1:5000')
+    return first, second
+
+
+def test_stale_status_leaves_the_weight_of_the_newer_one(replicas):
+    first, second = replicas
+    first.heartbeat('1', 20.0, status=status(1))
+    second.sync(second.store.load(), {'1': 20.0})
+    first.heartbeat('1', 10.0, status=status(3))
+
+    fog_node, accepted = second.heartbeat('1', 50.0, status=status(2))
+    assert not accepted
+    assert second.best()[1] == 20.0
+
+    second.sync(second.store.load(), {'1': 10.0})
+    assert second.best() == (fog_node, 10.0)
+
+
+def test_stale_status_does_not_rank_a_node_new_to_the_replica(replicas):
+    first, second = replicas
+    first.heartbeat('1', 10.0, status=status(2))
+
+    fog_node, accepted = second.heartbeat('1', 50.0, status=status(1))
+    assert not accepted and fog_node['status_weight'] is None
+    assert second.best() == (None, None)
+
+    second.sync(second.store.load(), {'1': 10.0})
+    assert second.best() == (fog_node, 10.0)
@@ -0,0 +1,108 @@
+"""Coalescing of identical tasks within and across fog nodes, against an in-memory Redis.
+
+Each simulated node has its own ``ResultCache`` and ``SingleFlight`` and answers
+a request the way the fog node does: from the cache, by joining a computation
+already running on the node, or through ``ResultCache.compute_once``.
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fog_nodes'))
+
+from result_cache import ResultCache  # noqa: E402
+from single_flight import SingleFlight  # noqa: E402
+
+LEASE_SECONDS = 1.0
+COMPUTE_SECONDS = 0.3
+
+
+class Node:
+    def __init__(self, server, name, computations):
+        self.name = name
+        self.server = server
+        self.cache = ResultCache('redis', 6379, origin=name, client=fakeredis.FakeRedis(server=server))
+        self.flights = SingleFlight()
+        self.computations = computations
+
+    def start(self, task_id):
+        self.computations.append((self.name, task_id))
+
+    def finish(self, task_id):
+        time.sleep(COMPUTE_SECONDS)
+        return f"{task_id} computed on {self.name}"
+
+    def request(self, task_id):
+        result, _ = self.cache.get(task_id)
+        if result is not None:
+            return result
+        flight, is_leader = self.flights.claim(task_id)
+        if is_leader:
+            try:
+                delivered = self.cache.compute_once([task_id], self.start, self.finish, LEASE_SECONDS)
+                flight.set_result(delivered.get(task_id) or self.cache.get(task_id)[0])
+            except Exception as e:
+                flight.set_exception(e)
+        return flight.result()
+
+
+@pytest.fixture
+def nodes():
+    server = fakeredis.FakeServer()
+    computations = []
+    return [Node(server, name, computations) for name in ('fog_node1', 'fog_node2')], computations
+
+
+def request_concurrently(nodes, task_id, requests):
+    barrier = threading.Barrier(requests)
+
+    def request(i):
+        barrier.wait()
+        return nodes[i % len(nodes)].request(task_id)
+
+    with ThreadPoolExecutor(max_workers=requests) as pool:
+        return list(pool.map(request, range(requests)))
+
+
+def test_identical_tasks_on_two_nodes_compute_once(nodes):
+    nodes, computations = nodes
+    results = request_concurrently(nodes, 'image_processing_50', 20)
+
+    assert len(computations) == 1
+    node_name, _ = computations[0]
+    assert results == [f"image_processing_50 computed on {node_name}"] * 20
+
+
+def test_expired_lease_is_taken_over_by_one_node(nodes):
+    nodes, computations = nodes
+    # A node that took the lease and died before computing
+    crashed = ResultCache('redis', 6379, origin='fog_node3', client=fakeredis.FakeRedis(server=nodes[0].server))
+    assert crashed.acquire_leases(['data_analysis_20'], LEASE_SECONDS) == (['data_analysis_20'], {})
+
+    started_at = time.monotonic()
+    results = request_concurrently(nodes, 'data_analysis_20', 10)
+
+    assert time.monotonic() - started_at >= LEASE_SECONDS
+    assert len(computations) == 1
+    node_name, _ = computations[0]
+    assert results == [f"data_analysis_20 computed on {node_name}"] * 10
+
+
+def test_released_lease_without_result_is_taken_over_at_once(nodes):
+    nodes, computations = nodes
+    holder, waiter = nodes
+    assert holder.cache.acquire_leases(['video_streaming_30'], LEASE_SECONDS) == (['video_streaming_30'], {})
+    threading.Timer(0.2, holder.cache.release_leases, [['video_streaming_30']]).start()
+
+    started_at = time.monotonic()
+    result = waiter.request('video_streaming_30')
+
+    assert time.monotonic() - started_at < LEASE_SECONDS
+    assert computations == [('fog_node2', 'video_streaming_30')]
+    assert result == "video_streaming_30 computed on fog_node2"
@@ -0,0 +1,24 @@
+"""Running the simulation as a script, the way the readme does."""
+import os
+import subprocess
+import sys
+
+from common.traces import TraceRecorder
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_trace_path_is_relative_to_the_working_directory(tmp_path):
+    clock = iter(range(100)).__next__
+    recorder = TraceRecorder(str(tmp_path / 'arrivals.npz'), clock=lambda: clock() / 10)
+    for i in range(50):
+        recorder.record({'task_type': 'data_analysis', 'task_size': 20 + i, 'deadline': 20}, device=i % 5)
+    recorder.save()
+
+    completed = subprocess.run([sys.executable, '-m', 'simulation.run', '--trace', 'arrivals.npz'], cwd=tmp_path,
+                               env={**os.environ, 'PYTHONPATH': REPO_ROOT}, capture_output=True, text=True,
+                               timeout=120)
+
+    assert completed.returncode == 0, completed.stderr
+    summary = dict(line.split(maxsplit=1) for line in completed.stdout.splitlines() if line.strip())
+    assert summary['tasks'].strip() == '50'
@@ -0,0 +1,46 @@
+"""In-flight counts of manager replicas sharing their node state, against an in-memory Redis."""
+import os
+import sys
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'manager'))
+
+from state_store import RedisStateStore  # noqa: E402
+
+
+@pytest.fixture
+def replicas():
+    server = fakeredis.FakeServer()
+    first, second = (RedisStateStore(fakeredis.FakeRedis(server=server)) for _ in range(2))
+    first.register({'node_id': '1', 'url': 'http://fog_node1:5000'})
+    first.record_status('1', {}, 1.0)
+    second.load()
+    return first, second
+
+
+def test_counts_are_local_until_loaded(replicas):
+    first, second = replicas
+    tokens = [first.dispatch('1')[1] for _ in range(3)]
+    second.dispatch('1')
+
+    assert first.load()['1']['in_flight'] == 3
+    assert second.load()['1']['in_flight'] == 4
+    assert first.load()['1']['in_flight'] == 4
+
+    assert first.complete('1', tokens[0], 2) == 2
+    assert second.load()['1']['in_flight'] == 4
+    assert first.load()['1']['in_flight'] == 2
+    assert second.load()['1']['in_flight'] == 2
+
+
+def test_status_drops_counts_of_the_previous_generation(replicas):
+    first, second = replicas
+    _, token = first.dispatch('1', 2)
+    second.record_status('1', {}, 2.0)
+
+    assert first.load()['1']['in_flight'] == 0
+    assert first.complete('1', token) is None
+    assert second.load()['1']['in_flight'] == 0
@@ -0,0 +1,37 @@
+"""Status deltas and snapshots on the byte budget of 20-second polling, on a manual clock."""
+import json
+
+from common.status_stream import StatusPublisher
+
+
+class Recorder:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, channel, message):
+        self.messages.append(message)
+
+
+def test_deltas_fit_several_per_polling_interval_within_its_bytes():
+    now = 0.0
+    queue = [0]
+    status = {'node_id': '1', 'fog_node_number': '1', 'cpu_usage': 10.0, 'memory_available': 512,
+              'total_memory': 1024, 'task_queue_length': 0, 'avg_service_time': 2.5, 'avg_service_rate': 0.4,
+              'missed_deadlines': 0, 'l1_hits': 0, 'l2_hits': 0}
+    client = Recorder()
+    publisher = StatusPublisher(client, '1', lambda: {**status, 'task_queue_length': queue[0]},
+                                {'task_queue_length': 4}, clock=lambda: now)
+    snapshot_bytes = 0
+    for second in range(600):
+        now = float(second)
+        queue[0] = (second // 3) % 2 * 8  # Moves by 8 tasks every 3 seconds
+        if publisher.snapshot_due():
+            snapshot = {**publisher.collect(), 'epoch': publisher.epoch, 'seq': publisher.next_seq()}
+            publisher.snapshot_sent(snapshot)
+            snapshot_bytes += len(json.dumps(snapshot))
+        else:
+            publisher.publish_changes()
+
+    polling_bytes = len(json.dumps(status)) * (600 // 20 + 1)
+    assert snapshot_bytes + sum(len(message) for message in client.messages) <= polling_bytes
+    assert publisher.published > 2 * (600 // 20)